@@ -0,0 +1,84 @@
+"""Compare row-by-row and columnar evaluation throughput.
+
+Usage:
+    python benchmarks/columnar_benchmark.py [--rows 100000] [--seed 0]
+
+Synthetic invoices with number, enum and exact-string fields are evaluated once
+with ``EvaluationPlan.evaluate`` per row and once with ``evaluate_columnar``;
+the per-field correctness of both is checked to be identical and rows per
+second are reported.
+"""
+import argparse
+import random
+import time
+from llmdatalens.evaluators import compile_evaluation_plan, evaluate_columnar
+from llmdatalens.experiment.models import FunctionSchema
+
+SCHEMA = FunctionSchema(
+    name="extract_invoice",
+    parameters={
+        "type": "object",
+        "properties": {
+            "invoice_number": {"type": "string"},
+            "invoice_date": {"type": "string"},
+            "total": {"type": "number"},
+            "tax": {"type": "number"},
+            "quantity": {"type": "integer"},
+            "currency": {"type": "string", "enum": ["USD", "EUR", "GBP"]},
+            "status": {"type": "string", "enum": ["paid", "unpaid", "overdue"]}
+        }
+    }
+)
+
+def make_rows(rows: int, seed: int):
+    rng = random.Random(seed)
+    gt_outputs, predicted_outputs = [], []
+    for i in range(rows):
+        gt_output = {
+            "invoice_number": f"INV-{i:06d}",
+            "invoice_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "total": round(rng.uniform(1, 5000), 2),
+            "tax": round(rng.uniform(0, 500), 2),
+            "quantity": rng.randint(1, 20),
+            "currency": rng.choice(["USD", "EUR", "GBP"]),
+            "status": rng.choice(["paid", "unpaid", "overdue"])
+        }
+        predicted_output = dict(gt_output)
+        if rng.random() < 0.2:
+            predicted_output["total"] += rng.choice([0.001, 0.5])
+        if rng.random() < 0.1:
+            predicted_output["status"] = "late"
+        if rng.random() < 0.1:
+            predicted_output["invoice_number"] = f"INV-{i + 1:06d}"
+        gt_outputs.append(gt_output)
+        predicted_outputs.append(predicted_output)
+    return predicted_outputs, gt_outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    plan = compile_evaluation_plan(SCHEMA)
+    predicted_outputs, gt_outputs = make_rows(args.rows, args.seed)
+
+    start = time.perf_counter()
+    scalar = [plan.evaluate(p, g) for p, g in zip(predicted_outputs, gt_outputs)]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnar = evaluate_columnar(plan, predicted_outputs, gt_outputs)
+    columnar_seconds = time.perf_counter() - start
+
+    for column, field_name in enumerate(columnar.field_names):
+        if columnar.correct[:, column].tolist() != [r.field_results[field_name].correct for r in scalar]:
+            raise SystemExit(f"Columnar and scalar results differ for '{field_name}'")
+
+    print(f"{'engine':>10} {'seconds':>10} {'rows/s':>12}")
+    print(f"{'scalar':>10} {scalar_seconds:>10.3f} {args.rows / scalar_seconds:>12,.0f}")
+    print(f"{'columnar':>10} {columnar_seconds:>10.3f} {args.rows / columnar_seconds:>12,.0f}")
+    print(f"speedup: {scalar_seconds / columnar_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
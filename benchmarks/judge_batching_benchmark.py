@@ -0,0 +1,84 @@
+"""Measure how many judge requests batched relevancy judging saves.
+
+Usage:
+    python benchmarks/judge_batching_benchmark.py [--pairs 200] [--latency 0.05] [--batch-sizes 1 4 8 16]
+
+A local OpenAI-compatible server answers every chat completion after a fixed
+``--latency``, which stands in for the per-request overhead of the real API. For
+every batch size the same pairs are judged with
+``LLMEvaluator.evaluate_relevancy_batch`` and the requests sent, requests saved
+against one pair per request, and wall time are reported.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llmdatalens.evaluators import LLMEvaluator
+
+class JudgeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), JudgeHandler)
+        self.latency = latency
+        self.requests = 0
+
+class JudgeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        outputs = [output.strip() for output in re.findall(r"Actual Output:(.*)", prompt)]
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+
+        judgments = [
+            {"id": index, "statements": [output], "relevant_statements": [output], "relevancy_score": 1.0, "reason": "ok"}
+            for index, output in enumerate(outputs)
+        ]
+        content = json.dumps(judgments if "Item 0:" in prompt else judgments[0])
+        payload = json.dumps({
+            "id": "chatcmpl-benchmark", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def bench(server: JudgeServer, pairs, batch_size: int):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    llm_evaluator = LLMEvaluator(api_key="benchmark", base_url=base_url, batch_size=batch_size)
+    server.requests = 0
+    start = time.perf_counter()
+    llm_evaluator.evaluate_relevancy_batch(pairs)
+    return server.requests, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    server = JudgeServer(args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pairs = [(f"Acme Corporation #{i}", f"Acme Corp #{i}") for i in range(args.pairs)]
+
+    print(f"{args.pairs} pairs, {args.latency * 1000:.0f} ms per request")
+    print(f"{'batch size':>10} {'requests':>9} {'saved':>7} {'time (s)':>9}")
+    for batch_size in args.batch_sizes:
+        requests, elapsed = bench(server, pairs, batch_size)
+        saved = 1 - requests / args.pairs
+        print(f"{batch_size:>10} {requests:>9} {saved:>7.0%} {elapsed:>9.2f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Measure save and load throughput of the experiment storage backends.
+
+Usage:
+    python benchmarks/serialization_benchmark.py [--runs 10000 100000]
+
+For every configuration the full experiment is written with ``save_experiment``
+and read back with ``load_experiment``; throughput is reported in MB/s of
+on-disk bytes. Each row is labelled with its exact options: layout (single
+file or header + segments), pretty or compact JSON, the JSON library (stdlib or
+orjson) and what is deduplicated. The "single file" row reproduces the previous
+format: one indented JSON document written through ``json.dump(..., default=...)``.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from llmdatalens.experiment.models import (
+    Experiment, Run, LLMStructuredOutput, GroundTruth, Metadata, Prompt, FunctionSchema,
+    EvaluationResult, FieldResult
+)
+from llmdatalens.experiment.storage import JSONFileBackend, serialization
+
+SCHEMA = FunctionSchema(
+    name="Invoice",
+    description="An invoice containing items purchased by a customer and the total",
+    parameters={
+        "type": "object",
+        "properties": {
+            "number": {"description": "the number of the invoice", "type": "string"},
+            "customer_name": {"type": "string"},
+            "currency": {"enum": ["USD", "EUR", "GBP"], "type": "string"},
+            "total": {"description": "the total amount of the invoice", "type": "number"},
+        },
+    },
+)
+
+def make_experiment(num_runs: int) -> Experiment:
+    prompt = Prompt(system="You extract invoices.", function_call=SCHEMA)
+    runs = []
+    for i in range(num_runs):
+        data = {"number": f"INV-{i:06d}", "customer_name": "Acme Corporation", "currency": "EUR", "total": 100.0 + i}
+        runs.append(Run(
+            llm_output=LLMStructuredOutput(
+                structured_output=data,
+                metadata=Metadata(model_name="gpt-4o-mini", model_version="1.0", prompt=prompt, latency=0.5),
+            ),
+            ground_truth=GroundTruth(data=data),
+            evaluation_result=EvaluationResult(
+                overall_accuracy=1.0,
+                field_results={
+                    name: FieldResult(correct=True, predicted=value, ground_truth=value, details={"match_type": "exact"})
+                    for name, value in data.items()
+                },
+            ),
+        ))
+    return Experiment(name="Benchmark", version="1.0", runs=runs)
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def report(label: str, num_runs: int, size: int, save_seconds: float, load_seconds: float):
+    print(f"{label:<62} {num_runs:>8} runs {size / 1e6:>9.1f} MB "
+          f"save {size / save_seconds / 1e6:>7.1f} MB/s ({save_seconds:6.2f}s) "
+          f"load {size / load_seconds / 1e6:>7.1f} MB/s ({load_seconds:6.2f}s)")
+
+def bench_single_file(experiment: Experiment):
+    storage_path = tempfile.mkdtemp()
+    path = os.path.join(storage_path, f"{experiment.id}.json")
+    try:
+        start = time.perf_counter()
+        with open(path, "w") as f:
+            json.dump(experiment.model_dump(), f, indent=2, default=lambda obj: obj.isoformat())
+        save_seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        with open(path) as f:
+            loaded = Experiment.model_validate(json.load(f))
+        load_seconds = time.perf_counter() - start
+        assert len(loaded.runs) == len(experiment.runs)
+        report("single file, pretty, stdlib json, no dedup", len(experiment.runs), size, save_seconds, load_seconds)
+    finally:
+        shutil.rmtree(storage_path)
+
+def options_label(library: str, pretty: bool = False, deduplicate: bool = True,
+                  deduplicate_ground_truths: bool = False) -> str:
+    if not deduplicate:
+        dedup = "no dedup"
+    elif deduplicate_ground_truths:
+        dedup = "dedup prompts + ground truths"
+    else:
+        dedup = "dedup prompts"
+    return f"segments, {'pretty' if pretty else 'compact'}, {library}, {dedup}"
+
+def bench(experiment: Experiment, library: str, **backend_options):
+    label = options_label(library, **backend_options)
+    storage_path = tempfile.mkdtemp()
+    try:
+        backend = JSONFileBackend(storage_path, **backend_options)
+        start = time.perf_counter()
+        backend.save_experiment(experiment)
+        save_seconds = time.perf_counter() - start
+        size = directory_size(storage_path)
+
+        start = time.perf_counter()
+        loaded = JSONFileBackend(storage_path, **backend_options).load_experiment(experiment.id)
+        load_seconds = time.perf_counter() - start
+        assert len(loaded.runs) == len(experiment.runs)
+
+        report(label, len(experiment.runs), size, save_seconds, load_seconds)
+    finally:
+        shutil.rmtree(storage_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    orjson = serialization.orjson
+    for num_runs in args.runs:
+        experiment = make_experiment(num_runs)
+        serialization.orjson = None
+        bench_single_file(experiment)
+        libraries = ["stdlib json"] + (["orjson"] if orjson is not None else [])
+        for library in libraries:
+            serialization.orjson = orjson if library == "orjson" else None
+            bench(experiment, library, deduplicate=False)
+            bench(experiment, library)
+            bench(experiment, library, deduplicate_ground_truths=True)
+        serialization.orjson = orjson
+
+if __name__ == "__main__":
+    main()
@@ -129,30 +129,41 @@ evaluation_result = evaluator.evaluate()
 # Print results
 print("Evaluation Result:")
 print(f"Overall Field Accuracy: {evaluation_result.overall_accuracy:.2f}")
-print("\nField Results:")
+print("\nField Accuracy:")
 for field_name, field_result in evaluation_result.field_results.items():
+    # The aggregate keeps per-field counters; predicted values and details are per output
+    counts = field_result.details
+    print(f"  {field_name}: {counts['correct_count']}/{counts['total_count']} correct ({counts['accuracy']:.2f})")
+    if "mean_absolute_error" in counts:
+        print(f"    Mean Absolute Error: {counts['mean_absolute_error']:.4f}")
+
+print("\nField Results (first output):")
+for field_name, field_result in evaluator.evaluation_results[0].field_results.items():
     print(f"  {field_name}: {'Correct' if field_result.correct else 'Incorrect'}")
     print(f"    Predicted: {field_result.predicted}")
     print(f"    Ground Truth: {field_result.ground_truth}")
-    if field_result.details:
-        if "array_accuracy" in field_result.details:
-            print(f"    Array Accuracy: {field_result.details['array_accuracy']:.2f}")
-            print(f"    Correct Items: {field_result.details['correct_items']}")
-            print(f"    Total Items: {field_result.details['total_items']}")
+    details = (field_result.details or {}).get("details")
+    if isinstance(details, dict):
+        if "array_accuracy" in details:
+            print(f"    Array Accuracy: {details['array_accuracy']:.2f}")
+            print(f"    Correct Items: {details['correct_items']}")
+            print(f"    Total Items: {details['total_items']}")
             print("    Item Results:")
-            for i, item_result in enumerate(field_result.details['item_results']):
-                print(f"      Item {i+1}: {'Correct' if item_result.correct else 'Incorrect'}")
-        elif "relevancy_score" in field_result.details:
-            print(f"    Relevancy Score: {field_result.details['relevancy_score']:.2f}")
-            print(f"    Reason: {field_result.details['reason']}")
+            for i, item_result in enumerate(details['item_results']):
+                print(f"      Item {i+1}: {'Correct' if item_result['correct'] else 'Incorrect'}")
+        elif "relevancy_score" in details:
+            print(f"    Relevancy Score: {details['relevancy_score']:.2f}")
+            print(f"    Reason: {details['reason']}")
             print("    Statements:")
-            for statement in field_result.details['statements']:
+            for statement in details['statements']:
                 print(f"      - {statement}")
             print("    Relevant Statements:")
-            for statement in field_result.details['relevant_statements']:
+            for statement in details['relevant_statements']:
                 print(f"      - {statement}")
         else:
-            print(f"    Details: {field_result.details}")
+            print(f"    Details: {details}")
+    elif field_result.details:
+        print(f"    Details: {field_result.details}")
 
 # Access experiment data
 experiment_manager = ExperimentManager()
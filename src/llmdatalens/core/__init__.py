@@ -1,6 +1,6 @@
 from .base_model import LLMEvaluator, BaseEvaluationResult, MetricConfig
 from .enums import MetricField
-from .metrics_registry import metrics_registry, register_metric, MetricNames
+from .metrics_registry import metrics_registry, register_metric, MetricNames, MetricAccumulator
 
 __all__ = [
     'LLMEvaluator',
@@ -9,5 +9,6 @@ __all__ = [
     'MetricField',
     'metrics_registry',
     'register_metric',
-    'MetricNames'
+    'MetricNames',
+    'MetricAccumulator'
 ]
\ No newline at end of file
@@ -1,7 +1,8 @@
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Tuple
 from sklearn.metrics import f1_score, precision_score, recall_score, accuracy_score
+import math
 import numpy as np
-from llmdatalens.core.metrics_registry import register_metric
+from llmdatalens.core.metrics_registry import MetricAccumulator, register_metric
 from llmdatalens.core.enums import MetricField
 
 def calculate_overall_accuracy(ground_truths: List[Dict[str, Any]], predictions: List[Dict[str, Any]]) -> float:
@@ -33,11 +34,222 @@ def count_elements(structure: Any) -> int:
     else:
         return 1
 
-@register_metric("OverallAccuracy", field=MetricField.Accuracy, input_keys=["ground_truths", "predictions"])
+def _add_exact(partials: List[float], value: float) -> List[float]:
+    """Add ``value`` to a list of non-overlapping partial sums (Shewchuk), so the total is exact whatever the order."""
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i += 1
+        value = high
+    partials[i:] = [value]
+    return partials
+
+class _ExactSum:
+    """State helpers for ``[count, partials, non-finite sum]``; ``math.fsum`` of the partials is the exactly rounded sum."""
+
+    @staticmethod
+    def init() -> list:
+        return [0, [], 0.0]
+
+    @staticmethod
+    def add(state: list, values: List[float]) -> list:
+        for value in values:
+            value = float(value)
+            state[0] += 1
+            if math.isfinite(value):
+                _add_exact(state[1], value)
+            else:
+                state[2] += value
+        return state
+
+    @staticmethod
+    def merge(state: list, other: list) -> list:
+        partials = list(state[1])
+        for partial in other[1]:
+            _add_exact(partials, partial)
+        return [state[0] + other[0], partials, state[2] + other[2]]
+
+    @staticmethod
+    def total(state: list) -> float:
+        return math.fsum(state[1]) + state[2] if state[2] else math.fsum(state[1])
+
+class MeanAccumulator(MetricAccumulator):
+    """Mean of the values under ``input_key``, exactly rounded and independent of how the values are sharded."""
+
+    def __init__(self, input_key: str):
+        self.input_key = input_key
+
+    def init(self) -> list:
+        return _ExactSum.init()
+
+    def update(self, state: list, **inputs: Any) -> list:
+        return _ExactSum.add(state, inputs[self.input_key])
+
+    def merge(self, state: list, other: list) -> list:
+        return _ExactSum.merge(state, other)
+
+    def finalize(self, state: list) -> float:
+        return _ExactSum.total(state) / state[0] if state[0] else float("nan")
+
+class ElementAccuracyAccumulator(MetricAccumulator):
+    """``[correct elements, total elements]`` as counted by ``calculate_overall_accuracy``."""
+
+    def __init__(self, ground_truths_key: str = "ground_truths", predictions_key: str = "predictions", error_rate: bool = False):
+        self.ground_truths_key = ground_truths_key
+        self.predictions_key = predictions_key
+        self.error_rate = error_rate
+
+    def init(self) -> List[int]:
+        return [0, 0]
+
+    def update(self, state: List[int], **inputs: Any) -> List[int]:
+        for gt, pred in zip(inputs[self.ground_truths_key], inputs[self.predictions_key]):
+            state[0] += compare_nested_structures(gt, pred)
+            state[1] += count_elements(gt)
+        return state
+
+    def merge(self, state: List[int], other: List[int]) -> List[int]:
+        return [state[0] + other[0], state[1] + other[1]]
+
+    def finalize(self, state: List[int]) -> float:
+        accuracy = state[0] / state[1] if state[1] > 0 else 0
+        return 1 - accuracy if self.error_rate else accuracy
+
+class FieldAccuracyAccumulator(MetricAccumulator):
+    """Per-field ``[correct, total]`` counts over the fields of the first ground truth seen."""
+
+    def init(self) -> Dict[str, Any]:
+        return {"fields": None, "counts": {}}
+
+    def update(self, state: Dict[str, Any], **inputs: Any) -> Dict[str, Any]:
+        for gt, pred in zip(inputs["ground_truths"], inputs["predictions"]):
+            if state["fields"] is None:
+                state["fields"] = list(gt.keys())
+            for field in state["fields"]:
+                counts = state["counts"].setdefault(field, [0, 0])
+                counts[0] += gt[field] == pred[field]
+                counts[1] += 1
+        return state
+
+    def merge(self, state: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+        fields = state["fields"] if state["fields"] is not None else other["fields"]
+        counts = {field: list(value) for field, value in state["counts"].items()}
+        for field, (correct, total) in other["counts"].items():
+            merged = counts.setdefault(field, [0, 0])
+            merged[0] += correct
+            merged[1] += total
+        return {"fields": fields, "counts": counts}
+
+    def finalize(self, state: Dict[str, Any]) -> Dict[str, float]:
+        if state["fields"] is None:
+            raise IndexError("FieldSpecificAccuracy needs at least one ground truth")
+        return {field: state["counts"][field][0] / state["counts"][field][1] for field in state["fields"]}
+
+class ThroughputAccumulator(MetricAccumulator):
+    """Total items and total time, summed across shards."""
+
+    def init(self) -> list:
+        return [0, _ExactSum.init()]
+
+    def update(self, state: list, **inputs: Any) -> list:
+        return [state[0] + inputs["total_items"], _ExactSum.add(state[1], [inputs["total_time"]])]
+
+    def merge(self, state: list, other: list) -> list:
+        return [state[0] + other[0], _ExactSum.merge(state[1], other[1])]
+
+    def finalize(self, state: list) -> float:
+        total_time = _ExactSum.total(state[1])
+        return state[0] / total_time if total_time > 0 else 0
+
+class WeightedF1Accumulator(MetricAccumulator):
+    """Per-label ``[true positives, false positives, false negatives]``; finalizes to the support-weighted F1."""
+
+    def init(self) -> Dict[Any, List[int]]:
+        return {}
+
+    def update(self, state: Dict[Any, List[int]], **inputs: Any) -> Dict[Any, List[int]]:
+        for true_label, predicted_label in zip(inputs["y_true"], inputs["y_pred"]):
+            if true_label == predicted_label:
+                state.setdefault(true_label, [0, 0, 0])[0] += 1
+            else:
+                state.setdefault(predicted_label, [0, 0, 0])[1] += 1
+                state.setdefault(true_label, [0, 0, 0])[2] += 1
+        return state
+
+    def merge(self, state: Dict[Any, List[int]], other: Dict[Any, List[int]]) -> Dict[Any, List[int]]:
+        merged = {label: list(counts) for label, counts in state.items()}
+        for label, counts in other.items():
+            target = merged.setdefault(label, [0, 0, 0])
+            for i in range(3):
+                target[i] += counts[i]
+        return merged
+
+    def finalize(self, state: Dict[Any, List[int]]) -> float:
+        total_support = sum(tp + fn for tp, _, fn in state.values())
+        if total_support == 0:
+            return 0.0
+        weighted = 0.0
+        for tp, fp, fn in state.values():
+            if tp:
+                weighted += (tp + fn) * 2 * tp / (2 * tp + fp + fn)
+        return weighted / total_support
+
+class VarianceAccumulator(MetricAccumulator):
+    """``[count, mean, sum of squared deviations]`` of ``input_key``, merged with Chan's parallel formula.
+
+    ``finalize`` returns the population standard deviation; subclasses map it to a score.
+    Unlike ``MeanAccumulator`` this is not exact: Welford updates and Chan merges
+    round at every step, so the result can differ in the last few bits depending
+    on how the values were sharded. It stays numerically stable, which a sum of
+    squares would not.
+    """
+
+    def __init__(self, input_key: str):
+        self.input_key = input_key
+
+    def init(self) -> List[float]:
+        return [0, 0.0, 0.0]
+
+    def update(self, state: List[float], **inputs: Any) -> List[float]:
+        count, mean, squared_deviations = state
+        for value in inputs[self.input_key]:
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            squared_deviations += delta * (value - mean)
+        return [count, mean, squared_deviations]
+
+    def merge(self, state: List[float], other: List[float]) -> List[float]:
+        count = state[0] + other[0]
+        if count == 0:
+            return [0, 0.0, 0.0]
+        delta = other[1] - state[1]
+        mean = state[1] + delta * other[0] / count
+        squared_deviations = state[2] + other[2] + delta * delta * state[0] * other[0] / count
+        return [count, mean, squared_deviations]
+
+    def finalize(self, state: List[float]) -> float:
+        return math.sqrt(state[2] / state[0]) if state[0] else float("nan")
+
+class ConsistencyAccumulator(VarianceAccumulator):
+    def __init__(self):
+        super().__init__("accuracies")
+
+    def finalize(self, state: List[float]) -> float:
+        return 1 - super().finalize(state)
+
+@register_metric("OverallAccuracy", field=MetricField.Accuracy, input_keys=["ground_truths", "predictions"],
+                 accumulator=ElementAccuracyAccumulator())
 def calculate_overall_accuracy_wrapper(ground_truths: List[Dict[str, Any]], predictions: List[Dict[str, Any]]) -> float:
     return calculate_overall_accuracy(ground_truths, predictions)
 
-@register_metric("FieldSpecificAccuracy", field=MetricField.Accuracy, input_keys=["ground_truths", "predictions"])
+@register_metric("FieldSpecificAccuracy", field=MetricField.Accuracy, input_keys=["ground_truths", "predictions"],
+                 accumulator=FieldAccuracyAccumulator())
 def calculate_field_specific_accuracy(ground_truths: List[Dict[str, Any]], predictions: List[Dict[str, Any]]) -> Dict[str, float]:
     """Calculate accuracy for each field in structured data."""
     field_accuracies = {}
@@ -47,27 +259,32 @@ def calculate_field_specific_accuracy(ground_truths: List[Dict[str, Any]], predi
         field_accuracies[field] = accuracy_score(field_true, field_pred)
     return field_accuracies
 
-@register_metric("AverageLatency", field=MetricField.Performance, input_keys=["latencies"])
+@register_metric("AverageLatency", field=MetricField.Performance, input_keys=["latencies"],
+                 accumulator=MeanAccumulator("latencies"))
 def calculate_average_latency(latencies: List[float]) -> float:
     """Calculate the average latency of predictions."""
     return float(np.mean(latencies))
 
-@register_metric("Throughput", field=MetricField.Performance, input_keys=["total_items", "total_time"])
+@register_metric("Throughput", field=MetricField.Performance, input_keys=["total_items", "total_time"],
+                 accumulator=ThroughputAccumulator())
 def calculate_throughput(total_items: int, total_time: float) -> float:
     """Calculate the throughput of the system."""
     return total_items / total_time if total_time > 0 else 0
 
-@register_metric("ErrorRate", field=MetricField.Accuracy, input_keys=["y_true", "y_pred"])
+@register_metric("ErrorRate", field=MetricField.Accuracy, input_keys=["y_true", "y_pred"],
+                 accumulator=ElementAccuracyAccumulator("y_true", "y_pred", error_rate=True))
 def calculate_error_rate(y_true: List[Any], y_pred: List[Any]) -> float:
     """Calculate the error rate of predictions."""
     return 1 - calculate_overall_accuracy(y_true, y_pred)
 
-@register_metric("ConfidenceScore", field=MetricField.Confidence, input_keys=["confidences"])
+@register_metric("ConfidenceScore", field=MetricField.Confidence, input_keys=["confidences"],
+                 accumulator=MeanAccumulator("confidences"))
 def calculate_confidence_score(confidences: List[float]) -> float:
     """Calculate the average confidence score of predictions."""
     return float(np.mean(confidences))
 
-@register_metric("F1Score", field=MetricField.Accuracy, input_keys=["y_true", "y_pred"])
+@register_metric("F1Score", field=MetricField.Accuracy, input_keys=["y_true", "y_pred"],
+                 accumulator=WeightedF1Accumulator())
 def calculate_f1_score(y_true: List[Any], y_pred: List[Any]) -> float:
     """Calculate the F1 score of predictions."""
     return f1_score(y_true, y_pred, average='weighted')
@@ -77,7 +294,8 @@ def calculate_robustness_score(normal_accuracy: float, challenging_accuracy: flo
     """Calculate the robustness score based on performance on normal vs challenging inputs."""
     return challenging_accuracy / normal_accuracy if normal_accuracy > 0 else 0
 
-@register_metric("ConsistencyScore", field=MetricField.Consistency, input_keys=["accuracies"])
+@register_metric("ConsistencyScore", field=MetricField.Consistency, input_keys=["accuracies"],
+                 accumulator=ConsistencyAccumulator())
 def calculate_consistency_score(accuracies: List[float]) -> float:
     """Calculate the consistency score based on accuracies."""
     return float(1 - np.std(accuracies))
@@ -1,4 +1,4 @@
-from typing import Dict, Callable, Any, Optional, List
+from typing import Dict, Callable, Any, Iterable, Optional, List
 from functools import wraps
 import inspect
 import re
@@ -7,12 +7,81 @@ from llmdatalens.core.enums import MetricField
 def is_pascal_case(s: str) -> bool:
     return re.match(r'^[A-Z][a-z0-9]+(?:[A-Z][a-z0-9]+)*$', s) is not None
 
+class MetricAccumulator:
+    """Mergeable partial state of a metric, for evaluations split into shards.
+
+    ``init`` returns an empty state, ``update`` folds one shard's inputs (the
+    metric's ``input_keys``, as the list-based function takes them) into a state,
+    ``merge`` combines two states and ``finalize`` turns a state into the metric
+    value. States are small plain values (numbers, lists, dicts) that pickle
+    cheaply, so shards evaluated in other processes or on other machines only
+    ship their state.
+    """
+
+    def init(self) -> Any:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def update(self, state: Any, **inputs: Any) -> Any:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def merge(self, state: Any, other: Any) -> Any:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def finalize(self, state: Any) -> Any:
+        raise NotImplementedError("Subclasses must implement this method")
+
 class MetricInfo:
-    def __init__(self, func: Callable, description: str, field: MetricField, input_keys: List[str]):
+    def __init__(
+        self,
+        func: Callable,
+        description: str,
+        field: MetricField,
+        input_keys: List[str],
+        accumulator: Optional[MetricAccumulator] = None,
+    ):
         self.func = func
         self.description = description
         self.field = field
         self.input_keys = input_keys
+        self.accumulator = accumulator
+
+    def partial(self, **inputs: Any) -> Any:
+        """State of one shard. Without an accumulator this is the shard's inputs themselves.
+
+        Without an accumulator every input must be a list of per-item values, since
+        shards are combined by concatenating them; scalar inputs raise ``ValueError``.
+        """
+        if self.accumulator is None:
+            state = {}
+            for key in self.input_keys:
+                value = inputs[key]
+                if isinstance(value, (str, bytes, dict)) or not isinstance(value, Iterable):
+                    raise ValueError(
+                        f"Input '{key}' is not a list of per-item values; a metric without an accumulator "
+                        "can only be split into shards over list inputs"
+                    )
+                state[key] = list(value)
+            return state
+        return self.accumulator.update(self.accumulator.init(), **inputs)
+
+    def combine(self, states: Iterable[Any]) -> Any:
+        """Merge shard states from ``partial`` and compute the metric.
+
+        Without an accumulator the shards' input lists are concatenated and passed to
+        the list-based function.
+        """
+        if self.accumulator is None:
+            inputs: Dict[str, List[Any]] = {key: [] for key in self.input_keys}
+            for state in states:
+                for key in self.input_keys:
+                    if not isinstance(state[key], list):
+                        raise ValueError(f"Input '{key}' is not a list and cannot be combined across shards")
+                    inputs[key].extend(state[key])
+            return self.func(**inputs)
+        merged = self.accumulator.init()
+        for state in states:
+            merged = self.accumulator.merge(merged, state)
+        return self.accumulator.finalize(merged)
 
 class MetricsRegistry:
     _instance = None
@@ -24,13 +93,19 @@ class MetricsRegistry:
         return cls._instance
 
     @classmethod
-    def register(cls, name: str, field: MetricField = MetricField.Other, input_keys: List[str] = []):
+    def register(
+        cls,
+        name: str,
+        field: MetricField = MetricField.Other,
+        input_keys: List[str] = [],
+        accumulator: Optional[MetricAccumulator] = None,
+    ):
         if not is_pascal_case(name):
             raise ValueError(f"Metric name '{name}' is not in PascalCase.")
         
         def decorator(func: Callable):
             description = inspect.getdoc(func) or "No description provided"
-            cls._registry[name] = MetricInfo(func, description.strip(), field, input_keys or [])
+            cls._registry[name] = MetricInfo(func, description.strip(), field, input_keys or [], accumulator)
             setattr(MetricNames, name, name)  # Add the metric name to MetricNames class
             @wraps(func)
             def wrapper(*args, **kwargs):
@@ -51,5 +126,10 @@ class MetricNames:
 
 metrics_registry = MetricsRegistry()
 
-def register_metric(name: str, field: MetricField = MetricField.Other, input_keys: List[str] = []):
-    return metrics_registry.register(name, field, input_keys)
+def register_metric(
+    name: str,
+    field: MetricField = MetricField.Other,
+    input_keys: List[str] = [],
+    accumulator: Optional[MetricAccumulator] = None,
+):
+    return metrics_registry.register(name, field, input_keys, accumulator)
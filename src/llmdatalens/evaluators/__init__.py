@@ -1,4 +1,10 @@
 from .structured_output_evaluator import StructuredOutputEvaluator
-from .field_evaluators import create_field_evaluator, LLMEvaluator
+from .field_evaluators import create_field_evaluator, LLMEvaluator, StringPrefilter
+from .evaluation_plan import EvaluationPlan, compile_evaluation_plan
+from .judge_pipeline import evaluate_batch
+from .judge_cache import JudgmentCache
+from .aggregation import ResultAggregator
+from .columnar import ColumnarResult, evaluate_columnar
+from .result_store import CompactResultStore, StoredEvaluationResult
 
-__all__ = ['StructuredOutputEvaluator', 'create_field_evaluator', 'LLMEvaluator' ]
\ No newline at end of file
+__all__ = ['StructuredOutputEvaluator', 'create_field_evaluator', 'LLMEvaluator', 'EvaluationPlan', 'compile_evaluation_plan', 'evaluate_batch', 'JudgmentCache', 'StringPrefilter', 'ResultAggregator', 'ColumnarResult', 'evaluate_columnar', 'CompactResultStore', 'StoredEvaluationResult']
\ No newline at end of file
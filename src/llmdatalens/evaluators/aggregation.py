@@ -0,0 +1,73 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+from llmdatalens.experiment.models import EvaluationResult, FieldResult
+
+class ResultAggregator:
+    """Running aggregate of per-output evaluation results.
+
+    Only counters are kept: per field the correct and evaluated counts and, for
+    number fields, the sums of relative and absolute errors. Memory grows with the
+    number of fields rather than the number of outputs. Per-output predictions and
+    details are not retained unless ``keep_individual_results`` is set, in which
+    case each field also lists its predicted values, ground truths and details.
+    """
+
+    def __init__(self, keep_individual_results: bool = False):
+        self.keep_individual_results = keep_individual_results
+        self.num_evaluations = 0
+        self.accuracy_sum = 0.0
+        # field name -> [correct count, evaluated count, relative error sum, absolute error sum, error count]
+        self._field_counts: Dict[str, List[float]] = {}
+        # field name -> (predicted values, ground truths, details), only with keep_individual_results
+        self._individual_results: Optional[Dict[str, Tuple[List[Any], List[Any], List[Any]]]] = (
+            {} if keep_individual_results else None
+        )
+
+    def add(self, result: EvaluationResult):
+        self.num_evaluations += 1
+        self.accuracy_sum += result.overall_accuracy
+        for field_name, field_result in result.field_results.items():
+            counts = self._field_counts.get(field_name)
+            if counts is None:
+                counts = self._field_counts[field_name] = [0, 0, 0.0, 0.0, 0]
+            counts[0] += field_result.correct
+            counts[1] += 1
+            errors = field_result.details.get("details") if field_result.details else None
+            if isinstance(errors, dict):
+                relative_error = errors.get("relative_error")
+                absolute_error = errors.get("absolute_error")
+                if _is_finite(relative_error) and _is_finite(absolute_error):
+                    counts[2] += relative_error
+                    counts[3] += absolute_error
+                    counts[4] += 1
+            if self._individual_results is not None:
+                predicted, ground_truth, details = self._individual_results.setdefault(field_name, ([], [], []))
+                predicted.append(field_result.predicted)
+                ground_truth.append(field_result.ground_truth)
+                details.append(field_result.details)
+
+    def result(self, into: Optional[EvaluationResult] = None) -> EvaluationResult:
+        """Build the aggregate result, or update ``into`` in place and return it."""
+        field_results = {}
+        for field_name, (correct, total, relative_error_sum, absolute_error_sum, error_count) in self._field_counts.items():
+            details: Dict[str, Any] = {"accuracy": correct / total, "correct_count": correct, "total_count": total}
+            if error_count:
+                details["mean_relative_error"] = relative_error_sum / error_count
+                details["mean_absolute_error"] = absolute_error_sum / error_count
+            predicted = ground_truth = None
+            if self._individual_results is not None:
+                predicted, ground_truth, details["individual_results"] = self._individual_results[field_name]
+            field_results[field_name] = FieldResult(
+                correct=correct == total, predicted=predicted, ground_truth=ground_truth, details=details
+            )
+        overall_accuracy = self.accuracy_sum / self.num_evaluations if self.num_evaluations else 0
+        details = {"num_evaluations": self.num_evaluations}
+        if into is None:
+            return EvaluationResult(overall_accuracy=overall_accuracy, field_results=field_results, details=details)
+        into.overall_accuracy = overall_accuracy
+        into.field_results = field_results
+        into.details = details
+        return into
+
+def _is_finite(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
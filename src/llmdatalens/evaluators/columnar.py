@@ -0,0 +1,139 @@
+"""Column-at-a-time evaluation of many outputs against one plan.
+
+``evaluate_columnar`` pivots N ``(predicted_output, gt_output)`` dicts into one
+column per field and decides each column in a few NumPy operations:
+
+* number fields use the ``NumberFieldEvaluator`` rule (relative *and* absolute
+  error within tolerance); ``np.isclose`` is not used because it combines the two
+  tolerances into one bound and would disagree with the scalar path;
+* exact-match string fields are compared pair by pair straight into a boolean
+  column: fixed-width ``str`` arrays would size every element for the longest
+  value;
+* enum fields map values to their position in the enum and compare positions.
+
+Every other field (LLM-judged strings, arrays, nested objects) and any value the
+vectorized rules cannot represent exactly (integers beyond 2**53, unhashable
+enum values) is decided by the field's own ``evaluate``, so the per-field
+correctness is the same as ``EvaluationPlan.evaluate`` row by row.
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from .evaluation_plan import EvaluationPlan
+from .field_evaluators import EnumFieldEvaluator, FieldEvaluator, NumberFieldEvaluator, StringFieldEvaluator
+
+# Integers beyond this are not exactly representable as float64
+_MAX_EXACT_INTEGER = 2 ** 53
+
+class ColumnarResult:
+    """Per-field correctness of a batch: ``correct[row, column]`` for ``field_names[column]``."""
+
+    def __init__(self, field_names: Tuple[str, ...], correct: np.ndarray):
+        self.field_names = field_names
+        self.correct = correct
+
+    def __len__(self) -> int:
+        return self.correct.shape[0]
+
+    @property
+    def overall_accuracy(self) -> np.ndarray:
+        """Fraction of correct fields per row, as ``EvaluationResult.overall_accuracy``."""
+        if not self.field_names:
+            return np.zeros(len(self))
+        return self.correct.sum(axis=1) / len(self.field_names)
+
+    def field_accuracy(self) -> Dict[str, float]:
+        if not len(self):
+            return {field_name: 0.0 for field_name in self.field_names}
+        return dict(zip(self.field_names, self.correct.mean(axis=0).tolist()))
+
+def evaluate_columnar(
+    plan: EvaluationPlan,
+    predicted_outputs: Sequence[Dict[str, Any]],
+    gt_outputs: Sequence[Dict[str, Any]],
+) -> ColumnarResult:
+    if len(predicted_outputs) != len(gt_outputs):
+        raise ValueError("The number of predicted outputs and ground truths must match")
+    rows = len(predicted_outputs)
+    correct = np.zeros((rows, len(plan.field_evaluators)), dtype=bool)
+    for column, field_evaluator in enumerate(plan.field_evaluators):
+        field_name = field_evaluator.field_name
+        predicted = [output.get(field_name) for output in predicted_outputs]
+        ground_truth = [output.get(field_name) for output in gt_outputs]
+        if isinstance(field_evaluator, NumberFieldEvaluator):
+            correct[:, column] = _number_column(field_evaluator, predicted, ground_truth)
+        elif isinstance(field_evaluator, EnumFieldEvaluator):
+            correct[:, column] = _enum_column(field_evaluator, predicted, ground_truth)
+        elif isinstance(field_evaluator, StringFieldEvaluator) and not field_evaluator.use_llm:
+            correct[:, column] = _exact_string_column(predicted, ground_truth)
+        else:
+            correct[:, column] = _scalar_column(field_evaluator, predicted, ground_truth, range(rows))
+    return ColumnarResult(tuple(f.field_name for f in plan.field_evaluators), correct)
+
+def _scalar_column(field_evaluator: FieldEvaluator, predicted: List[Any], ground_truth: List[Any], rows) -> np.ndarray:
+    return np.fromiter(
+        (field_evaluator.evaluate(predicted[row], ground_truth[row]).get("correct", False) for row in rows),
+        dtype=bool, count=len(rows)
+    )
+
+def _numbers(values: List[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the values as float64 (NaN where not a number), the number mask and the mask of inexact integers."""
+    is_number = np.fromiter((isinstance(value, (int, float)) for value in values), dtype=bool, count=len(values))
+    inexact = np.fromiter(
+        (isinstance(value, int) and abs(value) > _MAX_EXACT_INTEGER for value in values), dtype=bool, count=len(values)
+    )
+    numbers = np.fromiter(
+        (value if number and not big else np.nan for value, number, big in zip(values, is_number, inexact)),
+        dtype=np.float64, count=len(values)
+    )
+    return numbers, is_number, inexact
+
+def _number_column(field_evaluator: NumberFieldEvaluator, predicted: List[Any], ground_truth: List[Any]) -> np.ndarray:
+    predicted_numbers, predicted_valid, predicted_inexact = _numbers(predicted)
+    gt_numbers, gt_valid, gt_inexact = _numbers(ground_truth)
+    with np.errstate(invalid="ignore", over="ignore"):
+        absolute_error = np.abs(predicted_numbers - gt_numbers)
+        relative_error = absolute_error / np.maximum(np.abs(gt_numbers), 1e-9)
+        correct = (
+            predicted_valid & gt_valid
+            & (relative_error <= field_evaluator.relative_tolerance)
+            & (absolute_error <= field_evaluator.absolute_tolerance)
+        )
+    fallback = np.flatnonzero(predicted_valid & gt_valid & (predicted_inexact | gt_inexact))
+    if fallback.size:
+        correct[fallback] = _scalar_column(field_evaluator, predicted, ground_truth, fallback)
+    return correct
+
+def _enum_codes(values: List[Any], codes: Dict[Any, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Position of each value in the enum (-1 when absent) and the mask of unhashable values."""
+    positions = np.full(len(values), -1, dtype=np.int64)
+    unhashable = np.zeros(len(values), dtype=bool)
+    for row, value in enumerate(values):
+        try:
+            positions[row] = codes.get(value, -1)
+        except TypeError:
+            unhashable[row] = True
+    return positions, unhashable
+
+def _enum_column(field_evaluator: EnumFieldEvaluator, predicted: List[Any], ground_truth: List[Any]) -> np.ndarray:
+    codes: Dict[Any, int] = {}
+    try:
+        for position, value in enumerate(field_evaluator.field_schema.get("enum", [])):
+            codes.setdefault(value, position)
+    except TypeError:
+        # Enums of objects or lists are rare; leave them to the scalar path
+        return _scalar_column(field_evaluator, predicted, ground_truth, range(len(predicted)))
+    predicted_codes, predicted_unhashable = _enum_codes(predicted, codes)
+    gt_codes, gt_unhashable = _enum_codes(ground_truth, codes)
+    correct = (predicted_codes >= 0) & (predicted_codes == gt_codes)
+    fallback = np.flatnonzero(predicted_unhashable | gt_unhashable)
+    if fallback.size:
+        correct[fallback] = _scalar_column(field_evaluator, predicted, ground_truth, fallback)
+    return correct
+
+def _exact_string_column(predicted: List[Any], ground_truth: List[Any]) -> np.ndarray:
+    return np.fromiter(
+        (isinstance(p, str) and isinstance(g, str) and p == g for p, g in zip(predicted, ground_truth)),
+        dtype=bool, count=len(predicted)
+    )
+
+__all__ = ['ColumnarResult', 'evaluate_columnar']
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict
+from llmdatalens.experiment.models import EvaluationResult, FieldResult, FunctionSchema
+from .llm_evaluator import LLMEvaluator
+from .field_evaluators import FieldEvaluator, StringFieldEvaluator, StringPrefilter, create_field_evaluator
+
+class EvaluationPlan(BaseModel):
+    """Field evaluators compiled once from a function schema and reused for every output."""
+    schema_hash: str
+    field_evaluators: Tuple[FieldEvaluator, ...]
+
+    model_config = ConfigDict(frozen=True)
+
+    def evaluate(self, predicted_output: Dict[str, Any], gt_output: Dict[str, Any]) -> EvaluationResult:
+        evaluations = [
+            field_evaluator.evaluate(
+                predicted_output.get(field_evaluator.field_name),
+                gt_output.get(field_evaluator.field_name)
+            )
+            for field_evaluator in self.field_evaluators
+        ]
+        return self.build_result(evaluations)
+
+    def evaluate_deferred(self, predicted_output: Dict[str, Any], gt_output: Dict[str, Any]
+                          ) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, Optional[float]]]]:
+        """Evaluate every field that does not need the LLM judge.
+
+        Returns the per-field evaluations, with ``None`` left at the positions that
+        still need a judgment, and ``(position, prefilter similarity)`` for each of
+        those positions, to pass on to ``result_from_judgment``.
+        """
+        evaluations: List[Optional[Dict[str, Any]]] = []
+        pending = []
+        for index, field_evaluator in enumerate(self.field_evaluators):
+            predicted_value = predicted_output.get(field_evaluator.field_name)
+            ground_truth = gt_output.get(field_evaluator.field_name)
+            if isinstance(field_evaluator, StringFieldEvaluator):
+                evaluation, similarity = field_evaluator.decide_locally(predicted_value, ground_truth)
+                if evaluation is None:
+                    pending.append((index, similarity))
+            else:
+                evaluation = field_evaluator.evaluate(predicted_value, ground_truth)
+            evaluations.append(evaluation)
+        return evaluations, pending
+
+    def build_result(self, evaluations: List[Dict[str, Any]]) -> EvaluationResult:
+        field_results = {}
+        total_correct = 0
+
+        for field_evaluator, evaluation in zip(self.field_evaluators, evaluations):
+            field_results[field_evaluator.field_name] = FieldResult(
+                correct=evaluation.get("correct", False),
+                predicted=evaluation.get("predicted"),
+                ground_truth=evaluation.get("ground_truth"),
+                details={k: v for k, v in evaluation.items() if k not in ["correct", "predicted", "ground_truth"]}
+            )
+
+            if evaluation.get("correct", False):
+                total_correct += 1
+
+        total_fields = len(self.field_evaluators)
+        overall_accuracy = total_correct / total_fields if total_fields > 0 else 0
+
+        return EvaluationResult(
+            overall_accuracy=overall_accuracy,
+            field_results=field_results
+        )
+
+_PLAN_CACHE_SIZE = 128
+_plan_cache: "OrderedDict[Tuple[str, Optional[int], Optional[int], Optional[str]], Tuple[Tuple[Any, Any], EvaluationPlan]]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+def hash_function_schema(function_schema: FunctionSchema) -> str:
+    # Key order is kept in the hash because it decides the order of field results
+    return hashlib.md5(json.dumps(function_schema.parameters).encode()).hexdigest()
+
+def compile_evaluation_plan(
+    function_schema: FunctionSchema,
+    llm_evaluator: Optional[LLMEvaluator] = None,
+    string_prefilter: Optional[StringPrefilter] = None,
+    array_matching: Optional[str] = None,
+) -> EvaluationPlan:
+    """Return the evaluation plan for a schema, compiling it only the first time the schema is seen.
+
+    LLM-judged string fields share ``llm_evaluator`` and ``string_prefilter``, and
+    array fields use ``array_matching``; without them each field gets the defaults.
+    """
+    schema_hash = hash_function_schema(function_schema)
+    options = (llm_evaluator, string_prefilter)
+    key = (schema_hash, *(None if option is None else id(option) for option in options), array_matching)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+        if cached is not None and all(a is b for a, b in zip(cached[0], options)):
+            _plan_cache.move_to_end(key)
+            return cached[1]
+
+    field_evaluators = tuple(
+        create_field_evaluator(
+            field_name, field_schema, llm_evaluator, string_prefilter, array_matching, function_schema.parameters
+        )
+        for field_name, field_schema in function_schema.parameters["properties"].items()
+    )
+    plan = EvaluationPlan(schema_hash=schema_hash, field_evaluators=field_evaluators)
+
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+        if cached is not None and all(a is b for a, b in zip(cached[0], options)):
+            return cached[1]
+        _plan_cache[key] = (options, plan)
+        while len(_plan_cache) > _PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
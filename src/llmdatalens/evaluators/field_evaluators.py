@@ -1,8 +1,12 @@
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 from .llm_evaluator import LLMEvaluator
+from .schema_evaluator import SchemaComparator, resolve_schema, schema_type
 import json
 import math
+import unicodedata
+import numpy as np
 
 class FieldEvaluator(BaseModel):
     field_name: str
@@ -53,18 +57,87 @@ class EnumFieldEvaluator(FieldEvaluator):
             "valid_options": enum_values
         }
 
+class StringPrefilter(BaseModel):
+    """Cheap comparisons tried, in order, before a string pair is sent to the LLM judge.
+
+    Tiers: ``exact`` match, ``normalized`` match (case and whitespace folded), then
+    ``ngram``: the Dice similarity of character n-grams is accepted at or above
+    ``accept_threshold`` and rejected at or below ``reject_threshold``. Anything
+    in between is ambiguous and goes to the judge. Either threshold can be
+    ``None`` to disable that side.
+
+    Both thresholds are ``None`` by default, so only the exact and normalized
+    tiers decide on their own: n-gram similarity is blind to meaning ("100
+    users" and "900 users" score above 0.9), so accepting on it is opt-in.
+    """
+    normalize: bool = Field(default=True)
+    ngram_size: int = Field(default=3)
+    accept_threshold: Optional[float] = Field(default=None)
+    reject_threshold: Optional[float] = Field(default=None)
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+    def similarity(self, predicted_value: str, ground_truth: str) -> float:
+        predicted_ngrams = self._ngrams(self.normalize_text(predicted_value))
+        ground_truth_ngrams = self._ngrams(self.normalize_text(ground_truth))
+        total = sum(predicted_ngrams.values()) + sum(ground_truth_ngrams.values())
+        if total == 0:
+            return 1.0
+        return 2 * sum((predicted_ngrams & ground_truth_ngrams).values()) / total
+
+    def _ngrams(self, text: str) -> Counter:
+        if not text:
+            return Counter()
+        padded = f" {text} "
+        n = min(self.ngram_size, len(padded))
+        return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+    def decide(self, predicted_value: str, ground_truth: str) -> Tuple[Optional[bool], str, Optional[float]]:
+        """Return ``(correct, tier, similarity)``; ``correct`` is ``None`` when the judge must decide."""
+        if predicted_value == ground_truth:
+            return True, "exact", None
+        if self.normalize and self.normalize_text(predicted_value) == self.normalize_text(ground_truth):
+            return True, "normalized", None
+        if self.accept_threshold is None and self.reject_threshold is None:
+            return None, "llm", None
+        similarity = self.similarity(predicted_value, ground_truth)
+        if self.accept_threshold is not None and similarity >= self.accept_threshold:
+            return True, "ngram", similarity
+        if self.reject_threshold is not None and similarity <= self.reject_threshold:
+            return False, "ngram", similarity
+        return None, "llm", similarity
+
 class StringFieldEvaluator(FieldEvaluator):
     llm_evaluator: LLMEvaluator = Field(default_factory=LLMEvaluator)
     use_llm: bool = Field(default=False)
+    prefilter: Optional[StringPrefilter] = Field(default_factory=StringPrefilter)
 
     def evaluate(self, predicted_value: Any, ground_truth: Any) -> Dict[str, Any]:
+        local_result, similarity = self.decide_locally(predicted_value, ground_truth)
+        if local_result is not None:
+            return local_result
+
+        # For complex string fields, use LLM evaluation
+        llm_evaluation = self.llm_evaluator.evaluate_relevancy(ground_truth, predicted_value)
+        return self.result_from_judgment(predicted_value, ground_truth, llm_evaluation, similarity)
+
+    def evaluate_locally(self, predicted_value: Any, ground_truth: Any) -> Optional[Dict[str, Any]]:
+        """Evaluate without the LLM judge, or return ``None`` when the pair needs a judgment."""
+        return self.decide_locally(predicted_value, ground_truth)[0]
+
+    def decide_locally(self, predicted_value: Any, ground_truth: Any) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """Return ``(result, similarity)``: ``result`` is ``None`` when the pair needs a judgment,
+        and ``similarity`` is the prefilter's n-gram similarity when it computed one.
+        """
         if not isinstance(predicted_value, str) or not isinstance(ground_truth, str):
             return {
                 "correct": False,
                 "predicted": predicted_value,
                 "ground_truth": ground_truth,
                 "error": "Type mismatch"
-            }
+            }, None
 
         if not self.use_llm:
             # For simple string fields, use exact matching
@@ -74,30 +147,145 @@ class StringFieldEvaluator(FieldEvaluator):
                 "predicted": predicted_value,
                 "ground_truth": ground_truth,
                 "details": {"match_type": "exact"}
-            }
+            }, None
 
-        # For complex string fields, use LLM evaluation
-        llm_evaluation = self.llm_evaluator.evaluate_relevancy(ground_truth, predicted_value)
+        if self.prefilter is None:
+            return None, None
+        is_correct, tier, similarity = self.prefilter.decide(predicted_value, ground_truth)
+        if is_correct is None:
+            return None, similarity
+        details: Dict[str, Any] = {"match_type": tier}
+        if similarity is not None:
+            details["similarity"] = similarity
+        return {
+            "correct": is_correct,
+            "predicted": predicted_value,
+            "ground_truth": ground_truth,
+            "tier": tier,
+            "details": details
+        }, similarity
 
+    def result_from_judgment(self, predicted_value: str, ground_truth: str, llm_evaluation: Dict[str, Any],
+                             similarity: Optional[float] = None) -> Dict[str, Any]:
+        """Build the field result from a judge verdict; ``similarity`` is the prefilter's, from ``decide_locally``."""
         if "error" in llm_evaluation:
             return {
                 "correct": False,
                 "predicted": predicted_value,
                 "ground_truth": ground_truth,
+                "tier": "llm",
                 "error": llm_evaluation["error"]
             }
 
         relevancy_score = llm_evaluation.get("relevancy_score", 0)
         is_correct = relevancy_score >= 0.8  # We can adjust this threshold as needed
 
-        return {
+        result = {
             "correct": is_correct,
             "predicted": predicted_value,
             "ground_truth": ground_truth,
+            "tier": "llm",
             "details": llm_evaluation
         }
+        if similarity is not None:
+            # Kept next to the verdict so the thresholds can be tuned against the judge
+            result["similarity"] = similarity
+        return result
+
+class SchemaFieldEvaluator(FieldEvaluator):
+    """Compares nested objects (and booleans) leaf by leaf, using the comparator each leaf's schema calls for.
+
+    ``root_schema`` is the document that ``$ref`` pointers in ``field_schema`` resolve against.
+    """
+    root_schema: Optional[Dict[str, Any]] = None
+    relative_tolerance: float = Field(default=1e-6)
+    absolute_tolerance: float = Field(default=1e-9)
+    _comparator: SchemaComparator = PrivateAttr()
+
+    def model_post_init(self, __context: Any):
+        self._comparator = SchemaComparator(
+            self.field_schema, self.root_schema, self.relative_tolerance, self.absolute_tolerance
+        )
+
+    def evaluate(self, predicted_value: Any, ground_truth: Any) -> Dict[str, Any]:
+        correct_leaves, total_leaves, mismatches = self._comparator.compare(predicted_value, ground_truth)
+        return {
+            "correct": correct_leaves == total_leaves,
+            "predicted": predicted_value,
+            "ground_truth": ground_truth,
+            "details": {
+                "leaf_accuracy": correct_leaves / total_leaves if total_leaves else 1.0,
+                "correct_leaves": correct_leaves,
+                "total_leaves": total_leaves,
+                "mismatches": mismatches
+            }
+        }
+
+ARRAY_MATCHING_MODES = ("ordered", "unordered", "assignment")
+
+def _items_equal(predicted_item: Any, ground_truth_item: Any) -> bool:
+    if predicted_item == ground_truth_item:
+        return True
+    if not isinstance(predicted_item, dict) or not isinstance(ground_truth_item, dict):
+        return False
+    # A key that is missing on one side matches an explicit None on the other
+    for key in predicted_item.keys() | ground_truth_item.keys():
+        if predicted_item.get(key) != ground_truth_item.get(key):
+            return False
+    return True
+
+def _item_similarity(predicted_item: Any, ground_truth_item: Any) -> float:
+    if isinstance(predicted_item, dict) and isinstance(ground_truth_item, dict):
+        keys = predicted_item.keys() | ground_truth_item.keys()
+        if not keys:
+            return 1.0
+        return sum(predicted_item.get(key) == ground_truth_item.get(key) for key in keys) / len(keys)
+    return 1.0 if predicted_item == ground_truth_item else 0.0
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _item_key(item: Any) -> str:
+    """Hashable canonical form of an item; equal items (as ``_items_equal`` sees them) share a key."""
+    if isinstance(item, dict):
+        item = {key: value for key, value in item.items() if value is not None}
+    return json.dumps(_canonical(item), sort_keys=True, separators=(",", ":"), default=str)
 
 class ArrayFieldEvaluator(FieldEvaluator):
+    """Compares arrays item by item.
+
+    ``matching`` selects how predicted items are paired with ground-truth items:
+    ``"ordered"`` pairs them by position; ``"unordered"`` pairs identical items
+    wherever they are, using a hash index of their canonical JSON; ``"assignment"``
+    also pairs the remaining items by maximum total key-level similarity
+    (``scipy.optimize.linear_sum_assignment``).
+
+    When the schema describes its items, items are compared leaf by leaf against
+    that schema (see ``SchemaComparator``) and the details also report leaf
+    accuracy; otherwise items are compared as raw values.
+    """
+    matching: str = Field(default="ordered")
+    root_schema: Optional[Dict[str, Any]] = None
+    _item_comparator: Optional[SchemaComparator] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any):
+        items_schema = self.field_schema.get("items")
+        if isinstance(items_schema, dict) and items_schema:
+            self._item_comparator = SchemaComparator(items_schema, self.root_schema or self.field_schema)
+
+    @field_validator("matching")
+    @classmethod
+    def _check_matching(cls, value: str) -> str:
+        if value not in ARRAY_MATCHING_MODES:
+            raise ValueError(f"Unknown array matching '{value}', expected one of {ARRAY_MATCHING_MODES}")
+        return value
+
     def evaluate(self, predicted_value: Any, ground_truth: Any) -> Dict[str, Any]:
         if not isinstance(predicted_value, list) or not isinstance(ground_truth, list):
             return {
@@ -107,6 +295,47 @@ class ArrayFieldEvaluator(FieldEvaluator):
                 "error": "Type mismatch"
             }
 
+        if self.matching == "ordered":
+            item_results, correct_items = self._match_ordered(predicted_value, ground_truth)
+        else:
+            item_results, correct_items = self._match_unordered(predicted_value, ground_truth)
+        total_items = max(len(predicted_value), len(ground_truth))
+
+        array_accuracy = correct_items / total_items if total_items > 0 else 0
+
+        details = {
+            "item_results": item_results,
+            "array_accuracy": array_accuracy,
+            "correct_items": correct_items,
+            "total_items": total_items
+        }
+        if self._item_comparator is not None:
+            correct_leaves = sum(item_result.pop("_correct_leaves") for item_result in item_results)
+            total_leaves = sum(item_result.pop("_total_leaves") for item_result in item_results)
+            details["leaf_accuracy"] = correct_leaves / total_leaves if total_leaves else 1.0
+            details["correct_leaves"] = correct_leaves
+            details["total_leaves"] = total_leaves
+        if self.matching != "ordered":
+            details["matching"] = self.matching
+        return {
+            "correct": array_accuracy == 1,  # Only correct if all items are correct
+            "predicted": predicted_value,
+            "ground_truth": ground_truth,
+            "details": details
+        }
+
+    def _compare_items(self, predicted_item: Any, ground_truth_item: Any, item_result: Dict[str, Any]) -> bool:
+        """Compare one pair of items, recording leaf counts and mismatches on ``item_result`` when items have a schema."""
+        if self._item_comparator is None:
+            return _items_equal(predicted_item, ground_truth_item)
+        correct_leaves, total_leaves, mismatches = self._item_comparator.compare(predicted_item, ground_truth_item)
+        item_result["_correct_leaves"] = correct_leaves
+        item_result["_total_leaves"] = total_leaves
+        if mismatches:
+            item_result["mismatches"] = mismatches
+        return correct_leaves == total_leaves
+
+    def _match_ordered(self, predicted_value: List[Any], ground_truth: List[Any]) -> Tuple[List[Dict[str, Any]], int]:
         item_results = []
         correct_items = 0
         total_items = max(len(predicted_value), len(ground_truth))
@@ -115,48 +344,116 @@ class ArrayFieldEvaluator(FieldEvaluator):
             if i < len(predicted_value) and i < len(ground_truth):
                 predicted_item = predicted_value[i]
                 ground_truth_item = ground_truth[i]
-                
-                # Compare each field in the item
-                item_correct = True
-                for key in set(predicted_item.keys()) | set(ground_truth_item.keys()):
-                    if predicted_item.get(key) != ground_truth_item.get(key):
-                        item_correct = False
-                        break
-                
+
+                item_result = {"predicted": predicted_item, "ground_truth": ground_truth_item}
+                item_correct = self._compare_items(predicted_item, ground_truth_item, item_result)
                 if item_correct:
                     correct_items += 1
-                
-                item_results.append({
-                    "correct": item_correct,
-                    "predicted": predicted_item,
-                    "ground_truth": ground_truth_item
-                })
+                item_results.append({"correct": item_correct, **item_result})
             else:
-                item_results.append({
-                    "correct": False,
-                    "predicted": predicted_value[i] if i < len(predicted_value) else None,
-                    "ground_truth": ground_truth[i] if i < len(ground_truth) else None,
-                    "error": "Missing item in prediction or ground truth"
-                })
+                item_results.append(self._missing_item(
+                    predicted_value[i] if i < len(predicted_value) else None,
+                    ground_truth[i] if i < len(ground_truth) else None
+                ))
+        return item_results, correct_items
 
-        array_accuracy = correct_items / total_items if total_items > 0 else 0
+    def _missing_item(self, predicted_item: Any, ground_truth_item: Any, **indices: int) -> Dict[str, Any]:
+        item_result = {"correct": False, "predicted": predicted_item, "ground_truth": ground_truth_item, **indices}
+        if self._item_comparator is not None:
+            self._compare_items(predicted_item, ground_truth_item, item_result)
+            # Every leaf of an unpaired item counts against the array, even one that happens to be empty
+            item_result["_correct_leaves"] = 0
+            item_result.pop("mismatches", None)
+        item_result["error"] = "Missing item in prediction or ground truth"
+        return item_result
 
-        return {
-            "correct": array_accuracy == 1,  # Only correct if all items are correct
-            "predicted": predicted_value,
-            "ground_truth": ground_truth,
-            "details": {
-                "item_results": item_results,
-                "array_accuracy": array_accuracy,
-                "correct_items": correct_items,
-                "total_items": total_items
+    def _match_unordered(self, predicted_value: List[Any], ground_truth: List[Any]) -> Tuple[List[Dict[str, Any]], int]:
+        # Exact pass: index ground-truth items by canonical content, O(n)
+        buckets: Dict[str, Deque[int]] = {}
+        for index, item in enumerate(ground_truth):
+            buckets.setdefault(_item_key(item), deque()).append(index)
+        matches: Dict[int, Tuple[int, Optional[float]]] = {}
+        for index, item in enumerate(predicted_value):
+            bucket = buckets.get(_item_key(item))
+            if bucket:
+                matches[index] = (bucket.popleft(), None)
+
+        if self.matching == "assignment":
+            matched_ground_truth = {gt_index for gt_index, _ in matches.values()}
+            remaining_predicted = [index for index in range(len(predicted_value)) if index not in matches]
+            remaining_ground_truth = [index for index in range(len(ground_truth)) if index not in matched_ground_truth]
+            matches.update(self._assign(predicted_value, ground_truth, remaining_predicted, remaining_ground_truth))
+
+        item_results = []
+        correct_items = 0
+        matched_ground_truth = set()
+        for index, predicted_item in enumerate(predicted_value):
+            if index not in matches:
+                item_results.append(self._missing_item(predicted_item, None, predicted_index=index))
+                continue
+            gt_index, similarity = matches[index]
+            matched_ground_truth.add(gt_index)
+            item_result = {
+                "predicted": predicted_item,
+                "ground_truth": ground_truth[gt_index],
+                "predicted_index": index,
+                "ground_truth_index": gt_index
             }
+            if similarity is None and self._item_comparator is None:
+                item_correct = True
+            else:
+                item_correct = self._compare_items(predicted_item, ground_truth[gt_index], item_result)
+            correct_items += item_correct
+            if similarity is not None:
+                item_result["similarity"] = similarity
+            item_results.append({"correct": item_correct, **item_result})
+
+        for gt_index, ground_truth_item in enumerate(ground_truth):
+            if gt_index not in matched_ground_truth:
+                item_results.append(self._missing_item(None, ground_truth_item, ground_truth_index=gt_index))
+        return item_results, correct_items
+
+    def _assign(
+        self,
+        predicted_value: List[Any],
+        ground_truth: List[Any],
+        predicted_indices: List[int],
+        ground_truth_indices: List[int],
+    ) -> Dict[int, Tuple[int, Optional[float]]]:
+        """Pair the remaining items to maximize total similarity; pairs with nothing in common stay unmatched."""
+        if not predicted_indices or not ground_truth_indices:
+            return {}
+        from scipy.optimize import linear_sum_assignment
+
+        item_similarity = _item_similarity if self._item_comparator is None else self._leaf_similarity
+        similarity = np.array([
+            [item_similarity(predicted_value[p], ground_truth[g]) for g in ground_truth_indices]
+            for p in predicted_indices
+        ])
+        rows, columns = linear_sum_assignment(similarity, maximize=True)
+        return {
+            predicted_indices[row]: (ground_truth_indices[column], float(similarity[row, column]))
+            for row, column in zip(rows, columns)
+            if similarity[row, column] > 0
         }
 
-def create_field_evaluator(field_name: str, field_schema: Dict[str, Any]) -> FieldEvaluator:
-    field_type = field_schema.get("type", "string")
-    
-    if field_type == "number":
+    def _leaf_similarity(self, predicted_item: Any, ground_truth_item: Any) -> float:
+        correct_leaves, total_leaves, _ = self._item_comparator.compare(predicted_item, ground_truth_item)
+        return correct_leaves / total_leaves if total_leaves else 1.0
+
+def create_field_evaluator(
+    field_name: str,
+    field_schema: Dict[str, Any],
+    llm_evaluator: Optional[LLMEvaluator] = None,
+    string_prefilter: Optional[StringPrefilter] = None,
+    array_matching: Optional[str] = None,
+    root_schema: Optional[Dict[str, Any]] = None,
+) -> FieldEvaluator:
+    if root_schema is not None:
+        field_schema = resolve_schema(field_schema, root_schema)
+    field_type = schema_type(field_schema) or "string"
+
+    if field_type in ("number", "integer"):
         # Custom tolerances for specific fields
         if field_name == "total":
             return NumberFieldEvaluator(field_name=field_name, field_schema=field_schema, relative_tolerance=1e-4, absolute_tolerance=0.01)
@@ -165,9 +462,19 @@ def create_field_evaluator(field_name: str, field_schema: Dict[str, Any]) -> Fie
     elif "enum" in field_schema:
         return EnumFieldEvaluator(field_name=field_name, field_schema=field_schema)
     elif field_type == "array":
-        return ArrayFieldEvaluator(field_name=field_name, field_schema=field_schema)
+        if array_matching is not None:
+            return ArrayFieldEvaluator(field_name=field_name, field_schema=field_schema, matching=array_matching, root_schema=root_schema)
+        return ArrayFieldEvaluator(field_name=field_name, field_schema=field_schema, root_schema=root_schema)
+    elif field_type in ("object", "boolean"):
+        return SchemaFieldEvaluator(field_name=field_name, field_schema=field_schema, root_schema=root_schema)
     else:
         use_llm = field_name in ["customer_name", "description"]
-        return StringFieldEvaluator(field_name=field_name, field_schema=field_schema, use_llm=use_llm)
+        options: Dict[str, Any] = {}
+        if llm_evaluator is not None:
+            # Every judged field shares the caller's evaluator and its pooled client
+            options["llm_evaluator"] = llm_evaluator
+        if string_prefilter is not None:
+            options["prefilter"] = string_prefilter
+        return StringFieldEvaluator(field_name=field_name, field_schema=field_schema, use_llm=use_llm, **options)
 
-__all__ = ['create_field_evaluator', 'StringFieldEvaluator', 'NumberFieldEvaluator', 'EnumFieldEvaluator', 'ArrayFieldEvaluator']
+__all__ = ['create_field_evaluator', 'StringFieldEvaluator', 'StringPrefilter', 'NumberFieldEvaluator', 'EnumFieldEvaluator', 'ArrayFieldEvaluator', 'SchemaFieldEvaluator', 'ARRAY_MATCHING_MODES']
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS judgments (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_judgments_last_used ON judgments (last_used);
+"""
+
+class JudgmentCache:
+    """Persistent SQLite cache of LLM-judge responses.
+
+    Entries are keyed by judge model, prompt template version and the judged
+    texts, so re-running an experiment only pays for pairs the judge has not seen.
+    The least recently used entries are evicted once the cache holds more than
+    ``max_entries``; the size is checked every ``evict_interval`` writes.
+
+    The connection is opened lazily and is not pickled, so a cache can be handed
+    to worker processes, which reopen the same database file.
+    """
+
+    def __init__(self, database_path: str = "judgments.db", max_entries: int = 100_000, timeout: float = 30.0, evict_interval: int = 64):
+        self.database_path = database_path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writes_since_check = 0
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, input_text: str, actual_output: str) -> str:
+        return hashlib.sha256(json.dumps([model, prompt_version, input_text, actual_output]).encode()).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.database_path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT data FROM judgments WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute("UPDATE judgments SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, judgment: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO judgments (key, data, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(judgment), time.time())
+            )
+            self._writes_since_check += 1
+            if self._writes_since_check >= self.evict_interval:
+                self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        self._writes_since_check = 0
+        excess = connection.execute("SELECT COUNT(*) FROM judgments").fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM judgments WHERE key IN (SELECT key FROM judgments ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def evict(self):
+        """Trim the cache to ``max_entries`` now instead of at the next size check."""
+        with self._lock:
+            self._evict(self._connect())
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM judgments")
+            self._writes_since_check = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM judgments").fetchone()[0]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_connection"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,99 @@
+"""Concurrent LLM-judge resolution for batches of outputs.
+
+Every output in a batch is first evaluated with ``EvaluationPlan.evaluate_deferred``,
+which leaves a hole wherever a ``StringFieldEvaluator`` needs the judge. All of
+those judge calls are then sent together through ``AsyncOpenAI``, at most
+``max_concurrency`` at a time, and each judgment is merged back into the field
+it came from before the results are built.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from llmdatalens.experiment.models import EvaluationResult
+from .evaluation_plan import EvaluationPlan
+from .field_evaluators import StringFieldEvaluator
+from .llm_evaluator import LLMEvaluator
+from .openai_clients import aclose_async_clients
+
+T = TypeVar("T")
+
+DEFAULT_JUDGE_CONCURRENCY = 8
+
+# (plan, predicted output, ground truth data)
+BatchItem = Tuple[EvaluationPlan, Dict[str, Any], Dict[str, Any]]
+
+# (field evaluator, predicted value, ground truth value)
+JudgeRequest = Tuple[StringFieldEvaluator, str, str]
+
+async def judge_concurrently(requests: Sequence[JudgeRequest], max_concurrency: int = DEFAULT_JUDGE_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Resolve judge requests concurrently and return the judgments in request order.
+
+    Requests that share an ``LLMEvaluator`` are packed ``batch_size`` pairs per
+    chat completion; ``max_concurrency`` bounds the completions in flight.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    groups: Dict[int, Tuple[LLMEvaluator, List[int]]] = {}
+    for position, (field_evaluator, _, _) in enumerate(requests):
+        llm_evaluator = field_evaluator.llm_evaluator
+        groups.setdefault(id(llm_evaluator), (llm_evaluator, []))[1].append(position)
+
+    chunks = []
+    for llm_evaluator, positions in groups.values():
+        batch_size = max(1, llm_evaluator.batch_size)
+        for start in range(0, len(positions), batch_size):
+            chunks.append((llm_evaluator, positions[start:start + batch_size]))
+
+    async def judge(llm_evaluator: LLMEvaluator, positions: List[int]) -> List[Dict[str, Any]]:
+        pairs = [(requests[position][2], requests[position][1]) for position in positions]
+        async with semaphore:
+            if len(pairs) == 1:
+                return [await llm_evaluator.aevaluate_relevancy(*pairs[0])]
+            return await llm_evaluator.aevaluate_relevancy_batch(pairs)
+
+    judgments: List[Dict[str, Any]] = [{}] * len(requests)
+    try:
+        for (_, positions), chunk_judgments in zip(chunks, await asyncio.gather(*(judge(*chunk) for chunk in chunks))):
+            for position, judgment in zip(positions, chunk_judgments):
+                judgments[position] = judgment
+    finally:
+        await aclose_async_clients()
+    return judgments
+
+def run_coroutine(coroutine: Awaitable[T]) -> T:
+    """Run a coroutine to completion from synchronous code, even inside a running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # asyncio.run refuses to nest (e.g. in a notebook), so use a loop on another thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+def evaluate_batch(items: Sequence[BatchItem], max_concurrency: int = DEFAULT_JUDGE_CONCURRENCY) -> List[EvaluationResult]:
+    """Evaluate a batch of outputs, resolving all of their judge calls concurrently."""
+    deferred: List[Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, Optional[float]]]]] = []
+    requests: List[JudgeRequest] = []
+    for plan, predicted_output, gt_output in items:
+        evaluations, pending = plan.evaluate_deferred(predicted_output, gt_output)
+        deferred.append((evaluations, pending))
+        for index, _ in pending:
+            field_evaluator = plan.field_evaluators[index]
+            requests.append((
+                field_evaluator,
+                predicted_output.get(field_evaluator.field_name),
+                gt_output.get(field_evaluator.field_name),
+            ))
+
+    judgments = run_coroutine(judge_concurrently(requests, max_concurrency)) if requests else []
+
+    results = []
+    judgment_iter = iter(zip(requests, judgments))
+    for (plan, _, _), (evaluations, pending) in zip(items, deferred):
+        for index, similarity in pending:
+            (field_evaluator, predicted_value, ground_truth), judgment = next(judgment_iter)
+            evaluations[index] = field_evaluator.result_from_judgment(predicted_value, ground_truth, judgment, similarity)
+        results.append(plan.build_result(evaluations))
+    return results
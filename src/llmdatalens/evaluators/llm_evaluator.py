@@ -1,18 +1,157 @@
 import json
-from pydantic import BaseModel, Field
-from openai import OpenAI
-from typing import Dict, Any
+from pydantic import BaseModel, Field, ConfigDict
+from openai import OpenAI, AsyncOpenAI
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
 import logging
+from .judge_cache import JudgmentCache
+from .openai_clients import DEFAULT_MAX_CONNECTIONS, DEFAULT_MAX_KEEPALIVE_CONNECTIONS, get_client, get_async_client
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are an AI assistant tasked with evaluating the relevancy of an output to a given input."
+# Bump whenever either judge prompt changes so cached judgments are not reused
+PROMPT_VERSION = "relevancy-1"
+
 class LLMEvaluator(BaseModel):
     model: str = Field(default="gpt-4o-mini")
-    api_key: str = Field(default=None)
+    api_key: Optional[str] = Field(default=None)
+    base_url: Optional[str] = Field(default=None)
+    cache: Optional[JudgmentCache] = Field(default=None)
+    max_connections: int = Field(default=DEFAULT_MAX_CONNECTIONS)
+    max_keepalive_connections: int = Field(default=DEFAULT_MAX_KEEPALIVE_CONNECTIONS)
+    batch_size: int = Field(default=1)
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def get_client(self) -> OpenAI:
+        """The shared, keep-alive client for this evaluator's api key and base url."""
+        return get_client(self.api_key, self.base_url, self.max_connections, self.max_keepalive_connections)
+
+    def get_async_client(self) -> AsyncOpenAI:
+        return get_async_client(self.api_key, self.base_url, self.max_connections, self.max_keepalive_connections)
 
     def evaluate_relevancy(self, input_text: str, actual_output: str) -> Dict[str, Any]:
-        client = OpenAI(api_key=self.api_key)
+        cache_key, cached = self._lookup(input_text, actual_output)
+        if cached is not None:
+            return cached
+        return self._judge(input_text, actual_output, cache_key)
+
+    async def aevaluate_relevancy(self, input_text: str, actual_output: str) -> Dict[str, Any]:
+        """Async variant of ``evaluate_relevancy`` for concurrent judging."""
+        cache_key, cached = self._lookup(input_text, actual_output)
+        if cached is not None:
+            return cached
+        return await self._ajudge(input_text, actual_output, cache_key)
+
+    def evaluate_relevancy_batch(self, pairs: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Judge ``(input_text, actual_output)`` pairs, packing ``batch_size`` of them into each request.
+
+        Returns one result per pair, shaped like ``evaluate_relevancy``. Pairs that a
+        batched response leaves out or answers malformed are retried on their own.
+        """
+        results, pending = self._lookup_batch(pairs)
+        for chunk in self._chunks(pending):
+            judgments = self._judge_chunk([pairs[index] for index, _ in chunk]) if len(chunk) > 1 else [None]
+            for (index, cache_key), judgment in zip(chunk, judgments):
+                if judgment is None:
+                    results[index] = self._judge(*pairs[index], cache_key)
+                else:
+                    results[index] = self._store(cache_key, judgment)
+        return results
+
+    async def aevaluate_relevancy_batch(self, pairs: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Async variant of ``evaluate_relevancy_batch``."""
+        results, pending = self._lookup_batch(pairs)
+        for chunk in self._chunks(pending):
+            judgments = await self._ajudge_chunk([pairs[index] for index, _ in chunk]) if len(chunk) > 1 else [None]
+            for (index, cache_key), judgment in zip(chunk, judgments):
+                if judgment is None:
+                    results[index] = await self._ajudge(*pairs[index], cache_key)
+                else:
+                    results[index] = self._store(cache_key, judgment)
+        return results
+
+    def _judge(self, input_text: str, actual_output: str, cache_key: Optional[str]) -> Dict[str, Any]:
+        client = self.get_client()
+        content = None
+        try:
+            response = client.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(input_text, actual_output)
+            )
+            content = response.choices[0].message.content
+            logger.debug(f"API Response: {response}")
+            return self._store(cache_key, self._parse_response(content))
+        except Exception as e:
+            return self._error_result(e, content)
+
+    async def _ajudge(self, input_text: str, actual_output: str, cache_key: Optional[str]) -> Dict[str, Any]:
+        client = self.get_async_client()
+        content = None
+        try:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(input_text, actual_output)
+            )
+            content = response.choices[0].message.content
+            logger.debug(f"API Response: {response}")
+            return self._store(cache_key, self._parse_response(content))
+        except Exception as e:
+            return self._error_result(e, content)
+
+    def _judge_chunk(self, pairs: Sequence[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        try:
+            response = self.get_client().chat.completions.create(
+                model=self.model,
+                messages=self._build_batch_messages(pairs)
+            )
+            return self._parse_batch_response(response.choices[0].message.content, len(pairs))
+        except Exception as e:
+            logger.debug(f"Batched evaluation failed: {e}")
+            return [None] * len(pairs)
+
+    async def _ajudge_chunk(self, pairs: Sequence[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        try:
+            response = await self.get_async_client().chat.completions.create(
+                model=self.model,
+                messages=self._build_batch_messages(pairs)
+            )
+            return self._parse_batch_response(response.choices[0].message.content, len(pairs))
+        except Exception as e:
+            logger.debug(f"Batched evaluation failed: {e}")
+            return [None] * len(pairs)
+
+    def _lookup_batch(self, pairs: Sequence[Tuple[str, str]]) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, Optional[str]]]]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(pairs)
+        pending = []
+        for index, (input_text, actual_output) in enumerate(pairs):
+            cache_key, cached = self._lookup(input_text, actual_output)
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append((index, cache_key))
+        return results, pending
+
+    def _chunks(self, pending: List[Tuple[int, Optional[str]]]) -> Iterator[List[Tuple[int, Optional[str]]]]:
+        batch_size = max(1, self.batch_size)
+        for start in range(0, len(pending), batch_size):
+            yield pending[start:start + batch_size]
+
+    def _lookup(self, input_text: str, actual_output: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        if self.cache is None:
+            return None, None
+        cache_key = JudgmentCache.make_key(self.model, PROMPT_VERSION, input_text, actual_output)
+        return cache_key, self.cache.get(cache_key)
+
+    def _store(self, cache_key: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        # Failed evaluations are not cached so they are retried on the next run
+        if cache_key is not None and "error" not in result:
+            self.cache.put(cache_key, result)
+        return result
+
+    @staticmethod
+    def _build_messages(input_text: str, actual_output: str) -> List[Dict[str, str]]:
         prompt = f"""
         Input: {input_text}
         Actual Output: {actual_output}
@@ -29,38 +168,86 @@ class LLMEvaluator(BaseModel):
         - relevancy_score: The calculated relevancy score
         - reason: A brief explanation for the score
         """
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _build_batch_messages(pairs: Sequence[Tuple[str, str]]) -> List[Dict[str, str]]:
+        items = "".join(f"""
+        Item {index}:
+        Input: {input_text}
+        Actual Output: {actual_output}
+        """ for index, (input_text, actual_output) in enumerate(pairs))
+        prompt = f"""{items}
+        Task, for each item independently:
+         1. Extract all statements made in the Actual Output.
+         2. For each statement, determine if it is relevant to the Input.
+         3. Calculate the relevancy score as: (Number of Relevant Statements) / (Total Number of Statements)
+         4. Provide a brief reason for the score.
+
+        Format your response as a JSON array with one object per item, in item order, with the following keys:
+        - id: The item number
+        - statements: A list of all extracted statements
+        - relevant_statements: A list of statements deemed relevant
+        - relevancy_score: The calculated relevancy score
+        - reason: A brief explanation for the score
+        """
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    @classmethod
+    def _parse_batch_response(cls, content: Optional[str], num_items: int) -> List[Optional[Dict[str, Any]]]:
+        """Split a batched response into per-item judgments, ``None`` for items that must be retried.
 
+        The ids the model returns must be exactly ``0..num_items-1``; otherwise (missing,
+        duplicated, 1-based or otherwise shifted ids) no judgment can be attributed
+        with confidence and every item is retried on its own.
+        """
+        judgments: List[Optional[Dict[str, Any]]] = [None] * num_items
         try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an AI assistant tasked with evaluating the relevancy of an output to a given input."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            parsed = cls._parse_response(content)
+        except ValueError:
+            return judgments
+        if isinstance(parsed, dict):
+            parsed = parsed.get("results")
+        if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+            return judgments
+        ids = [item.get("id") for item in parsed]
+        if any(type(index) is not int for index in ids) or sorted(ids) != list(range(num_items)):
+            return judgments
 
-            content = response.choices[0].message.content
+        for item in parsed:
+            if isinstance(item.get("relevancy_score"), (int, float)):
+                item = dict(item)
+                judgments[item.pop("id")] = item
+        return judgments
 
-            logger.debug(f"API Response: {response}")
-            logger.debug(f"Content type: {type(content)}")
-            logger.debug(f"Content: {content}")
+    @staticmethod
+    def _parse_response(content: Optional[str]) -> Dict[str, Any]:
+        logger.debug(f"Content type: {type(content)}")
+        logger.debug(f"Content: {content}")
 
-            if not content:
-                raise ValueError("Empty response from LLM")
+        if not content:
+            raise ValueError("Empty response from LLM")
 
-            # Remove any markdown formatting
-            content = content.strip('`').strip()
-            if content.startswith('json'):
-                content = content[4:].strip()
+        # Remove any markdown formatting
+        content = content.strip('`').strip()
+        if content.startswith('json'):
+            content = content[4:].strip()
 
-            # Parse the JSON content
-            result = json.loads(content)
-            return result
+        # Parse the JSON content
+        return json.loads(content)
 
-        except json.JSONDecodeError as json_error:
-            error_message = f"Invalid JSON response: {content}. Error: {str(json_error)}"
-        except Exception as e:
-            error_message = f"LLM evaluation failed: {str(e)}"
+    @staticmethod
+    def _error_result(error: Exception, content: Optional[str]) -> Dict[str, Any]:
+        if isinstance(error, json.JSONDecodeError):
+            error_message = f"Invalid JSON response: {content}. Error: {str(error)}"
+        else:
+            error_message = f"LLM evaluation failed: {str(error)}"
 
         return {
             "error": error_message,
@@ -68,4 +255,4 @@ class LLMEvaluator(BaseModel):
             "relevant_statements": [],
             "relevancy_score": 0,
             "reason": "Evaluation failed due to an error"
-        }
\ No newline at end of file
+        }
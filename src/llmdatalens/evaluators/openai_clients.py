@@ -0,0 +1,88 @@
+"""Shared OpenAI clients for the LLM judge.
+
+One client is created lazily per ``(api_key, base_url)`` and pool limits and then
+reused, so judged fields share keep-alive connections instead of paying client
+construction and a new TLS handshake on every call. Async clients are bound to
+the event loop they were created in and are therefore kept per loop.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+try:
+    import httpx
+except ImportError:  # openai releases built on httpx2
+    import httpx2 as httpx
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+ClientKey = Tuple[Optional[str], Optional[str], int, int, float]
+
+_clients: Dict[ClientKey, OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+def _limits(key: ClientKey) -> "httpx.Limits":
+    return httpx.Limits(max_connections=key[2], max_keepalive_connections=key[3], keepalive_expiry=key[4])
+
+def get_client(
+    api_key: Optional[str],
+    base_url: Optional[str] = None,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+) -> OpenAI:
+    key = (api_key, base_url, max_connections, max_keepalive_connections, keepalive_expiry)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=DefaultHttpxClient(limits=_limits(key)))
+            _clients[key] = client
+    return client
+
+def get_async_client(
+    api_key: Optional[str],
+    base_url: Optional[str] = None,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+) -> AsyncOpenAI:
+    """Return the shared async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url, max_connections, max_keepalive_connections, keepalive_expiry)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=DefaultAsyncHttpxClient(limits=_limits(key)))
+            clients[key] = client
+    return client
+
+async def aclose_async_clients():
+    """Close the async clients of the running event loop before the loop goes away."""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+def close_clients():
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+def _forget_clients():
+    # Connections inherited through fork belong to the parent
+    global _lock
+    _lock = threading.Lock()
+    _clients.clear()
+    _async_clients.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_clients)
@@ -0,0 +1,110 @@
+"""Chunked parallel evaluation for ``StructuredOutputEvaluator``.
+
+Work items are ``(schema_hash, predicted_output, ground_truth_data)`` tuples and
+may come from any iterable, including a generator: chunks are submitted as they
+are read, with at most ``max_pending`` chunks in flight, so memory stays bounded.
+A process pool receives the shared judge and field options once, through the worker
+initializer; each task carries the function schemas its chunk uses and workers
+compile a plan the first time they see a schema. Threads share the parent's
+compiled plans directly. When a judge concurrency is given, each chunk resolves
+its LLM-judge calls concurrently.
+"""
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from llmdatalens.experiment.models import EvaluationResult, FunctionSchema
+from .evaluation_plan import EvaluationPlan, compile_evaluation_plan
+from .field_evaluators import StringPrefilter
+from .llm_evaluator import LLMEvaluator
+from .judge_pipeline import evaluate_batch
+
+EXECUTORS = ("process", "thread")
+
+DEFAULT_CHUNK_SIZE = 256
+
+WorkItem = Tuple[str, Any, Any]
+
+_worker_plans: Dict[str, EvaluationPlan] = {}
+_worker_options: Tuple[Optional[LLMEvaluator], Optional[StringPrefilter], Optional[str]] = (None, None, None)
+
+def _init_worker(
+    llm_evaluator: Optional[LLMEvaluator] = None,
+    string_prefilter: Optional[StringPrefilter] = None,
+    array_matching: Optional[str] = None,
+):
+    global _worker_options
+    _worker_plans.clear()
+    _worker_options = (llm_evaluator, string_prefilter, array_matching)
+
+def _evaluate_chunk(
+    chunk: Sequence[WorkItem],
+    plans: Optional[Dict[str, EvaluationPlan]] = None,
+    schemas: Optional[Dict[str, FunctionSchema]] = None,
+    judge_concurrency: Optional[int] = None,
+) -> List[EvaluationResult]:
+    if plans is None:
+        plans = _worker_plans
+        for schema_hash, function_schema in (schemas or {}).items():
+            if schema_hash not in plans:
+                plans[schema_hash] = compile_evaluation_plan(function_schema, *_worker_options)
+    if judge_concurrency is not None:
+        return evaluate_batch(
+            [(plans[schema_hash], predicted, ground_truth) for schema_hash, predicted, ground_truth in chunk],
+            judge_concurrency
+        )
+    return [plans[schema_hash].evaluate(predicted, ground_truth) for schema_hash, predicted, ground_truth in chunk]
+
+def evaluate_in_parallel(
+    items: Iterable[WorkItem],
+    plans: Dict[str, EvaluationPlan],
+    schemas: Dict[str, FunctionSchema],
+    workers: int,
+    executor: str = "process",
+    chunk_size: Optional[int] = None,
+    llm_evaluator: Optional[LLMEvaluator] = None,
+    string_prefilter: Optional[StringPrefilter] = None,
+    array_matching: Optional[str] = None,
+    judge_concurrency: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[List[EvaluationResult]]:
+    """Evaluate ``items`` on a pool of ``workers`` and yield the results chunk by chunk, in input order.
+
+    ``plans`` and ``schemas`` are looked up by schema hash when a chunk is
+    submitted, so a generator producing the items may keep adding to them.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTORS}")
+    if chunk_size is None:
+        if isinstance(items, Sequence):
+            # A few chunks per worker balances uneven chunks without much scheduling overhead
+            chunk_size = max(1, -(-len(items) // (workers * 4)))
+        else:
+            chunk_size = DEFAULT_CHUNK_SIZE
+    if max_pending is None:
+        max_pending = workers * 2
+
+    pool: Executor
+    if executor == "process":
+        pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(llm_evaluator, string_prefilter, array_matching)
+        )
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    iterator = iter(items)
+    pending: Deque[Future] = deque()
+    with pool:
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            if executor == "process":
+                chunk_schemas = {schema_hash: schemas[schema_hash] for schema_hash in {item[0] for item in chunk}}
+                pending.append(pool.submit(_evaluate_chunk, chunk, schemas=chunk_schemas, judge_concurrency=judge_concurrency))
+            else:
+                pending.append(pool.submit(_evaluate_chunk, chunk, plans=plans, judge_concurrency=judge_concurrency))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,234 @@
+"""Compact storage for many evaluation results.
+
+``CompactResultStore`` keeps, per field, a correctness bitmap, the relative and
+absolute errors of number fields in ``array('d')`` columns, and a reference into
+a table of details; per row it keeps the overall accuracy, the layout (which
+fields, in which order) and references to the predicted and ground-truth
+outputs the values were read from.
+
+Details that repeat (exact-match, enum and number templates) are interned, so
+such a field costs a bit, an integer reference and, for numbers, two floats per
+row. A field whose details turn out to be mostly unique (array item results,
+judge verdicts) stops being interned after ``INTERN_PROBE_ROWS`` rows and its
+details are referenced directly, without building a key for them.
+
+Indexing the store returns a ``StoredEvaluationResult``: a read-only view with
+the attributes of ``EvaluationResult`` whose ``FieldResult`` objects are built
+only when a field is looked up.
+"""
+import copy
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from llmdatalens.experiment.models import EvaluationResult, FieldResult
+
+_NUMERIC_ERRORS = ("relative_error", "absolute_error")
+# Details of a field are interned until this many lookups show that most of them are new
+INTERN_PROBE_ROWS = 64
+
+class _InternStats:
+    __slots__ = ("lookups", "misses")
+
+    def __init__(self):
+        self.lookups = 0
+        self.misses = 0
+
+    @property
+    def worthwhile(self) -> bool:
+        return self.lookups < INTERN_PROBE_ROWS or self.misses * 2 <= self.lookups
+
+class _FieldColumn:
+    __slots__ = ("correct", "details", "relative_error", "absolute_error", "intern_stats")
+
+    def __init__(self):
+        self.correct = bytearray()
+        # Index into the store's details table, per row; 0 is "no details"
+        self.details = array("I")
+        self.relative_error: Optional[array] = None
+        self.absolute_error: Optional[array] = None
+        self.intern_stats = _InternStats()
+
+class CompactResultStore:
+    """Append-only, column-oriented store of ``EvaluationResult`` objects."""
+
+    def __init__(self):
+        self._columns: Dict[str, _FieldColumn] = {}
+        self._overall_accuracy = array("d")
+        self._row_details = array("I")
+        self._layouts: List[Tuple[str, ...]] = []
+        self._layout_index: Dict[Tuple[str, ...], int] = {}
+        self._row_layouts = array("I")
+        # Details table: (details, has numeric errors); entry 0 stands for None
+        self._interned: List[Tuple[Any, bool]] = [(None, False)]
+        self._intern_index: Dict[Tuple[bool, str], int] = {}
+        self._row_intern_stats = _InternStats()
+        self._predicted_outputs: List[Dict[str, Any]] = []
+        self._gt_outputs: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._overall_accuracy)
+
+    def __getitem__(self, row: int) -> "StoredEvaluationResult":
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("result index out of range")
+        return StoredEvaluationResult(self, row)
+
+    def __iter__(self) -> Iterator["StoredEvaluationResult"]:
+        return (StoredEvaluationResult(self, row) for row in range(len(self)))
+
+    def append(self, result: EvaluationResult, predicted_output: Dict[str, Any], gt_output: Dict[str, Any]):
+        """Add a result; ``predicted_output`` and ``gt_output`` are the dicts its field values were read from."""
+        row = len(self)
+        self._overall_accuracy.append(result.overall_accuracy)
+        self._row_details.append(self._intern(result.details, self._row_intern_stats))
+        self._predicted_outputs.append(predicted_output)
+        self._gt_outputs.append(gt_output)
+
+        layout = tuple(result.field_results)
+        layout_id = self._layout_index.get(layout)
+        if layout_id is None:
+            layout_id = self._layout_index[layout] = len(self._layouts)
+            self._layouts.append(layout)
+        self._row_layouts.append(layout_id)
+
+        for field_name, field_result in result.field_results.items():
+            column = self._columns.get(field_name)
+            if column is None:
+                column = self._columns[field_name] = _FieldColumn()
+            self._pad(column, row)
+            if field_result.correct:
+                column.correct[row >> 3] |= 1 << (row & 7)
+
+            details = field_result.details
+            inner = details.get("details") if details else None
+            if isinstance(inner, dict) and all(isinstance(inner.get(key), float) for key in _NUMERIC_ERRORS):
+                if column.relative_error is None:
+                    column.relative_error = array("d", [float("nan")]) * len(column.details)
+                    column.absolute_error = array("d", [float("nan")]) * len(column.details)
+                column.relative_error[row] = inner["relative_error"]
+                column.absolute_error[row] = inner["absolute_error"]
+                template = {**details, "details": {k: v for k, v in inner.items() if k not in _NUMERIC_ERRORS}}
+                column.details[row] = self._intern(template, column.intern_stats, has_numeric_errors=True)
+            else:
+                column.details[row] = self._intern(details, column.intern_stats)
+
+    def _pad(self, column: _FieldColumn, row: int):
+        """Grow a column so it has a slot for ``row``; rows it was absent from stay empty."""
+        missing = row + 1 - len(column.details)
+        if missing > 0:
+            column.details.extend([0] * missing)
+            if column.relative_error is not None:
+                column.relative_error.extend([float("nan")] * missing)
+                column.absolute_error.extend([float("nan")] * missing)
+        missing_bytes = (row >> 3) + 1 - len(column.correct)
+        if missing_bytes > 0:
+            column.correct.extend(bytes(missing_bytes))
+
+    def _intern(self, details: Any, stats: _InternStats, has_numeric_errors: bool = False) -> int:
+        if details is None:
+            return 0
+        if not stats.worthwhile:
+            # Mostly unique details: a key per row would cost more than it saves
+            self._interned.append((details, has_numeric_errors))
+            return len(self._interned) - 1
+        stats.lookups += 1
+        # repr is much cheaper than a canonical JSON dump and equal for results built the same way
+        key = (has_numeric_errors, repr(details))
+        index = self._intern_index.get(key)
+        if index is None:
+            stats.misses += 1
+            index = self._intern_index[key] = len(self._interned)
+            self._interned.append((details, has_numeric_errors))
+        return index
+
+    def field_names(self) -> List[str]:
+        return list(self._columns)
+
+    def correct(self, field_name: str) -> np.ndarray:
+        """Per-row correctness of a field as a boolean array; ``False`` where the field was not evaluated."""
+        column = self._columns[field_name]
+        bits = np.unpackbits(np.frombuffer(bytes(column.correct), dtype=np.uint8), bitorder="little")
+        correct = np.zeros(len(self), dtype=bool)
+        correct[:min(len(bits), len(self))] = bits[:len(self)]
+        return correct
+
+    def errors(self, field_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Relative and absolute errors of a number field per row, NaN where there is none."""
+        column = self._columns[field_name]
+        result = np.full((2, len(self)), np.nan)
+        if column.relative_error is not None:
+            result[0, :len(column.relative_error)] = column.relative_error
+            result[1, :len(column.absolute_error)] = column.absolute_error
+        return result[0], result[1]
+
+    def overall_accuracy(self) -> np.ndarray:
+        return np.frombuffer(self._overall_accuracy, dtype=np.float64).copy()
+
+    def _field_result(self, row: int, field_name: str) -> FieldResult:
+        column = self._columns[field_name]
+        details, has_numeric_errors = self._interned[column.details[row] if row < len(column.details) else 0]
+        details = copy.deepcopy(details)
+        if has_numeric_errors:
+            details["details"] = {
+                "relative_error": column.relative_error[row],
+                "absolute_error": column.absolute_error[row],
+                **details["details"]
+            }
+        return FieldResult.model_construct(
+            correct=bool(column.correct[row >> 3] >> (row & 7) & 1),
+            predicted=self._predicted_outputs[row].get(field_name),
+            ground_truth=self._gt_outputs[row].get(field_name),
+            details=details
+        )
+
+class _LazyFieldResults(Mapping):
+    __slots__ = ("_store", "_row", "_layout")
+
+    def __init__(self, store: CompactResultStore, row: int):
+        self._store = store
+        self._row = row
+        self._layout = store._layouts[store._row_layouts[row]]
+
+    def __getitem__(self, field_name: str) -> FieldResult:
+        if field_name not in self._layout:
+            raise KeyError(field_name)
+        return self._store._field_result(self._row, field_name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._layout)
+
+class StoredEvaluationResult:
+    """Read-only view of one result in a ``CompactResultStore``."""
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: CompactResultStore, row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def overall_accuracy(self) -> float:
+        return self._store._overall_accuracy[self._row]
+
+    @property
+    def field_results(self) -> Mapping:
+        return _LazyFieldResults(self._store, self._row)
+
+    @property
+    def details(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._store._interned[self._store._row_details[self._row]][0])
+
+    def to_result(self) -> EvaluationResult:
+        return EvaluationResult(
+            overall_accuracy=self.overall_accuracy,
+            field_results=dict(self.field_results.items()),
+            details=self.details
+        )
+
+    def __repr__(self) -> str:
+        return f"StoredEvaluationResult(row={self._row}, overall_accuracy={self.overall_accuracy})"
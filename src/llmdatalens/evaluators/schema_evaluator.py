@@ -0,0 +1,211 @@
+"""Comparators compiled from a JSON schema for nested objects and arrays.
+
+A schema is compiled once into a flat table of ``(kind, payload)`` nodes:
+objects list their ``(key, child)`` properties, arrays point at their item node,
+and leaves carry what their comparison needs (number tolerances or enum values).
+``$ref`` (to ``#/...`` pointers), ``allOf`` and nullable ``anyOf``/``oneOf``
+(one branch besides ``{"type": "null"}``) are resolved while compiling. Nodes
+that point at a definition are shared per definition, so recursive schemas
+compile to cycles in the table; annotations next to a ``$ref`` (``default``,
+``description``, ... as pydantic emits them) are ignored.
+
+``SchemaComparator.compare`` walks a predicted and a ground-truth value against
+that table with an explicit stack, so depth is not limited by recursion and no
+objects are allocated per node beyond the stack entries. Every leaf counts once
+towards the leaf accuracy; a leaf that is absent (or ``None``) on both sides is
+correct, and so is an object or array absent on both sides, counted as one leaf.
+When only one side has the object or array, each of its leaves is a mismatch.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+OBJECT, ARRAY, NUMBER, ENUM, EXACT = range(5)
+
+DEFAULT_RELATIVE_TOLERANCE = 1e-6
+DEFAULT_ABSOLUTE_TOLERANCE = 1e-9
+
+Node = Tuple[int, Any]
+
+def _lookup_ref(root: Dict[str, Any], ref: str) -> Dict[str, Any]:
+    if not ref.startswith("#"):
+        raise ValueError(f"Only local schema references are supported, got '{ref}'")
+    target: Any = root
+    for part in ref[1:].split("/"):
+        if part:
+            target = target[part.replace("~1", "/").replace("~0", "~")]
+    return target
+
+def resolve_schema(schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Inline ``$ref`` and merge ``allOf`` at the top level of ``schema``; nested schemas are left as they are."""
+    root = schema if root is None else root
+    resolved: Dict[str, Any] = {}
+    pending = [schema]
+    seen_refs = set()
+    while pending:
+        current = pending.pop()
+        ref = current.get("$ref")
+        if ref is not None:
+            if ref in seen_refs:
+                continue
+            seen_refs.add(ref)
+            pending.append(_lookup_ref(root, ref))
+        pending.extend(reversed(current.get("allOf", [])))
+        branch = _single_branch(current)
+        if branch is not None:
+            pending.append(branch)
+        for key, value in current.items():
+            if key in ("$ref", "allOf") or (branch is not None and key in ("anyOf", "oneOf")):
+                continue
+            if key == "properties" and "properties" in resolved:
+                resolved["properties"] = {**value, **resolved["properties"]}
+            else:
+                resolved.setdefault(key, value)
+    return resolved
+
+def _single_branch(schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The only non-null alternative of an ``anyOf``/``oneOf``, e.g. for ``Optional[Model]``."""
+    for key in ("anyOf", "oneOf"):
+        branches = [branch for branch in schema.get(key, []) if branch.get("type") != "null"]
+        if len(branches) == 1 and len(schema[key]) > 1:
+            return branches[0]
+    return None
+
+def _definition_ref(schema: Dict[str, Any]) -> Optional[str]:
+    """The ``$ref`` a schema stands for, looking through annotations, one-item ``allOf`` and nullable ``anyOf``."""
+    while True:
+        ref = schema.get("$ref")
+        if ref is not None:
+            return ref
+        all_of = schema.get("allOf")
+        if isinstance(all_of, list) and len(all_of) == 1:
+            schema = all_of[0]
+            continue
+        branch = _single_branch(schema)
+        if branch is None:
+            return None
+        schema = branch
+
+def schema_type(schema: Dict[str, Any]) -> Optional[str]:
+    schema_types = schema.get("type")
+    if isinstance(schema_types, list):
+        # e.g. ["number", "null"] for an optional field
+        schema_types = next((t for t in schema_types if t != "null"), None)
+    if schema_types is None:
+        if "properties" in schema:
+            return "object"
+        if "items" in schema:
+            return "array"
+    return schema_types
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class SchemaComparator:
+    """Leaf-by-leaf comparison of two JSON values against a compiled schema."""
+    __slots__ = ("nodes", "root_index")
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        root_schema: Optional[Dict[str, Any]] = None,
+        relative_tolerance: float = DEFAULT_RELATIVE_TOLERANCE,
+        absolute_tolerance: float = DEFAULT_ABSOLUTE_TOLERANCE,
+    ):
+        self.nodes: List[Node] = []
+        self.root_index = self._compile(schema, schema if root_schema is None else root_schema,
+                                        (relative_tolerance, absolute_tolerance))
+
+    def _compile(self, schema: Dict[str, Any], root: Dict[str, Any], tolerances: Tuple[float, float]) -> int:
+        refs: Dict[str, int] = {}
+        # Entries: (schema, index of the node to fill in)
+        root_index = self._allocate(schema, refs)
+        pending = [(schema, root_index)]
+        while pending:
+            raw_schema, index = pending.pop()
+            schema = resolve_schema(raw_schema, root)
+            kind = schema_type(schema)
+            if "enum" in schema:
+                self.nodes[index] = (ENUM, list(schema["enum"]))
+            elif kind in ("number", "integer"):
+                self.nodes[index] = (NUMBER, tolerances)
+            elif kind == "object" and "properties" in schema:
+                properties = []
+                for key, child_schema in schema["properties"].items():
+                    child_index = self._child(child_schema, refs, pending)
+                    properties.append((key, child_index))
+                self.nodes[index] = (OBJECT, tuple(properties))
+            elif kind == "array" and isinstance(schema.get("items"), dict):
+                self.nodes[index] = (ARRAY, self._child(schema["items"], refs, pending))
+            else:
+                self.nodes[index] = (EXACT, None)
+        return root_index
+
+    def _allocate(self, schema: Dict[str, Any], refs: Dict[str, int]) -> int:
+        self.nodes.append((EXACT, None))
+        index = len(self.nodes) - 1
+        ref = _definition_ref(schema)
+        if ref is not None:
+            refs[ref] = index
+        return index
+
+    def _child(self, schema: Dict[str, Any], refs: Dict[str, int], pending: list) -> int:
+        ref = _definition_ref(schema)
+        if ref is not None:
+            if ref in refs:
+                # Already compiled (or being compiled): reuse it, which is how recursion terminates
+                return refs[ref]
+            schema = {"$ref": ref}
+        index = self._allocate(schema, refs)
+        pending.append((schema, index))
+        return index
+
+    def compare(self, predicted: Any, ground_truth: Any) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """Return ``(correct_leaves, total_leaves, mismatches)``; mismatches carry the leaf path."""
+        nodes = self.nodes
+        correct = 0
+        total = 0
+        mismatches: List[Dict[str, Any]] = []
+        stack: List[Tuple[int, Any, Any, str]] = [(self.root_index, predicted, ground_truth, "")]
+        while stack:
+            index, predicted_value, gt_value, path = stack.pop()
+            kind, payload = nodes[index]
+
+            if kind == OBJECT and (isinstance(predicted_value, dict) or isinstance(gt_value, dict)):
+                predicted_dict = predicted_value if isinstance(predicted_value, dict) else {}
+                gt_dict = gt_value if isinstance(gt_value, dict) else {}
+                prefix = f"{path}." if path else ""
+                for key, child_index in reversed(payload):
+                    stack.append((child_index, predicted_dict.get(key), gt_dict.get(key), prefix + key))
+                continue
+
+            if kind == ARRAY and (isinstance(predicted_value, list) or isinstance(gt_value, list)):
+                predicted_items = predicted_value if isinstance(predicted_value, list) else []
+                gt_items = gt_value if isinstance(gt_value, list) else []
+                for i in range(max(len(predicted_items), len(gt_items)) - 1, -1, -1):
+                    stack.append((
+                        payload,
+                        predicted_items[i] if i < len(predicted_items) else None,
+                        gt_items[i] if i < len(gt_items) else None,
+                        f"{path}[{i}]"
+                    ))
+                continue
+
+            if predicted_value is None and gt_value is None:
+                is_correct = True
+            elif kind == NUMBER:
+                if _is_number(predicted_value) and _is_number(gt_value):
+                    absolute_error = abs(predicted_value - gt_value)
+                    relative_error = absolute_error / max(abs(gt_value), 1e-9)
+                    is_correct = relative_error <= payload[0] and absolute_error <= payload[1]
+                else:
+                    is_correct = False
+            elif kind == ENUM:
+                is_correct = predicted_value == gt_value and predicted_value in payload
+            else:
+                is_correct = predicted_value == gt_value
+
+            total += 1
+            if is_correct:
+                correct += 1
+            else:
+                mismatches.append({"path": path, "predicted": predicted_value, "ground_truth": gt_value})
+        return correct, total, mismatches
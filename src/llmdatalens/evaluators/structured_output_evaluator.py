@@ -1,5 +1,7 @@
-from typing import Dict, Any, List, Optional
-from pydantic import Field
+from collections import deque
+from itertools import islice
+from typing import Dict, Any, Deque, Iterable, Iterator, List, Optional, Tuple
+from pydantic import Field, PrivateAttr
 from llmdatalens.core.base_model import LLMEvaluator
 from llmdatalens.core.metrics import start_timer, end_timer
 from llmdatalens.core.metrics_registry import metrics_registry
@@ -11,11 +13,19 @@ from llmdatalens.experiment.models import (
     Run,
     Metadata,
     Prompt,
-    FunctionSchema,
-    FieldResult  # Add this import
+    FunctionSchema
 )
 from llmdatalens.experiment.experiment_manager import ExperimentManager
-from .field_evaluators import create_field_evaluator, StringFieldEvaluator
+from .field_evaluators import StringPrefilter
+from .evaluation_plan import EvaluationPlan, compile_evaluation_plan
+from .parallel import WorkItem, evaluate_in_parallel
+from .aggregation import ResultAggregator
+from .result_store import CompactResultStore
+from .judge_cache import JudgmentCache
+from .llm_evaluator import LLMEvaluator as RelevancyJudge
+from .judge_pipeline import evaluate_batch
+
+_MAX_PLANS_BY_SCHEMA = 64
 
 class StructuredOutputEvaluator(LLMEvaluator):
     llm_outputs: List[LLMStructuredOutput] = Field(default_factory=list)
@@ -25,6 +35,26 @@ class StructuredOutputEvaluator(LLMEvaluator):
     experiment_name: Optional[str] = None
     experiment_version: Optional[str] = None
     openai_api_key: Optional[str] = None
+    openai_base_url: Optional[str] = None
+    judgment_cache: Optional[JudgmentCache] = None
+    judge: Optional[RelevancyJudge] = None
+    run_batch_size: int = 1000
+    run_flush_interval: float = 5.0
+    async_judge: bool = False
+    judge_concurrency: int = 8
+    judge_batch_size: int = 256
+    judge_pairs_per_request: int = 1
+    string_prefilter: Optional[StringPrefilter] = Field(default_factory=StringPrefilter)
+    array_matching: str = "ordered"
+    keep_individual_results: bool = False
+
+    _plans_by_schema: Dict[int, Tuple[FunctionSchema, EvaluationPlan]] = PrivateAttr(default_factory=dict)
+    _judge: Optional[RelevancyJudge] = PrivateAttr(default=None)
+    # High-water mark: outputs before it have been evaluated and recorded
+    _evaluated_count: int = PrivateAttr(default=0)
+    _evaluation_results: CompactResultStore = PrivateAttr(default_factory=CompactResultStore)
+    _aggregator: Optional[ResultAggregator] = PrivateAttr(default=None)
+    _aggregate: Optional[EvaluationResult] = PrivateAttr(default=None)
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -36,89 +66,209 @@ class StructuredOutputEvaluator(LLMEvaluator):
         if 'openai_api_key' in data:
             self.openai_api_key = data['openai_api_key']
 
-    def evaluate(self) -> EvaluationResult:
+    def evaluate(self, workers: int = 1, executor: str = "process", chunk_size: Optional[int] = None) -> EvaluationResult:
+        """Evaluate every output against its ground truth and record one run per output.
+
+        With ``workers`` > 1 the outputs are split into chunks of ``chunk_size`` and
+        evaluated on a ``"process"`` or ``"thread"`` pool. Results keep the input
+        order and are identical to a serial evaluation.
+
+        Evaluation is incremental: outputs added since the previous call are the
+        only ones evaluated and recorded, and the returned aggregate is the same
+        object as before, updated in place. The aggregate holds per-field counts and
+        mean number errors; with ``keep_individual_results`` each field also lists
+        every predicted value, ground truth and details. Per-output results are in
+        ``evaluation_results``. Changing ``keep_individual_results`` between calls
+        takes effect on the next call, which rebuilds the aggregate from
+        ``evaluation_results`` without evaluating or recording anything again.
+
+        With ``async_judge`` the LLM-judged string fields of each ``judge_batch_size``
+        outputs (or of each chunk) are resolved concurrently, at most
+        ``judge_concurrency`` requests at a time. A judge ``batch_size`` above one
+        (``judge_pairs_per_request``) packs that many fields into each request and
+        implies the same collected judging.
+        """
         self._validate_data()
-        evaluation_results = []
+        if len(self.llm_outputs) < self._evaluated_count:
+            # Outputs were removed or replaced, so the cached results no longer line up
+            self._clear_results()
 
-        for llm_output, ground_truth in zip(self.llm_outputs, self.ground_truths):
-            start_time = start_timer()
-            result = self._evaluate_single_output(llm_output, ground_truth)
-            end_time = end_timer(start_time)
+        start = self._evaluated_count
+        new_outputs = self.llm_outputs[start:]
+        if chunk_size is None and workers > 1:
+            chunk_size = max(1, -(-len(new_outputs) // (workers * 4)))
+        if self._aggregator is None or self._aggregator.keep_individual_results != self.keep_individual_results:
+            self._aggregator = ResultAggregator(self.keep_individual_results)
+            for stored_result in self._evaluation_results:
+                self._aggregator.add(stored_result)
+        new_pairs = list(zip(new_outputs, self.ground_truths[start:]))
+        results = self._evaluate_and_record(
+            new_pairs, workers, executor, chunk_size, window=len(new_outputs), run_batch_size=self.run_batch_size
+        )
+        try:
+            for index, result in enumerate(results):
+                # Each result is folded in as it arrives, so only the compact forms are retained
+                llm_output, ground_truth = new_pairs[index]
+                self._evaluation_results.append(result, llm_output.structured_output, ground_truth.data)
+                self._aggregator.add(result)
+                self._evaluated_count += 1
+        finally:
+            self._aggregate = self._aggregator.result(into=self._aggregate)
+        return self._aggregate
 
-            evaluation_results.append(result)
+    @property
+    def evaluation_results(self) -> CompactResultStore:
+        """Per-output results of ``evaluate``, in output order, kept in compact form."""
+        return self._evaluation_results
 
-            run = Run(
-                llm_output=llm_output,
-                ground_truth=ground_truth,
-                evaluation_result=result
-            )
-            self.experiment_manager.add_run(self.experiment_id, run)
+    def reset(self):
+        """Forget all outputs, ground truths and cached results. Recorded runs are kept."""
+        self.llm_outputs = []
+        self.ground_truths = []
+        self._clear_results()
 
-        overall_result = self._aggregate_results(evaluation_results)
-        return overall_result
+    def _clear_results(self):
+        self._evaluated_count = 0
+        self._evaluation_results = CompactResultStore()
+        self._aggregator = None
+        self._aggregate = None
 
-    def _evaluate_single_output(self, llm_output: LLMStructuredOutput, ground_truth: GroundTruth) -> EvaluationResult:
-        function_schema = llm_output.metadata.prompt.function_call
-        predicted_output = llm_output.structured_output
-        gt_output = ground_truth.data  # Make sure this is the correct golden_data
-
-        field_results = {}
-        total_correct = 0
-        total_fields = 0
-
-        for field_name, field_schema in function_schema.parameters["properties"].items():
-            field_evaluator = create_field_evaluator(field_name, field_schema)
-            if isinstance(field_evaluator, StringFieldEvaluator):
-                field_evaluator.llm_evaluator.api_key = self.openai_api_key
-            evaluation = field_evaluator.evaluate(
-                predicted_output.get(field_name),
-                gt_output.get(field_name)
-            )
-            
-            field_results[field_name] = FieldResult(
-                correct=evaluation.get("correct", False),
-                predicted=evaluation.get("predicted"),
-                ground_truth=evaluation.get("ground_truth"),
-                details={k: v for k, v in evaluation.items() if k not in ["correct", "predicted", "ground_truth"]}
-            )
-            
-            if evaluation.get("correct", False):
-                total_correct += 1
-            total_fields += 1
+    def evaluate_stream(
+        self,
+        pairs: Iterable[Tuple[LLMStructuredOutput, GroundTruth]],
+        window: int = 1000,
+        workers: int = 1,
+        executor: str = "process",
+    ) -> EvaluationResult:
+        """Evaluate ``(output, ground_truth)`` pairs from any iterable, recording runs as it goes.
 
-        overall_accuracy = total_correct / total_fields if total_fields > 0 else 0
+        At most ``window`` pairs, with their results and unwritten runs, are held in
+        memory at a time, and only running aggregates are kept, so the returned
+        result has per-field counts instead of per-output lists (unless
+        ``keep_individual_results`` is set). ``llm_outputs`` and ``ground_truths``
+        are left untouched.
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        # The window is shared between runs waiting to be written and pairs being evaluated
+        run_batch_size = max(1, min(self.run_batch_size, window // 2))
+        evaluation_window = max(1, window - run_batch_size)
+        chunk_size = max(1, evaluation_window // (2 * workers)) if workers > 1 else None
+        aggregator = ResultAggregator(self.keep_individual_results)
+        for result in self._evaluate_and_record(pairs, workers, executor, chunk_size, evaluation_window, run_batch_size):
+            aggregator.add(result)
+        return aggregator.result()
 
-        return EvaluationResult(
-            overall_accuracy=overall_accuracy,
-            field_results=field_results
-        )
+    def _evaluate_and_record(
+        self,
+        pairs: Iterable[Tuple[LLMStructuredOutput, GroundTruth]],
+        workers: int,
+        executor: str,
+        chunk_size: Optional[int],
+        window: int,
+        run_batch_size: int,
+    ) -> Iterator[EvaluationResult]:
+        with self.experiment_manager.buffered_writer(
+            self.experiment_id, max_batch_size=max(1, run_batch_size), flush_interval=self.run_flush_interval
+        ) as run_writer:
+            for llm_output, ground_truth, result in self._evaluate_pairs(pairs, workers, executor, chunk_size, window):
+                run = Run(
+                    llm_output=llm_output,
+                    ground_truth=ground_truth,
+                    evaluation_result=result
+                )
+                run_writer.add(run)
+                yield result
 
-    def _aggregate_results(self, evaluation_results: List[EvaluationResult]) -> EvaluationResult:
-        total_accuracy = sum(result.overall_accuracy for result in evaluation_results)
-        average_accuracy = total_accuracy / len(evaluation_results) if evaluation_results else 0
+    def _evaluate_pairs(
+        self,
+        pairs: Iterable[Tuple[LLMStructuredOutput, GroundTruth]],
+        workers: int,
+        executor: str,
+        chunk_size: Optional[int],
+        window: int,
+    ) -> Iterator[Tuple[LLMStructuredOutput, GroundTruth, EvaluationResult]]:
+        collect_judgments = self.async_judge or self._get_judge().batch_size > 1
+        if workers <= 1 and collect_judgments:
+            iterator = iter(pairs)
+            batch_size = max(1, min(self.judge_batch_size, window))
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    return
+                results = evaluate_batch([
+                    (self._get_evaluation_plan(llm_output.metadata.prompt.function_call), llm_output.structured_output, ground_truth.data)
+                    for llm_output, ground_truth in batch
+                ], self.judge_concurrency)
+                for (llm_output, ground_truth), result in zip(batch, results):
+                    yield llm_output, ground_truth, result
+        if workers <= 1:
+            for llm_output, ground_truth in pairs:
+                start_time = start_timer()
+                result = self._evaluate_single_output(llm_output, ground_truth)
+                end_time = end_timer(start_time)
+                yield llm_output, ground_truth, result
+            return
 
-        aggregated_field_results = {}
-        for result in evaluation_results:
-            for field_name, field_result in result.field_results.items():
-                if field_name not in aggregated_field_results:
-                    aggregated_field_results[field_name] = []
-                aggregated_field_results[field_name].append(field_result)
-
-        final_field_results = {
-            field_name: FieldResult(
-                correct=all(fr.correct for fr in field_results),
-                predicted=[fr.predicted for fr in field_results],
-                ground_truth=[fr.ground_truth for fr in field_results],
-                details={"individual_results": [fr.details for fr in field_results]}
-            )
-            for field_name, field_results in aggregated_field_results.items()
-        }
+        plans: Dict[str, EvaluationPlan] = {}
+        schemas: Dict[str, FunctionSchema] = {}
+        # Pairs submitted to the pool and not yet matched with their result
+        in_flight: Deque[Tuple[LLMStructuredOutput, GroundTruth]] = deque()
 
-        return EvaluationResult(
-            overall_accuracy=average_accuracy,
-            field_results=final_field_results,
-            details={"num_evaluations": len(evaluation_results)}
+        def work_items() -> Iterator[WorkItem]:
+            for llm_output, ground_truth in pairs:
+                function_schema = llm_output.metadata.prompt.function_call
+                plan = self._get_evaluation_plan(function_schema)
+                plans[plan.schema_hash] = plan
+                schemas[plan.schema_hash] = function_schema
+                in_flight.append((llm_output, ground_truth))
+                yield (plan.schema_hash, llm_output.structured_output, ground_truth.data)
+
+        for chunk_results in evaluate_in_parallel(
+            work_items(), plans, schemas, workers, executor=executor, chunk_size=chunk_size,
+            llm_evaluator=self._get_judge(),
+            string_prefilter=self.string_prefilter,
+            array_matching=self.array_matching,
+            judge_concurrency=self.judge_concurrency if collect_judgments else None
+        ):
+            for result in chunk_results:
+                llm_output, ground_truth = in_flight.popleft()
+                yield llm_output, ground_truth, result
+
+    def _evaluate_single_output(self, llm_output: LLMStructuredOutput, ground_truth: GroundTruth) -> EvaluationResult:
+        plan = self._get_evaluation_plan(llm_output.metadata.prompt.function_call)
+        return plan.evaluate(llm_output.structured_output, ground_truth.data)
+
+    def _get_evaluation_plan(self, function_schema: FunctionSchema) -> EvaluationPlan:
+        # Outputs usually share one FunctionSchema object, so skip even hashing it again
+        cached = self._plans_by_schema.get(id(function_schema))
+        if cached is not None and cached[0] is function_schema:
+            return cached[1]
+        plan = compile_evaluation_plan(
+            function_schema, self._get_judge(), self.string_prefilter, self.array_matching
         )
+        if len(self._plans_by_schema) >= _MAX_PLANS_BY_SCHEMA:
+            # Streams may bring a fresh schema object per record; the compiled plans stay cached
+            self._plans_by_schema.clear()
+        self._plans_by_schema[id(function_schema)] = (function_schema, plan)
+        return plan
+
+    def _get_judge(self) -> RelevancyJudge:
+        """The judge shared by every LLM-evaluated field: ``judge`` or one built from the openai settings."""
+        if self.judge is not None:
+            return self.judge
+        if self._judge is None:
+            self._judge = RelevancyJudge(
+                api_key=self.openai_api_key, base_url=self.openai_base_url, cache=self.judgment_cache,
+                batch_size=self.judge_pairs_per_request
+            )
+        return self._judge
+
+    def _aggregate_results(self, evaluation_results: Iterable[EvaluationResult]) -> EvaluationResult:
+        aggregator = ResultAggregator(self.keep_individual_results)
+        for result in evaluation_results:
+            aggregator.add(result)
+        return aggregator.result()
 
     def _validate_data(self):
         if len(self.llm_outputs) != len(self.ground_truths):
@@ -1,4 +1,7 @@
 from .experiment_manager import ExperimentManager
+from .run_writer import BufferedRunWriter
+from .views import ExperimentView
+from .storage import StorageBackend, JSONFileBackend, SQLiteBackend
 from .models import (
     Experiment,
     Run,
@@ -15,6 +18,11 @@ from .models import (
 
 __all__ = [
     'ExperimentManager',
+    'BufferedRunWriter',
+    'ExperimentView',
+    'StorageBackend',
+    'JSONFileBackend',
+    'SQLiteBackend',
     'Experiment',
     'Run',
     'Prompt',
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+class ExperimentCache:
+    """Least-recently-used cache of loaded experiments keyed by storage revision.
+
+    Every entry remembers the backend revision it was loaded at; a lookup with a
+    different revision is a miss, so changes made by other processes are noticed.
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, revision: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != revision:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, revision: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (revision, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Hashable, Any]]:
+        """Return ``(revision, value)`` without validating or touching recency."""
+        return self._entries.get(key)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,50 +1,95 @@
 import json
-import os
-from typing import Dict, Any, List, Union, Optional
+from typing import Dict, Any, Hashable, List, Union, Optional, Tuple
 from datetime import datetime
 import hashlib
 from .models import Experiment, Run, Prompt, Model, ModelVersion, LLMStructuredOutput, LLMTextOutput, GroundTruth, EvaluationResult, Metadata
+from .storage import StorageBackend, JSONFileBackend
+from .run_writer import BufferedRunWriter
+from .views import ExperimentView
+from .cache import ExperimentCache
 
 class ExperimentManager:
-    def __init__(self, storage_path: str = "experiments"):
+    """Tracks experiments, prompt versions and model usage on top of a storage backend.
+
+    By default experiments are kept as JSON files under ``storage_path``; pass a
+    ``backend`` (e.g. ``SQLiteBackend``) to store them elsewhere.
+
+    Loaded experiments are kept in an LRU cache of ``cache_size`` entries that is
+    validated against the backend revision on every access. The cache owns its
+    headers and run lists: callers get a copy of the header (name, prompts,
+    models) and a list of their own, so changing them does not affect the cache.
+    The ``Run`` objects in that list are shared and should be treated as read-only.
+
+    Runs appended through the manager are added to a cached experiment only while
+    it holds at most ``cache_max_runs`` runs; past that the cached experiment is
+    dropped and reloaded on the next ``get_experiment``, so writing many runs
+    (e.g. with ``evaluate_stream``) does not accumulate them in memory.
+    """
+
+    def __init__(self, storage_path: str = "experiments", backend: Optional[StorageBackend] = None,
+                 cache_size: int = 16, cache_max_runs: int = 10_000):
         self.storage_path = storage_path
-        os.makedirs(storage_path, exist_ok=True)
+        self.backend = backend if backend is not None else JSONFileBackend(storage_path)
+        self.cache = ExperimentCache(max_size=cache_size)
+        self.cache_max_runs = cache_max_runs
 
     def create_or_load_experiment(self, name: str, version: str, description: str = "") -> str:
-        existing_experiment = self._find_existing_experiment(name, version)
-        if existing_experiment:
-            return existing_experiment.id
-        
-        experiment = Experiment(name=name, version=version, description=description)
-        self._save_experiment(experiment)
-        return experiment.id
-
-    def _find_existing_experiment(self, name: str, version: str) -> Optional[Experiment]:
-        for filename in os.listdir(self.storage_path):
-            if filename.endswith(".json"):
-                try:
-                    experiment = self._load_experiment(filename[:-5])  # Remove .json extension
-                    if experiment.name == name and experiment.version == version:
-                        return experiment
-                except Exception as e:
-                    print(f"Error loading experiment {filename}: {str(e)}")
-        return None
-
-    def add_run(self, experiment_id: str, run: Run) -> str:
-        experiment = self._load_experiment(experiment_id)
+        existing_experiment_id = self.backend.find_experiment_id(name, version)
+        if existing_experiment_id:
+            return existing_experiment_id
 
-        # Handle prompt versioning
-        if run.llm_output.metadata.prompt:
-            prompt = self._get_or_create_prompt(experiment, run.llm_output.metadata.prompt)
-            run.llm_output.metadata.additional_info["prompt_id"] = prompt.id
-            run.llm_output.metadata.additional_info["prompt_version"] = prompt.version
+        with self.backend.lock():
+            # Another process may have created it while we were waiting for the lock
+            existing_experiment_id = self.backend.find_experiment_id(name, version)
+            if existing_experiment_id:
+                return existing_experiment_id
 
-        # Handle model versioning
-        self._update_model_info(experiment, run.llm_output.metadata.model_name, run.llm_output.metadata.model_version)
+            experiment = Experiment(name=name, version=version, description=description)
+            self.backend.save_experiment(experiment)
+            return experiment.id
 
-        experiment.runs.append(run)
-        self._save_experiment(experiment)
-        return run.id
+    def add_run(self, experiment_id: str, run: Run) -> str:
+        return self.add_runs(experiment_id, [run])[0]
+
+    def add_runs(self, experiment_id: str, runs: List[Run]) -> List[str]:
+        """Persist a batch of runs with a single header update and a single append."""
+        if not runs:
+            return []
+        with self.backend.lock(experiment_id):
+            revision, cached_header = self._load_header_with_revision(experiment_id)
+            experiment = cached_header.model_copy(deep=True)
+
+            # Handle prompt versioning, once per distinct prompt object in the batch
+            versioned_prompts: Dict[int, Prompt] = {}
+            model_run_counts: Dict[Tuple[str, Optional[str]], int] = {}
+            for run in runs:
+                metadata = run.llm_output.metadata
+                if metadata.prompt:
+                    prompt = versioned_prompts.get(id(metadata.prompt))
+                    if prompt is None:
+                        prompt = self._get_or_create_prompt(experiment, metadata.prompt)
+                        versioned_prompts[id(metadata.prompt)] = prompt
+                    metadata.additional_info["prompt_id"] = prompt.id
+                    metadata.additional_info["prompt_version"] = prompt.version
+                model_key = (metadata.model_name, metadata.model_version)
+                model_run_counts[model_key] = model_run_counts.get(model_key, 0) + 1
+
+            # Handle model versioning
+            for (model_name, model_version), run_count in model_run_counts.items():
+                self._update_model_info(experiment, model_name, model_version, run_count)
+
+            try:
+                self.backend.save_header(experiment)
+                self.backend.append_runs(experiment_id, runs)
+            except Exception:
+                self._invalidate(experiment_id)
+                raise
+            self._update_cache_after_append(experiment_id, revision, experiment, runs)
+            return [run.id for run in runs]
+
+    def buffered_writer(self, experiment_id: str, max_batch_size: int = 1000, flush_interval: float = 5.0) -> BufferedRunWriter:
+        """Return a writer that collects runs and persists them through ``add_runs`` in batches."""
+        return BufferedRunWriter(self, experiment_id, max_batch_size=max_batch_size, flush_interval=flush_interval)
 
     def _get_or_create_prompt(self, experiment: Experiment, prompt: Prompt) -> Prompt:
         prompt_hash = self._hash_prompt(prompt)
@@ -64,7 +109,7 @@ class ExperimentManager:
         prompt_dict = prompt.model_dump(exclude={'id', 'created_at', 'modified_at', 'version'})
         return hashlib.md5(json.dumps(prompt_dict, sort_keys=True).encode()).hexdigest()
 
-    def _update_model_info(self, experiment: Experiment, model_name: str, model_version: str):
+    def _update_model_info(self, experiment: Experiment, model_name: str, model_version: str, run_count: int = 1):
         if model_name not in experiment.models:
             experiment.models[model_name] = Model(name=model_name)
         
@@ -75,60 +120,67 @@ class ExperimentManager:
         version_info = model.versions.get(model_version) if model_version else None
         if version_info:
             version_info.last_used = datetime.now()
-            version_info.run_count += 1
+            version_info.run_count += run_count
 
     def get_experiment(self, experiment_id: str) -> Experiment:
         return self._load_experiment(experiment_id)
 
+    def open_experiment(self, experiment_id: str) -> ExperimentView:
+        """Load the experiment header only; runs are read lazily through the returned view."""
+        return ExperimentView(self._load_header(experiment_id).model_copy(deep=True), self.backend)
+
     def get_all_experiments(self) -> List[Experiment]:
-        experiments = []
-        for filename in os.listdir(self.storage_path):
-            if filename.endswith(".json"):
-                experiments.append(self._load_experiment(filename[:-5]))  # Remove .json extension
-        return experiments
+        return [self._load_experiment(experiment_id) for experiment_id in self.backend.list_experiment_ids()]
 
     def get_prompt_history(self, experiment_id: str) -> List[Prompt]:
-        experiment = self._load_experiment(experiment_id)
-        return list(experiment.prompts.values())
+        experiment = self._load_header(experiment_id)
+        return [prompt.model_copy(deep=True) for prompt in experiment.prompts.values()]
 
     def get_model_history(self, experiment_id: str) -> Dict[str, Model]:
-        experiment = self._load_experiment(experiment_id)
-        return experiment.models
+        experiment = self._load_header(experiment_id)
+        return {name: model.model_copy(deep=True) for name, model in experiment.models.items()}
 
     def _save_experiment(self, experiment: Experiment):
-        filename = f"{experiment.id}.json"
-        with open(os.path.join(self.storage_path, filename), "w") as f:
-            json.dump(experiment.model_dump(), f, indent=2, default=self._json_serializer)
+        self._invalidate(experiment.id)
+        self.backend.save_experiment(experiment)
 
-    @staticmethod
-    def _json_serializer(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Type {type(obj)} not serializable")
+    def _load_header_with_revision(self, experiment_id: str) -> Tuple[Hashable, Experiment]:
+        revision = self.backend.revision(experiment_id)
+        header = self.cache.get(("header", experiment_id), revision)
+        if header is None:
+            header = self.backend.load_header(experiment_id)
+            self.cache.put(("header", experiment_id), revision, header)
+        return revision, header
+
+    def _load_header(self, experiment_id: str) -> Experiment:
+        return self._load_header_with_revision(experiment_id)[1]
 
     def _load_experiment(self, experiment_id: str) -> Experiment:
-        filename = f"{experiment_id}.json"
-        with open(os.path.join(self.storage_path, filename), "r") as f:
-            data = json.load(f)
-        
-        # Check if the data needs migration
-        if "version" not in data:
-            data = self._migrate_experiment_data(data)
-        
-        return Experiment.model_validate(data)
+        revision = self.backend.revision(experiment_id)
+        # Cached as (header without runs, run list), both owned by the cache
+        cached = self.cache.get(("full", experiment_id), revision)
+        if cached is None:
+            experiment = self.backend.load_experiment(experiment_id)
+            cached = (experiment.model_copy(update={"runs": []}), experiment.runs)
+            self.cache.put(("full", experiment_id), revision, cached)
+        header, runs = cached
+        return header.model_copy(update={"runs": list(runs)}, deep=True)
+
+    def _update_cache_after_append(self, experiment_id: str, previous_revision: Hashable,
+                                   header: Experiment, runs: List[Run]):
+        """Reuse cached state after our own write instead of re-reading it from storage."""
+        revision = self.backend.revision(experiment_id)
+        self.cache.put(("header", experiment_id), revision, header)
+        cached_full = self.cache.peek(("full", experiment_id))
+        if (cached_full is not None and cached_full[0] == previous_revision
+                and len(cached_full[1][1]) + len(runs) <= self.cache_max_runs):
+            cached_runs = cached_full[1][1]
+            # The run list is private to the cache, so it grows in place
+            cached_runs.extend(runs)
+            self.cache.put(("full", experiment_id), revision, (header, cached_runs))
+        else:
+            self.cache.invalidate(("full", experiment_id))
 
-    def _migrate_experiment_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        data["version"] = data.get("version", "1.0.0")  # Set a default version if not present
-        
-        # Migrate runs
-        for run in data.get("runs", []):
-            if "evaluation_result" in run:
-                eval_result = run["evaluation_result"]
-                if "metrics" in eval_result and "overall_accuracy" not in eval_result:
-                    # Migrate old format to new format
-                    eval_result["overall_accuracy"] = eval_result["metrics"].get("OverallAccuracy", 0.0)
-                    eval_result["field_results"] = {}
-                    eval_result["details"] = eval_result.get("details", {})
-                    eval_result.pop("metrics", None)
-
-        return data
+    def _invalidate(self, experiment_id: str):
+        self.cache.invalidate(("header", experiment_id))
+        self.cache.invalidate(("full", experiment_id))
@@ -0,0 +1,55 @@
+import time
+from typing import List, TYPE_CHECKING
+from .models import Run
+
+if TYPE_CHECKING:
+    from .experiment_manager import ExperimentManager
+
+class BufferedRunWriter:
+    """Collects runs in memory and persists them with ``ExperimentManager.add_runs``.
+
+    Runs are flushed once ``max_batch_size`` runs are pending or ``flush_interval``
+    seconds have passed since the last flush, and when the writer is closed. Use it
+    as a context manager so pending runs are never dropped::
+
+        with manager.buffered_writer(experiment_id) as writer:
+            for run in runs:
+                writer.add(run)
+    """
+
+    def __init__(self, experiment_manager: "ExperimentManager", experiment_id: str,
+                 max_batch_size: int = 1000, flush_interval: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.experiment_manager = experiment_manager
+        self.experiment_id = experiment_id
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Run] = []
+        self._last_flush = time.monotonic()
+
+    def add(self, run: Run) -> str:
+        self._pending.append(run)
+        if (len(self._pending) >= self.max_batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+        return run.id
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if pending:
+            self.experiment_manager.add_runs(self.experiment_id, pending)
+
+    def close(self):
+        self.flush()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def __enter__(self) -> "BufferedRunWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
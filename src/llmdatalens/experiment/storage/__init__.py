@@ -0,0 +1,5 @@
+from .base import StorageBackend
+from .json_backend import JSONFileBackend
+from .sqlite_backend import SQLiteBackend
+
+__all__ = ['StorageBackend', 'JSONFileBackend', 'SQLiteBackend']
@@ -0,0 +1,73 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Hashable, Iterator, List, Optional
+from ..models import Experiment, Run
+
+class StorageBackend(ABC):
+    """Persistence interface used by ``ExperimentManager``.
+
+    An experiment is stored as a header (everything but its runs) and an ordered,
+    append-only sequence of runs. Bookkeeping such as prompt versioning stays in
+    the manager; backends only read and write.
+
+    Methods that look up an experiment by id raise ``KeyError`` when no such
+    experiment is stored.
+    """
+
+    @contextmanager
+    def lock(self, experiment_id: Optional[str] = None):
+        """Hold an exclusive lock on one experiment, or on the whole store if no id is given.
+
+        ``ExperimentManager`` holds it around read-modify-write sequences so several
+        processes can safely write to the same store. The lock must be re-entrant.
+        """
+        yield
+
+    @abstractmethod
+    def find_experiment_id(self, name: str, version: str) -> Optional[str]:
+        """Return the id of the experiment with the given name and version, if any."""
+
+    @abstractmethod
+    def list_experiment_ids(self) -> List[str]:
+        """Return the ids of all stored experiments."""
+
+    @abstractmethod
+    def load_header(self, experiment_id: str) -> Experiment:
+        """Load an experiment without its runs; raises ``KeyError`` for an unknown id."""
+
+    @abstractmethod
+    def load_runs(self, experiment_id: str) -> List[Run]:
+        """Load all runs of an experiment in insertion order."""
+
+    @abstractmethod
+    def revision(self, experiment_id: str) -> Hashable:
+        """Return a token that changes whenever the stored experiment changes; raises ``KeyError`` for an unknown id."""
+
+    @abstractmethod
+    def save_header(self, experiment: Experiment):
+        """Create or replace the header of an experiment, ignoring ``experiment.runs``."""
+
+    @abstractmethod
+    def append_runs(self, experiment_id: str, runs: List[Run]):
+        """Append runs to an existing experiment."""
+
+    @abstractmethod
+    def save_experiment(self, experiment: Experiment):
+        """Write the header and replace the stored runs with ``experiment.runs``."""
+
+    def load_experiment(self, experiment_id: str) -> Experiment:
+        experiment = self.load_header(experiment_id)
+        experiment.runs = self.load_runs(experiment_id)
+        return experiment
+
+    def iter_run_batches(self, experiment_id: str, batch_size: int = 1000) -> Iterator[List[Run]]:
+        """Yield the runs of an experiment in insertion order, ``batch_size`` at a time.
+
+        Backends should override this to avoid loading every run at once.
+        """
+        runs = self.load_runs(experiment_id)
+        for start in range(0, len(runs), batch_size):
+            yield runs[start:start + batch_size]
+
+    def count_runs(self, experiment_id: str) -> int:
+        return sum(len(batch) for batch in self.iter_run_batches(experiment_id))
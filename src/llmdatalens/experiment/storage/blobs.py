@@ -0,0 +1,135 @@
+"""Content-addressed storage of the large values that runs share.
+
+Prompts (with their function schemas) are usually repeated across many runs.
+Before a run is stored, each of them is replaced by a ``{"$blob": <sha256>}``
+reference and kept once per experiment in a blob table; the reference is swapped
+back when the run is loaded. A blob may itself contain references (a prompt
+refers to its function schema blob).
+
+Ground-truth data can be stored the same way, but only on request: it is
+usually different for every run, so hashing it and resolving it again on load
+costs time without saving space. It pays off when the same ground truths are
+evaluated repeatedly, e.g. for several models.
+"""
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from ..models import Prompt, Run
+from . import serialization
+
+BLOB_KEY = "$blob"
+_BLOB_MARKER = b'"$blob"'
+
+def blob_hash(data: Any) -> str:
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _to_blob(data: Any, blobs: Dict[str, Any]) -> Dict[str, str]:
+    digest = blob_hash(data)
+    blobs[digest] = data
+    return {BLOB_KEY: digest}
+
+def extract_blobs(run: Run, memo: Optional[Dict[int, Tuple[Dict[str, str], Dict[str, Any]]]] = None,
+                  ground_truths: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return the run as JSON-compatible data with shared values replaced by blob references.
+
+    The second item maps the hash of every referenced blob to its data. ``memo``
+    lets callers encoding a batch serialize and hash each shared ``Prompt`` object
+    once; it must not outlive the runs it was filled from. Ground-truth data is
+    only replaced with ``ground_truths``.
+    """
+    prompt = run.llm_output.metadata.prompt
+    data = run.model_dump(mode="json", exclude={"llm_output": {"metadata": {"prompt"}}})
+    blobs: Dict[str, Any] = {}
+    if prompt is not None:
+        encoded = memo.get(id(prompt)) if memo is not None else None
+        if encoded is None:
+            prompt_blobs: Dict[str, Any] = {}
+            prompt_data = prompt.model_dump(mode="json")
+            if prompt_data.get("function_call") is not None:
+                prompt_data["function_call"] = _to_blob(prompt_data["function_call"], prompt_blobs)
+            encoded = (_to_blob(prompt_data, prompt_blobs), prompt_blobs)
+            if memo is not None:
+                memo[id(prompt)] = encoded
+        data["llm_output"]["metadata"]["prompt"] = dict(encoded[0])
+        blobs.update(encoded[1])
+    else:
+        data["llm_output"]["metadata"]["prompt"] = None
+    ground_truth = data.get("ground_truth")
+    if ground_truths and ground_truth is not None:
+        ground_truth["data"] = _to_blob(ground_truth["data"], blobs)
+    return data, blobs
+
+def _ref(value: Any) -> Optional[str]:
+    if isinstance(value, dict) and len(value) == 1 and BLOB_KEY in value:
+        return value[BLOB_KEY]
+    return None
+
+def _fetch_all(hashes: Set[str], fetch: Callable[[Set[str]], Dict[str, Any]], resolved: Dict[str, Any]):
+    missing = hashes - resolved.keys()
+    if not missing:
+        return
+    fetched = fetch(missing)
+    unknown = missing - fetched.keys()
+    if unknown:
+        raise KeyError(f"Missing blobs: {sorted(unknown)}")
+    resolved.update(fetched)
+
+def resolve_blobs(runs_data: List[Dict[str, Any]], fetch: Callable[[Set[str]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replace blob references in ``runs_data`` in place.
+
+    ``fetch`` receives a set of hashes and returns their blob data. Every distinct
+    prompt is validated once and the resulting ``Prompt`` is shared by the runs
+    that reference it, as it is when the runs are created in memory.
+    """
+    resolved: Dict[str, Any] = {}
+    hashes = ({_ref(data["llm_output"]["metadata"].get("prompt")) for data in runs_data}
+              | {_ref((data.get("ground_truth") or {}).get("data")) for data in runs_data})
+    _fetch_all(hashes - {None}, fetch, resolved)
+
+    prompts: Dict[str, Prompt] = {}
+    for data in runs_data:
+        metadata = data["llm_output"]["metadata"]
+        prompt_hash = _ref(metadata.get("prompt"))
+        if prompt_hash is not None:
+            if prompt_hash not in prompts:
+                prompt_data = dict(resolved[prompt_hash])
+                function_hash = _ref(prompt_data.get("function_call"))
+                if function_hash is not None:
+                    _fetch_all({function_hash}, fetch, resolved)
+                    prompt_data["function_call"] = _copy_json(resolved[function_hash])
+                prompts[prompt_hash] = Prompt.model_validate(prompt_data)
+            metadata["prompt"] = prompts[prompt_hash]
+        ground_truth = data.get("ground_truth")
+        data_hash = _ref(ground_truth.get("data")) if ground_truth is not None else None
+        if data_hash is not None:
+            # Copy so runs never share (and mutate) the fetched blob data
+            ground_truth["data"] = _copy_json(resolved[data_hash])
+    return runs_data
+
+def _copy_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+def decode_runs(lines: List[Union[str, bytes]], fetch: Callable[[Set[str]], Dict[str, Any]]) -> List[Run]:
+    """Validate serialized runs, resolving blob references where present.
+
+    Runs without references are validated straight from JSON by pydantic.
+    """
+    runs: List[Any] = []
+    with_refs = []
+    for line in lines:
+        raw = line.encode() if isinstance(line, str) else line
+        if _BLOB_MARKER in raw:
+            runs.append(None)
+            with_refs.append((len(runs) - 1, serialization.loads(raw)))
+        else:
+            runs.append(Run.model_validate_json(raw))
+    if with_refs:
+        resolve_blobs([data for _, data in with_refs], fetch)
+        for index, data in with_refs:
+            runs[index] = Run.model_validate(data)
+    return runs
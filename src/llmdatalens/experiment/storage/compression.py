@@ -0,0 +1,118 @@
+"""Compressed, append-only segment files.
+
+A compressed segment is a concatenation of independent members (gzip members,
+xz streams or zlib streams), one per append. Readers detect the format from the
+first bytes of the file, so uncompressed segments remain readable, and decode
+member by member in fixed-size chunks without holding the whole file in memory.
+Lines of a member are only yielded once the member is complete, so an append in
+progress in another process is never seen half-written.
+"""
+import gzip
+import lzma
+import zlib
+from typing import Iterator, List, Optional
+
+COMPRESSION_METHODS = ("gzip", "lzma", "zlib")
+CHUNK_SIZE = 1 << 16
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+# Second byte of a zlib header for the default window size, by compression level
+_ZLIB_MAGIC = (b"\x78\x01", b"\x78\x5e", b"\x78\x9c", b"\x78\xda")
+
+def compress(data: bytes, method: Optional[str], level: Optional[int] = None) -> bytes:
+    if method is None:
+        return data
+    if method == "gzip":
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    if method == "lzma":
+        return lzma.compress(data, preset=level)
+    if method == "zlib":
+        return zlib.compress(data, -1 if level is None else level)
+    raise ValueError(f"Unknown compression method '{method}', expected one of {COMPRESSION_METHODS}")
+
+def detect(head: bytes) -> Optional[str]:
+    """Return the compression method of a segment from its first bytes, ``None`` for plain text."""
+    if head.startswith(_GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(_XZ_MAGIC):
+        return "lzma"
+    if head[:2] in _ZLIB_MAGIC:
+        return "zlib"
+    return None
+
+def detect_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return detect(f.read(len(_XZ_MAGIC)))
+    except FileNotFoundError:
+        return None
+
+def _decompressor(method: str):
+    if method == "lzma":
+        return lzma.LZMADecompressor()
+    # wbits=47 accepts both gzip and zlib headers
+    return zlib.decompressobj(wbits=47)
+
+class SegmentReader:
+    """Iterate the complete lines of a (possibly compressed) segment file.
+
+    Reading starts at byte ``offset``, which must be at a line (plain) or member
+    (compressed) boundary. After iteration ``offset`` points just past the last
+    line or member that was consumed completely, so a later reader can resume
+    from there.
+    """
+
+    def __init__(self, path: str, offset: int = 0):
+        self.path = path
+        self.offset = offset
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            method = detect(f.read(len(_XZ_MAGIC)))
+            f.seek(self.offset)
+            if method is None:
+                yield from self._iter_plain(f)
+            else:
+                yield from self._iter_compressed(f, method)
+
+    def _iter_plain(self, f) -> Iterator[bytes]:
+        for line in f:
+            # A line without a newline is an append still in progress elsewhere
+            if not line.endswith(b"\n"):
+                return
+            self.offset += len(line)
+            if line.strip():
+                yield line
+
+    def _iter_compressed(self, f, method: str) -> Iterator[bytes]:
+        decompressor = _decompressor(method)
+        pending = b""
+        member_lines: List[bytes] = []
+        member_start = self.offset
+        consumed = 0  # compressed bytes fed to the current decompressor
+        data = f.read(CHUNK_SIZE)
+        while data:
+            try:
+                output = decompressor.decompress(data)
+            except (zlib.error, lzma.LZMAError):
+                return  # damaged tail, e.g. from a writer that crashed mid-append
+            consumed += len(data)
+            lines = (pending + output).split(b"\n")
+            pending = lines.pop()
+            member_lines.extend(line + b"\n" for line in lines if line.strip())
+            if decompressor.eof:
+                unused = decompressor.unused_data
+                member_start += consumed - len(unused)
+                self.offset = member_start
+                yield from member_lines
+                member_lines = []
+                decompressor = _decompressor(method)
+                consumed = 0
+                data = unused or f.read(CHUNK_SIZE)
+            else:
+                data = f.read(CHUNK_SIZE)
@@ -0,0 +1,377 @@
+import json
+import logging
+import os
+from typing import Dict, Any, Hashable, Iterator, List, Optional, Set, Tuple
+from ..models import Experiment, Run
+from .base import StorageBackend
+from .locking import FileLock, atomic_write, append_bytes, append_lines
+from .compression import COMPRESSION_METHODS, SegmentReader, compress, detect_file
+from .blobs import extract_blobs, decode_runs
+from . import serialization
+
+RUNS_SUFFIX = ".runs.jsonl"
+BLOBS_SUFFIX = ".blobs.jsonl"
+CATALOG_FILENAME = "catalog.idx"
+LOCK_SUFFIX = ".lock"
+STORE_LOCK_FILENAME = "store.lock"
+
+logger = logging.getLogger(__name__)
+
+class JSONFileBackend(StorageBackend):
+    """Stores experiments as a JSON header file plus an append-only run segment.
+
+    ``{id}.json`` holds the experiment without its runs (name, version, prompts,
+    models) and ``{id}.runs.jsonl`` holds one serialized ``Run`` per line. Adding a
+    run appends a single line instead of rewriting the whole experiment.
+
+    ``catalog.idx`` maps ``(name, version)`` to experiment ids so experiments can be
+    found without reading every stored file. It is updated whenever a header is
+    saved and rebuilt from the headers if it is missing, or when a lookup misses
+    and the directory holds headers it does not know (e.g. copied-in files).
+
+    Several processes may share one store: headers and the catalog are replaced
+    atomically with write-then-rename, and read-modify-write sequences plus run
+    appends happen under advisory file locks (``{id}.lock`` and ``store.lock``).
+
+    With ``deduplicate`` enabled, prompts and function schemas are written once to
+    ``{id}.blobs.jsonl`` and runs refer to them by content hash. Ground truths are
+    stored that way too with ``deduplicate_ground_truths``, which only pays off
+    when the same ground truths recur across runs.
+
+    Files are written as compact JSON (``orjson`` is used when installed); pass
+    ``pretty=True`` to indent experiment headers for human reading.
+
+    ``compression`` ("gzip", "lzma" or "zlib", at ``compression_level``) compresses
+    the run and blob segments. Each append becomes one compressed member, segments
+    are decoded as a stream, and the format of a segment is detected when it is
+    read, so uncompressed segments written earlier stay readable. An existing
+    segment keeps its format until the experiment is rewritten with
+    ``save_experiment``. A member left incomplete by a writer that crashed
+    mid-append is truncated before the next append.
+    """
+
+    def __init__(self, storage_path: str = "experiments", deduplicate: bool = True, pretty: bool = False,
+                 compression: Optional[str] = None, compression_level: Optional[int] = None,
+                 member_size: int = 1000, deduplicate_ground_truths: bool = False):
+        if compression is not None and compression not in COMPRESSION_METHODS:
+            raise ValueError(f"Unknown compression method '{compression}', expected one of {COMPRESSION_METHODS}")
+        self.storage_path = storage_path
+        self.deduplicate = deduplicate
+        self.deduplicate_ground_truths = deduplicate_ground_truths
+        self.pretty = pretty
+        self.compression = compression
+        self.compression_level = compression_level
+        self.member_size = member_size
+        os.makedirs(storage_path, exist_ok=True)
+        self._catalog: Dict[Tuple[str, str], str] = {}
+        self._catalog_stat: Optional[Tuple[int, int]] = None
+        # directory mtime when the catalog was last known to cover every header
+        self._catalog_directory_mtime: Optional[int] = None
+        self._legacy_ids: Set[str] = set()
+        self._locks: Dict[Optional[str], FileLock] = {}
+        # experiment id -> ((inode, bytes read), blobs by hash)
+        self._blobs: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        # compressed segment path -> (inode, offset up to which its members are known to be complete)
+        self._segment_ends: Dict[str, Tuple[int, int]] = {}
+
+    def lock(self, experiment_id: Optional[str] = None) -> FileLock:
+        file_lock = self._locks.get(experiment_id)
+        if file_lock is None:
+            filename = f"{experiment_id}{LOCK_SUFFIX}" if experiment_id else STORE_LOCK_FILENAME
+            file_lock = self._locks.setdefault(experiment_id, FileLock(os.path.join(self.storage_path, filename)))
+        return file_lock
+
+    def find_experiment_id(self, name: str, version: str) -> Optional[str]:
+        catalog = self._read_catalog()
+        experiment_id = catalog.get((name, version))
+        if experiment_id and not os.path.exists(self._header_path(experiment_id)):
+            # The experiment was removed behind our back; drop the stale entry
+            catalog = self.rebuild_catalog()
+            experiment_id = catalog.get((name, version))
+        elif experiment_id is None and self._has_uncatalogued_headers(catalog):
+            catalog = self.rebuild_catalog()
+            experiment_id = catalog.get((name, version))
+        return experiment_id
+
+    def rebuild_catalog(self) -> Dict[Tuple[str, str], str]:
+        """Rebuild the (name, version) -> id catalog from the experiment headers."""
+        with self.lock():
+            catalog = {}
+            for experiment_id in self.list_experiment_ids():
+                try:
+                    data = self._read_header_data(experiment_id)
+                    catalog[(data["name"], data["version"])] = experiment_id
+                except Exception as e:
+                    logger.warning("Error loading experiment %s: %s", experiment_id, e)
+            self._write_catalog(catalog)
+            return catalog
+
+    def list_experiment_ids(self) -> List[str]:
+        return [filename[:-5] for filename in os.listdir(self.storage_path)  # Remove .json extension
+                if filename.endswith(".json")]
+
+    def load_header(self, experiment_id: str) -> Experiment:
+        try:
+            data = self._read_header_data(experiment_id)
+        except FileNotFoundError:
+            raise KeyError(f"Experiment '{experiment_id}' not found") from None
+        if data.pop("runs", None):
+            self._legacy_ids.add(experiment_id)
+        return Experiment.model_validate(data)
+
+    def load_runs(self, experiment_id: str) -> List[Run]:
+        return [run for batch in self.iter_run_batches(experiment_id) for run in batch]
+
+    def iter_run_batches(self, experiment_id: str, batch_size: int = 1000) -> Iterator[List[Run]]:
+        legacy_runs = self._load_legacy_runs(experiment_id) if experiment_id in self._legacy_ids else []
+        for start in range(0, len(legacy_runs), batch_size):
+            yield legacy_runs[start:start + batch_size]
+
+        batch = []
+        for line in self._iter_run_lines(experiment_id):
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield self._decode_runs(experiment_id, batch)
+                batch = []
+        if batch:
+            yield self._decode_runs(experiment_id, batch)
+
+    def count_runs(self, experiment_id: str) -> int:
+        legacy_count = len(self._read_header_data(experiment_id).get("runs", [])) if experiment_id in self._legacy_ids else 0
+        return legacy_count + sum(1 for _ in self._iter_run_lines(experiment_id))
+
+    def _iter_run_lines(self, experiment_id: str) -> Iterator[bytes]:
+        return iter(SegmentReader(self._runs_path(experiment_id)))
+
+    def revision(self, experiment_id: str) -> Hashable:
+        try:
+            runs_stat = self._stat_key(self._runs_path(experiment_id))
+        except FileNotFoundError:
+            runs_stat = None
+        try:
+            header_stat = self._stat_key(self._header_path(experiment_id))
+        except FileNotFoundError:
+            raise KeyError(f"Experiment '{experiment_id}' not found") from None
+        return header_stat, runs_stat
+
+    def save_header(self, experiment: Experiment):
+        if experiment.id in self._legacy_ids:
+            # Header written by an older version with embedded runs: move them to the
+            # run segment before the header is overwritten
+            self._write_runs(experiment.id, self.load_runs(experiment.id))
+            self._legacy_ids.discard(experiment.id)
+        self._write_header(experiment)
+        self._register_in_catalog(experiment)
+
+    def append_runs(self, experiment_id: str, runs: List[Run]):
+        with self.lock(experiment_id):
+            known_blobs = self._load_blobs(experiment_id) if self.deduplicate else {}
+            blob_lines, run_lines = self._encode_runs(runs, known_blobs)
+            if blob_lines:
+                # Blobs go first so a reader never sees a run whose blobs are missing
+                self._append_segment(self._blobs_path(experiment_id), blob_lines)
+                self._mark_blobs_read(experiment_id)
+            self._append_segment(self._runs_path(experiment_id), run_lines)
+
+    def save_experiment(self, experiment: Experiment):
+        self._legacy_ids.discard(experiment.id)
+        with self.lock(experiment.id):
+            self._write_runs(experiment.id, experiment.runs)
+            self._write_header(experiment)
+        self._register_in_catalog(experiment)
+
+    def _write_header(self, experiment: Experiment):
+        data = experiment.model_dump_json(exclude={"runs"}, indent=2 if self.pretty else None)
+        atomic_write(self._header_path(experiment.id), data.encode())
+
+    def _write_runs(self, experiment_id: str, runs: List[Run]):
+        self._blobs.pop(experiment_id, None)
+        blob_lines, run_lines = self._encode_runs(runs, {})
+        atomic_write(self._blobs_path(experiment_id), self._compress_segment(blob_lines))
+        atomic_write(self._runs_path(experiment_id), self._compress_segment(run_lines))
+
+    def _compress_segment(self, lines: bytes, method: Optional[str] = None) -> bytes:
+        """Compress lines as members of ``member_size`` lines so they can be streamed back.
+
+        ``method`` defaults to the configured compression.
+        """
+        method = method or self.compression
+        if method is None:
+            return lines
+        split = lines.splitlines(keepends=True)
+        return b"".join(
+            compress(b"".join(split[start:start + self.member_size]), method, self.compression_level)
+            for start in range(0, len(split), self.member_size)
+        )
+
+    def _append_segment(self, path: str, lines: bytes):
+        """Append lines in the segment's existing format, or the configured one for a new segment."""
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            method = detect_file(path)
+        else:
+            method = self.compression
+        if method is None:
+            append_lines(path, lines)
+        else:
+            # A torn member would swallow the one appended after it, so cut the file back to the last complete one
+            append_bytes(path, self._compress_segment(lines, method), self._complete_members_end(path))
+            stat = os.stat(path)
+            self._segment_ends[path] = (stat.st_ino, stat.st_size)
+
+    def _complete_members_end(self, path: str) -> int:
+        """Offset just past the last complete member, reading only what was appended since the last check."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return 0
+        inode, offset = self._segment_ends.get(path, (None, 0))
+        if stat.st_ino != inode or stat.st_size < offset:
+            offset = 0
+        if stat.st_size > offset:
+            reader = SegmentReader(path, offset)
+            for _ in reader:
+                pass
+            offset = reader.offset
+        return offset
+
+    def _encode_runs(self, runs: List[Run], known_blobs: Dict[str, Any]) -> Tuple[bytes, bytes]:
+        """Serialize runs to JSON lines, returning ``(new blob lines, run lines)``.
+
+        ``known_blobs`` is updated with the blobs that are written.
+        """
+        if not self.deduplicate:
+            return b"", b"".join(run.model_dump_json().encode() + b"\n" for run in runs)
+        blob_lines = []
+        run_lines = []
+        memo = {}
+        for run in runs:
+            data, blobs = extract_blobs(run, memo, self.deduplicate_ground_truths)
+            for digest, blob in blobs.items():
+                if digest not in known_blobs:
+                    known_blobs[digest] = blob
+                    blob_lines.append(serialization.dumps({"hash": digest, "data": blob}) + b"\n")
+            run_lines.append(serialization.dumps(data) + b"\n")
+        return b"".join(blob_lines), b"".join(run_lines)
+
+    def _decode_runs(self, experiment_id: str, lines: List[bytes]) -> List[Run]:
+        def fetch(hashes):
+            blobs = self._load_blobs(experiment_id)
+            return {digest: blobs[digest] for digest in hashes if digest in blobs}
+
+        return decode_runs(lines, fetch)
+
+    def _load_blobs(self, experiment_id: str) -> Dict[str, Any]:
+        """Return the blobs of an experiment, reading only what was appended since the last call."""
+        path = self._blobs_path(experiment_id)
+        (inode, offset), blobs = self._blobs.get(experiment_id, ((None, 0), {}))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._blobs[experiment_id] = ((None, 0), blobs)
+            return blobs
+        if stat.st_ino != inode or stat.st_size < offset:
+            # The segment was rewritten; start over
+            offset, blobs = 0, {}
+        if stat.st_size > offset:
+            reader = SegmentReader(path, offset)
+            for line in reader:
+                entry = serialization.loads(line)
+                blobs[entry["hash"]] = entry["data"]
+            offset = reader.offset
+        self._blobs[experiment_id] = ((stat.st_ino, offset), blobs)
+        return blobs
+
+    def _mark_blobs_read(self, experiment_id: str):
+        """Record that the blobs we just appended are already in memory."""
+        (_, _), blobs = self._blobs.get(experiment_id, ((None, 0), {}))
+        stat = os.stat(self._blobs_path(experiment_id))
+        self._blobs[experiment_id] = ((stat.st_ino, stat.st_size), blobs)
+
+    def _header_path(self, experiment_id: str) -> str:
+        return os.path.join(self.storage_path, f"{experiment_id}.json")
+
+    def _runs_path(self, experiment_id: str) -> str:
+        return os.path.join(self.storage_path, f"{experiment_id}{RUNS_SUFFIX}")
+
+    def _blobs_path(self, experiment_id: str) -> str:
+        return os.path.join(self.storage_path, f"{experiment_id}{BLOBS_SUFFIX}")
+
+    def _catalog_path(self) -> str:
+        return os.path.join(self.storage_path, CATALOG_FILENAME)
+
+    def _read_header_data(self, experiment_id: str) -> Dict[str, Any]:
+        with open(self._header_path(experiment_id), "rb") as f:
+            data = serialization.loads(f.read())
+
+        # Check if the data needs migration
+        if "version" not in data:
+            data = self._migrate_experiment_data(data)
+        return data
+
+    def _load_legacy_runs(self, experiment_id: str) -> List[Run]:
+        data = self._read_header_data(experiment_id)
+        return [Run.model_validate(run) for run in data.get("runs", [])]
+
+    def _read_catalog(self) -> Dict[Tuple[str, str], str]:
+        try:
+            stat = self._stat_key(self._catalog_path())
+        except FileNotFoundError:
+            return self.rebuild_catalog()
+        if stat != self._catalog_stat:
+            with open(self._catalog_path(), "r") as f:
+                entries = json.load(f)
+            self._catalog = {(entry["name"], entry["version"]): entry["id"] for entry in entries}
+            self._catalog_stat = stat
+        return self._catalog
+
+    def _write_catalog(self, catalog: Dict[Tuple[str, str], str]):
+        entries = [{"name": name, "version": version, "id": experiment_id}
+                   for (name, version), experiment_id in catalog.items()]
+        atomic_write(self._catalog_path(), json.dumps(entries).encode())
+        self._catalog = catalog
+        self._catalog_stat = self._stat_key(self._catalog_path())
+        self._catalog_directory_mtime = os.stat(self.storage_path).st_mtime_ns
+
+    def _has_uncatalogued_headers(self, catalog: Dict[Tuple[str, str], str]) -> bool:
+        """Whether headers were copied into the directory (or predate the catalog) without being cataloged.
+
+        The directory is only listed when it changed since the catalog was last checked.
+        """
+        directory_mtime = os.stat(self.storage_path).st_mtime_ns
+        if directory_mtime == self._catalog_directory_mtime:
+            return False
+        self._catalog_directory_mtime = directory_mtime
+        experiment_ids = self.list_experiment_ids()
+        return len(experiment_ids) != len(catalog) or not set(experiment_ids) <= set(catalog.values())
+
+    def _register_in_catalog(self, experiment: Experiment):
+        key = (experiment.name, experiment.version)
+        if self._read_catalog().get(key) == experiment.id:
+            return
+        with self.lock():
+            # Re-read under the lock so entries added by other processes are kept
+            catalog = dict(self._read_catalog())
+            catalog[key] = experiment.id
+            self._write_catalog(catalog)
+
+    @staticmethod
+    def _stat_key(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _migrate_experiment_data(data: Dict[str, Any]) -> Dict[str, Any]:
+        data["version"] = data.get("version", "1.0.0")  # Set a default version if not present
+        
+        # Migrate runs
+        for run in data.get("runs", []):
+            if "evaluation_result" in run:
+                eval_result = run["evaluation_result"]
+                if "metrics" in eval_result and "overall_accuracy" not in eval_result:
+                    # Migrate old format to new format
+                    eval_result["overall_accuracy"] = eval_result["metrics"].get("OverallAccuracy", 0.0)
+                    eval_result["field_results"] = {}
+                    eval_result["details"] = eval_result.get("details", {})
+                    eval_result.pop("metrics", None)
+
+        return data
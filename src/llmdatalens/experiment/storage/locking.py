@@ -0,0 +1,127 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    """Re-entrant advisory lock on a file, shared by threads of one process.
+
+    Uses ``flock`` on POSIX and ``msvcrt.locking`` on Windows. Other processes
+    taking the same lock file block until it is released.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:  # pragma: no cover - Windows
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:  # pragma: no cover - Windows
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+def atomic_write(path: str, data: bytes):
+    """Write ``data`` to a temporary file next to ``path`` and rename it into place.
+
+    Readers see either the old or the new content, never a partially written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def append_bytes(path: str, data: bytes, valid_size: Optional[int] = None):
+    """Append ``data`` to ``path`` with a single ``O_APPEND`` write.
+
+    With ``valid_size``, anything past that offset (e.g. a partial member left by a
+    writer that crashed mid-append) is truncated first. Must then be called while
+    holding the file's lock.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        if valid_size is not None and os.fstat(fd).st_size > valid_size:
+            os.ftruncate(fd, valid_size)
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+def append_lines(path: str, data: bytes):
+    """Append complete newline-terminated records to ``path`` with a single write.
+
+    Must be called while holding the file's lock. A trailing partial record left by
+    a writer that crashed mid-append is truncated first, so records never interleave.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        size = os.fstat(fd).st_size
+        if size and _read_at(fd, 1, size - 1) != b"\n":
+            tail_start = _last_record_end(fd, size)
+            os.ftruncate(fd, tail_start)
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+def _last_record_end(fd: int, size: int, chunk_size: int = 65536) -> int:
+    position = size
+    while position > 0:
+        start = max(0, position - chunk_size)
+        chunk = _read_at(fd, position - start, start)
+        index = chunk.rfind(b"\n")
+        if index != -1:
+            return start + index + 1
+        position = start
+    return 0
+
+def _read_at(fd: int, length: int, offset: int) -> bytes:
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, length)
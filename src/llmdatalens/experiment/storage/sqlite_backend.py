@@ -0,0 +1,243 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Set
+from ..models import Experiment, Run, Prompt, Model
+from .base import StorageBackend
+from .blobs import extract_blobs, decode_runs
+from . import serialization
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_experiments_name_version ON experiments (name, version);
+
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    experiment_id TEXT NOT NULL REFERENCES experiments (id),
+    id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_experiment ON runs (experiment_id, seq);
+
+CREATE TABLE IF NOT EXISTS prompts (
+    experiment_id TEXT NOT NULL REFERENCES experiments (id),
+    prompt_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (experiment_id, prompt_hash)
+);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    experiment_id TEXT NOT NULL REFERENCES experiments (id),
+    hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (experiment_id, hash)
+);
+
+CREATE TABLE IF NOT EXISTS models (
+    experiment_id TEXT NOT NULL REFERENCES experiments (id),
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (experiment_id, name)
+);
+"""
+
+class SQLiteBackend(StorageBackend):
+    """Stores experiments, runs, prompts and models in indexed SQLite tables.
+
+    The database runs in WAL mode so readers do not block the writer, and every
+    multi-row write happens in a single transaction. ``lock`` opens an immediate
+    write transaction, which serializes writers across processes.
+
+    With ``deduplicate`` enabled, prompts and function schemas are stored once per
+    experiment in the ``blobs`` table and runs refer to them by content hash.
+    Ground truths are stored that way too with ``deduplicate_ground_truths``, which
+    only pays off when the same ground truths recur across runs.
+    """
+
+    def __init__(self, database_path: str = "experiments.db", timeout: float = 30.0, deduplicate: bool = True,
+                 deduplicate_ground_truths: bool = False):
+        self.database_path = database_path
+        self.deduplicate = deduplicate
+        self.deduplicate_ground_truths = deduplicate_ground_truths
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._connection = sqlite3.connect(
+            database_path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        columns = {row[1] for row in self._query("PRAGMA table_info(experiments)")}
+        if "revision" not in columns:
+            self._connection.execute("ALTER TABLE experiments ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        self._connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one write transaction (re-entrant)."""
+        with self._lock:
+            if self._depth == 0:
+                self._connection.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self._connection
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._connection.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._connection.execute("COMMIT")
+
+    def lock(self, experiment_id: Optional[str] = None):
+        return self._transaction()
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def find_experiment_id(self, name: str, version: str) -> Optional[str]:
+        rows = self._query(
+            "SELECT id FROM experiments WHERE name = ? AND version = ? LIMIT 1", (name, version)
+        )
+        return rows[0][0] if rows else None
+
+    def list_experiment_ids(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT id FROM experiments ORDER BY created_at")]
+
+    def load_header(self, experiment_id: str) -> Experiment:
+        rows = self._query(
+            "SELECT id, name, version, description, created_at FROM experiments WHERE id = ?",
+            (experiment_id,)
+        )
+        if not rows:
+            raise KeyError(f"Experiment '{experiment_id}' not found")
+        experiment_id, name, version, description, created_at = rows[0]
+        prompts = {
+            prompt_hash: Prompt.model_validate_json(data)
+            for prompt_hash, data in self._query(
+                "SELECT prompt_hash, data FROM prompts WHERE experiment_id = ? ORDER BY rowid",
+                (experiment_id,)
+            )
+        }
+        models = {
+            name: Model.model_validate_json(data)
+            for name, data in self._query(
+                "SELECT name, data FROM models WHERE experiment_id = ? ORDER BY rowid", (experiment_id,)
+            )
+        }
+        return Experiment(
+            id=experiment_id,
+            name=name,
+            version=version,
+            description=description,
+            created_at=created_at,
+            prompts=prompts,
+            models=models
+        )
+
+    def load_runs(self, experiment_id: str) -> List[Run]:
+        rows = self._query(
+            "SELECT data FROM runs WHERE experiment_id = ? ORDER BY seq", (experiment_id,)
+        )
+        return self._decode_runs(experiment_id, [data for (data,) in rows])
+
+    def iter_run_batches(self, experiment_id: str, batch_size: int = 1000) -> Iterator[List[Run]]:
+        last_seq = 0
+        while True:
+            rows = self._query(
+                "SELECT seq, data FROM runs WHERE experiment_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (experiment_id, last_seq, batch_size)
+            )
+            if not rows:
+                return
+            last_seq = rows[-1][0]
+            yield self._decode_runs(experiment_id, [data for _, data in rows])
+
+    def count_runs(self, experiment_id: str) -> int:
+        return self._query("SELECT COUNT(*) FROM runs WHERE experiment_id = ?", (experiment_id,))[0][0]
+
+    def revision(self, experiment_id: str) -> Hashable:
+        rows = self._query("SELECT revision FROM experiments WHERE id = ?", (experiment_id,))
+        if not rows:
+            raise KeyError(f"Experiment '{experiment_id}' not found")
+        return rows[0][0]
+
+    def _bump_revision(self, connection: sqlite3.Connection, experiment_id: str):
+        connection.execute("UPDATE experiments SET revision = revision + 1 WHERE id = ?", (experiment_id,))
+
+    def save_header(self, experiment: Experiment):
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO experiments (id, name, version, description, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, version = excluded.version, "
+                "description = excluded.description, revision = experiments.revision + 1",
+                (experiment.id, experiment.name, experiment.version, experiment.description,
+                 experiment.created_at.isoformat())
+            )
+            connection.executemany(
+                "INSERT INTO prompts (experiment_id, prompt_hash, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (experiment_id, prompt_hash) DO UPDATE SET data = excluded.data",
+                [(experiment.id, prompt_hash, prompt.model_dump_json())
+                 for prompt_hash, prompt in experiment.prompts.items()]
+            )
+            connection.executemany(
+                "INSERT INTO models (experiment_id, name, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (experiment_id, name) DO UPDATE SET data = excluded.data",
+                [(experiment.id, name, model.model_dump_json()) for name, model in experiment.models.items()]
+            )
+
+    def append_runs(self, experiment_id: str, runs: List[Run]):
+        if self.deduplicate:
+            blobs: Dict[str, Any] = {}
+            rows = []
+            memo = {}
+            for run in runs:
+                data, run_blobs = extract_blobs(run, memo, self.deduplicate_ground_truths)
+                blobs.update(run_blobs)
+                rows.append((experiment_id, run.id, serialization.dumps(data).decode()))
+        else:
+            blobs = {}
+            rows = [(experiment_id, run.id, run.model_dump_json()) for run in runs]
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO blobs (experiment_id, hash, data) VALUES (?, ?, ?)",
+                [(experiment_id, digest, serialization.dumps(blob).decode()) for digest, blob in blobs.items()]
+            )
+            connection.executemany("INSERT INTO runs (experiment_id, id, data) VALUES (?, ?, ?)", rows)
+            self._bump_revision(connection, experiment_id)
+
+    def _decode_runs(self, experiment_id: str, rows: List[str]) -> List[Run]:
+        def fetch(hashes: Set[str]) -> Dict[str, Any]:
+            found = {}
+            hashes = list(hashes)
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                found.update(
+                    (digest, serialization.loads(data)) for digest, data in self._query(
+                        f"SELECT hash, data FROM blobs WHERE experiment_id = ? AND hash IN ({placeholders})",
+                        (experiment_id, *chunk)
+                    )
+                )
+            return found
+
+        return decode_runs(rows, fetch)
+
+    def save_experiment(self, experiment: Experiment):
+        with self._transaction() as connection:
+            # The saved experiment replaces the stored one, including prompts and models it no longer has
+            for table in ("prompts", "models", "runs", "blobs"):
+                connection.execute(f"DELETE FROM {table} WHERE experiment_id = ?", (experiment.id,))
+            self.save_header(experiment)
+            self.append_runs(experiment.id, experiment.runs)
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, TYPE_CHECKING
+from .models import Experiment, Run, Prompt, Model
+
+if TYPE_CHECKING:
+    from .storage import StorageBackend
+
+class ExperimentView:
+    """Read-only view of a stored experiment that loads its runs on demand.
+
+    The header (name, version, prompts, models) is loaded eagerly; runs are only
+    read from the backend when iterated, so memory stays bounded by ``batch_size``.
+    """
+
+    def __init__(self, header: Experiment, backend: "StorageBackend"):
+        self._header = header
+        self._backend = backend
+        self._runs: Optional[List[Run]] = None
+
+    @property
+    def id(self) -> str:
+        return self._header.id
+
+    @property
+    def name(self) -> str:
+        return self._header.name
+
+    @property
+    def version(self) -> str:
+        return self._header.version
+
+    @property
+    def description(self) -> str:
+        return self._header.description
+
+    @property
+    def created_at(self) -> datetime:
+        return self._header.created_at
+
+    @property
+    def prompts(self) -> Dict[str, Prompt]:
+        return self._header.prompts
+
+    @property
+    def models(self) -> Dict[str, Model]:
+        return self._header.models
+
+    def iter_runs(self, batch_size: int = 1000) -> Iterator[Run]:
+        """Yield runs in insertion order, reading at most ``batch_size`` at a time."""
+        for batch in self._backend.iter_run_batches(self.id, batch_size=batch_size):
+            yield from batch
+
+    def iter_run_batches(self, batch_size: int = 1000) -> Iterator[List[Run]]:
+        return self._backend.iter_run_batches(self.id, batch_size=batch_size)
+
+    def count_runs(self) -> int:
+        return self._backend.count_runs(self.id)
+
+    @property
+    def runs(self) -> List[Run]:
+        """All runs, loaded on first access and kept for later accesses."""
+        if self._runs is None:
+            self._runs = list(self.iter_runs())
+        return self._runs
+
+    def to_experiment(self) -> Experiment:
+        """Materialize the full ``Experiment`` including every run."""
+        return self._header.model_copy(update={"runs": list(self.runs)})
+
+    def __repr__(self):
+        return f"ExperimentView(id={self.id!r}, name={self.name!r}, version={self.version!r})"
@@ -0,0 +1,125 @@
+import math
+import pickle
+import random
+import pytest
+from llmdatalens.core import metrics
+from llmdatalens.core.enums import MetricField
+from llmdatalens.core.metrics_registry import (
+    MetricAccumulator, MetricNames, MetricsRegistry, metrics_registry, register_metric
+)
+
+def shards(values, sizes):
+    start = 0
+    for size in sizes:
+        yield values[start:start + size]
+        start += size
+
+def sharded(name, inputs, sizes):
+    """Compute a metric from per-shard states that went through pickle, as if shipped from other processes."""
+    info = metrics_registry.get(name)
+    keys = list(inputs)
+    states = [
+        pickle.loads(pickle.dumps(info.partial(**dict(zip(keys, shard_values)))))
+        for shard_values in zip(*(shards(inputs[key], sizes) for key in keys))
+    ]
+    return info.combine(states)
+
+@pytest.fixture
+def isolated_registry(monkeypatch):
+    """Metrics registered by the test are dropped from the registry and ``MetricNames`` afterwards."""
+    monkeypatch.setattr(MetricsRegistry, "_registry", dict(MetricsRegistry._registry))
+    names = set(vars(MetricNames))
+    yield metrics_registry
+    for name in set(vars(MetricNames)) - names:
+        delattr(MetricNames, name)
+
+@pytest.fixture
+def data():
+    rng = random.Random(3)
+    ground_truths = [
+        {"number": f"INV-{i}", "total": rng.choice([10, 20, 30]), "items": [{"price": rng.randint(1, 3)}]}
+        for i in range(50)
+    ]
+    predictions = [
+        {key: (value if rng.random() < 0.7 else None) for key, value in gt.items()} for gt in ground_truths
+    ]
+    return {
+        "ground_truths": ground_truths,
+        "predictions": predictions,
+        "latencies": [rng.uniform(0.1, 2.0) for _ in range(50)],
+        "confidences": [rng.random() for _ in range(50)],
+        "accuracies": [rng.random() for _ in range(50)],
+        "labels": ([rng.choice("abc") for _ in range(50)], [rng.choice("abcd") for _ in range(50)]),
+    }
+
+SIZES = [7, 0, 30, 13]
+
+def test_accumulators_match_list_based_metrics(data):
+    pairs = {"ground_truths": data["ground_truths"], "predictions": data["predictions"]}
+    y = {"y_true": data["ground_truths"], "y_pred": data["predictions"]}
+    labels = {"y_true": data["labels"][0], "y_pred": data["labels"][1]}
+
+    assert sharded("OverallAccuracy", pairs, SIZES) == metrics.calculate_overall_accuracy(**pairs)
+    assert sharded("ErrorRate", y, SIZES) == metrics.calculate_error_rate(**y)
+    # The list-based version goes through sklearn, which needs flat fields of one type
+    flat = {
+        "ground_truths": [{"number": gt["number"], "total": gt["total"]} for gt in data["ground_truths"]],
+        "predictions": [{"number": p["number"] or "?", "total": p["total"] or 0} for p in data["predictions"]]
+    }
+    assert sharded("FieldSpecificAccuracy", flat, SIZES) == metrics.calculate_field_specific_accuracy(**flat)
+    assert sharded("F1Score", labels, SIZES) == pytest.approx(metrics.calculate_f1_score(**labels))
+    # np.mean and np.std round differently, and the variance merge is itself approximate
+    for name, key, func in [
+        ("AverageLatency", "latencies", metrics.calculate_average_latency),
+        ("ConfidenceScore", "confidences", metrics.calculate_confidence_score),
+        ("ConsistencyScore", "accuracies", metrics.calculate_consistency_score),
+    ]:
+        assert sharded(name, {key: data[key]}, SIZES) == pytest.approx(func(data[key]), rel=1e-12)
+
+def test_sums_merge_exactly_in_any_order():
+    values = [1e16, 1.0, -1e16, 0.1] * 25
+    info = metrics_registry.get("AverageLatency")
+    states = [info.partial(latencies=shard) for shard in shards(values, [3, 40, 57])]
+
+    assert info.combine(states) == info.combine(reversed(states)) == math.fsum(values) / 100
+
+def test_throughput_combines_scalar_shards():
+    info = metrics_registry.get("Throughput")
+    states = [info.partial(total_items=10, total_time=2.0), info.partial(total_items=30, total_time=2.0)]
+    assert info.combine(states) == 10.0
+
+def test_metrics_without_accumulator_fall_back_to_concatenated_lists(isolated_registry):
+    @register_metric("ShardTestMedian", field=MetricField.Other, input_keys=["values"])
+    def median(values):
+        return sorted(values)[len(values) // 2]
+
+    info = isolated_registry.get("ShardTestMedian")
+    assert info.accumulator is None
+    assert info.combine([info.partial(values=[5, 1]), info.partial(values=[3])]) == 3
+
+def test_scalar_inputs_without_accumulator_cannot_be_sharded():
+    info = metrics_registry.get("RobustnessScore")
+    assert info.accumulator is None
+    with pytest.raises(ValueError, match="normal_accuracy"):
+        info.combine([info.partial(normal_accuracy=0.9, challenging_accuracy=0.8)])
+
+def test_register_metric_with_custom_accumulator(isolated_registry):
+    class CountAccumulator(MetricAccumulator):
+        def init(self):
+            return 0
+
+        def update(self, state, **inputs):
+            return state + len(inputs["items"])
+
+        def merge(self, state, other):
+            return state + other
+
+        def finalize(self, state):
+            return state
+
+    @register_metric("ShardTestCount", input_keys=["items"], accumulator=CountAccumulator())
+    def count(items):
+        return len(items)
+
+    info = isolated_registry.get("ShardTestCount")
+    assert info.combine(info.partial(items=shard) for shard in shards(list(range(10)), [4, 6])) == count(list(range(10)))
@@ -0,0 +1,82 @@
+import random
+import numpy as np
+import pytest
+from llmdatalens.evaluators import compile_evaluation_plan, evaluate_columnar
+from llmdatalens.experiment.models import FunctionSchema
+
+SCHEMA = FunctionSchema(
+    name="extract_invoice",
+    parameters={
+        "type": "object",
+        "properties": {
+            "invoice_number": {"type": "string"},
+            "total": {"type": "number"},
+            "quantity": {"type": "integer"},
+            "status": {"type": "string", "enum": ["paid", "unpaid", "overdue"]},
+            "tags": {"type": "array", "items": {"type": "string"}}
+        }
+    }
+)
+
+EDGE_VALUES = [None, True, "7", float("nan"), float("inf"), 2 ** 60, 2 ** 60 + 1, [1], "a\x00"]
+
+def random_value(rng, field_name, ground_truth):
+    if rng.random() < 0.5:
+        return ground_truth
+    if rng.random() < 0.3:
+        return rng.choice(EDGE_VALUES)
+    if field_name in ("total", "quantity"):
+        return ground_truth + rng.choice([1e-10, 1e-5, 0.005, 0.02, 1]) if isinstance(ground_truth, (int, float)) else 1.0
+    if field_name == "status":
+        return rng.choice(["paid", "unpaid", "overdue", "lost"])
+    if field_name == "tags":
+        return ["urgent"]
+    return "INV-" + str(rng.randint(0, 3))
+
+def test_columnar_matches_scalar_path():
+    rng = random.Random(7)
+    plan = compile_evaluation_plan(SCHEMA)
+    gt_outputs = [
+        {
+            "invoice_number": "INV-" + str(rng.randint(0, 3)),
+            "total": rng.choice([round(rng.uniform(0, 1000), 2), 0, -5.5, 2 ** 60, None]),
+            "quantity": rng.randint(0, 5),
+            "status": rng.choice(["paid", "unpaid", "overdue"]),
+            "tags": rng.choice([[], ["urgent"]])
+        }
+        for _ in range(2000)
+    ]
+    predicted_outputs = [
+        {field_name: random_value(rng, field_name, value) for field_name, value in gt_output.items()}
+        for gt_output in gt_outputs
+    ]
+
+    result = evaluate_columnar(plan, predicted_outputs, gt_outputs)
+
+    scalar = [plan.evaluate(p, g) for p, g in zip(predicted_outputs, gt_outputs)]
+    for column, field_name in enumerate(result.field_names):
+        assert result.correct[:, column].tolist() == [r.field_results[field_name].correct for r in scalar], field_name
+    assert np.allclose(result.overall_accuracy, [r.overall_accuracy for r in scalar])
+
+def test_columnar_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        evaluate_columnar(compile_evaluation_plan(SCHEMA), [{}], [])
+
+def test_exact_strings_do_not_pad_to_the_longest_value():
+    import tracemalloc
+    plan = compile_evaluation_plan(SCHEMA)
+    long_value = "x" * 1_000_000
+    gt_outputs = [{"invoice_number": f"INV-{i}"} for i in range(2000)] + [{"invoice_number": long_value}]
+    predicted_outputs = [dict(output) for output in gt_outputs[:-1]] + [{"invoice_number": long_value + "y"}]
+
+    tracemalloc.start()
+    try:
+        result = evaluate_columnar(plan, predicted_outputs, gt_outputs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    column = result.field_names.index("invoice_number")
+    assert result.correct[:-1, column].all() and not result.correct[-1, column]
+    # A fixed-width str array would take 2001 * 4 MB
+    assert peak < 20_000_000
@@ -1,7 +1,8 @@
 import pytest
 import json
 from llmdatalens.evaluators.field_evaluators import (
-    NumberFieldEvaluator, StringFieldEvaluator, EnumFieldEvaluator, ArrayFieldEvaluator
+    NumberFieldEvaluator, StringFieldEvaluator, StringPrefilter, EnumFieldEvaluator, ArrayFieldEvaluator,
+    SchemaFieldEvaluator, create_field_evaluator
 )
 from llmdatalens.evaluators.llm_evaluator import LLMEvaluator
 from unittest.mock import Mock
@@ -30,6 +31,32 @@ def test_string_field_evaluator():
     result = evaluator.evaluate("hello", "world")
     assert result["correct"] == False
 
+def test_string_prefilter_tiers():
+    prefilter = StringPrefilter(accept_threshold=0.8, reject_threshold=0.2)
+    assert prefilter.decide("Acme Corp", "Acme Corp") == (True, "exact", None)
+    assert prefilter.decide(" acme   CORP", "Acme Corp") == (True, "normalized", None)
+    assert prefilter.decide("Acme Corp.", "Acme Corp")[:2] == (True, "ngram")
+    assert prefilter.decide("Globex", "Acme Corp")[:2] == (False, "ngram")
+    correct, tier, similarity = prefilter.decide("Acme Corporation", "Acme Corp")
+    assert (correct, tier) == (None, "llm") and 0.2 < similarity < 0.8
+
+def test_default_string_prefilter_leaves_near_misses_to_the_judge():
+    correct, tier, _ = StringPrefilter().decide("Monthly subscription fee for 100 users", "Monthly subscription fee for 900 users")
+    assert (correct, tier) == (None, "llm")
+
+def test_string_field_evaluator_skips_judge_for_prefiltered_pairs():
+    llm_evaluator = Mock(spec=LLMEvaluator)
+    llm_evaluator.evaluate_relevancy.return_value = {"relevancy_score": 0.9, "statements": [], "relevant_statements": [], "reason": ""}
+    evaluator = StringFieldEvaluator(field_name="customer_name", field_schema={"type": "string"}, use_llm=True)
+    object.__setattr__(evaluator, "llm_evaluator", llm_evaluator)
+
+    assert evaluator.evaluate("ACME corp", "Acme Corp")["tier"] == "normalized"
+    assert llm_evaluator.evaluate_relevancy.call_count == 0
+
+    result = evaluator.evaluate("Acme Corporation", "Acme Corp")
+    assert result["tier"] == "llm" and result["correct"]
+    llm_evaluator.evaluate_relevancy.assert_called_once_with("Acme Corp", "Acme Corporation")
+
 def test_enum_field_evaluator():
     evaluator = EnumFieldEvaluator(field_name="test", field_schema={"type": "string", "enum": ["red", "green", "blue"]})
     result = evaluator.evaluate("red", "red")
@@ -96,4 +123,150 @@ def test_array_field_evaluator_with_nested_objects():
     predicted = [{"name": "item1", "value": 10}, {"name": "item2", "value": 20}]
     ground_truth = [{"name": "item1", "value": 10}, {"name": "item2", "value": 20}, {"name": "item3", "value": 30}]
     result = evaluator.evaluate(predicted, ground_truth)
-    assert result["correct"] == False
\ No newline at end of file
+    assert result["correct"] == False
+LINE_ITEMS_SCHEMA = {
+    "type": "array",
+    "items": {"type": "object", "properties": {"name": {"type": "string"}, "value": {"type": "number"}}}
+}
+
+def test_array_field_evaluator_unordered_matching():
+    evaluator = ArrayFieldEvaluator(field_name="test", field_schema=LINE_ITEMS_SCHEMA, matching="unordered")
+    ground_truth = [{"name": "item1", "value": 10}, {"name": "item2", "value": 20}, {"name": "item2", "value": 20}]
+    predicted = [{"name": "item2", "value": 20.0}, {"name": "item1", "value": 10, "note": None}, {"name": "item2", "value": 20}]
+
+    result = evaluator.evaluate(predicted, ground_truth)
+
+    assert result["correct"] == True
+    assert [r["ground_truth_index"] for r in result["details"]["item_results"]] == [1, 0, 2]
+    assert ArrayFieldEvaluator(field_name="test", field_schema=LINE_ITEMS_SCHEMA).evaluate(predicted, ground_truth)["correct"] == False
+
+    result = evaluator.evaluate(predicted[:2] + [{"name": "item3", "value": 30}], ground_truth)
+    assert result["details"]["correct_items"] == 2
+    assert [r.get("error") is not None for r in result["details"]["item_results"]] == [False, False, True, True]
+
+def test_array_field_evaluator_assignment_pairs_remaining_items_by_similarity():
+    evaluator = ArrayFieldEvaluator(field_name="test", field_schema=LINE_ITEMS_SCHEMA, matching="assignment")
+    ground_truth = [{"name": "Laptop", "value": 899}, {"name": "Mouse", "value": 25}, {"name": "Cable", "value": 5}]
+    predicted = [{"name": "Mouse", "value": 24}, {"name": "Dock", "value": 120}, {"name": "Laptop", "value": 899}]
+
+    result = evaluator.evaluate(predicted, ground_truth)
+
+    item_results = result["details"]["item_results"]
+    assert result["details"]["correct_items"] == 1
+    assert item_results[0]["ground_truth"] == {"name": "Mouse", "value": 25} and item_results[0]["similarity"] == 0.5
+    assert item_results[1]["error"] and item_results[1]["predicted"] == {"name": "Dock", "value": 120}
+    assert item_results[2]["ground_truth_index"] == 0 and "similarity" not in item_results[2]
+    assert item_results[3]["ground_truth"] == {"name": "Cable", "value": 5} and item_results[3]["predicted"] is None
+
+def test_array_field_evaluator_unordered_scales_to_long_arrays():
+    evaluator = ArrayFieldEvaluator(field_name="test", field_schema=LINE_ITEMS_SCHEMA, matching="assignment")
+    ground_truth = [{"name": f"item{i}", "value": i} for i in range(5000)]
+    predicted = list(reversed(ground_truth))
+    predicted[0] = {"name": "item4999", "value": -1}
+
+    result = evaluator.evaluate(predicted, ground_truth)
+
+    assert result["details"]["correct_items"] == 4999
+    assert result["details"]["item_results"][0]["ground_truth_index"] == 4999
+
+def test_array_field_evaluator_rejects_unknown_matching():
+    with pytest.raises(ValueError):
+        ArrayFieldEvaluator(field_name="test", field_schema=LINE_ITEMS_SCHEMA, matching="fuzzy")
+
+INVOICE_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "billing": {
+            "type": "object",
+            "properties": {
+                "address": {"type": "object", "properties": {"city": {"type": "string"}, "zip": {"type": "integer"}}},
+                "currency": {"allOf": [{"$ref": "#/$defs/Currency"}]}
+            }
+        },
+        "line_items": {"type": "array", "items": {"$ref": "#/$defs/LineItem"}}
+    },
+    "$defs": {
+        "Currency": {"type": "string", "enum": ["USD", "EUR"]},
+        "LineItem": {
+            "type": "object",
+            "properties": {"name": {"type": "string"}, "price": {"type": "number"}, "currency": {"$ref": "#/$defs/Currency"}}
+        }
+    }
+}
+
+def test_schema_field_evaluator_compares_nested_leaves():
+    evaluator = create_field_evaluator("billing", INVOICE_PARAMETERS["properties"]["billing"], root_schema=INVOICE_PARAMETERS)
+    assert isinstance(evaluator, SchemaFieldEvaluator)
+    ground_truth = {"address": {"city": "Berlin", "zip": 10115}, "currency": "EUR"}
+
+    result = evaluator.evaluate({"address": {"city": "Berlin", "zip": 10115.0}, "currency": "EUR"}, ground_truth)
+    assert result["correct"] == True
+    assert result["details"]["total_leaves"] == 3
+
+    result = evaluator.evaluate({"address": {"city": "Berlin", "zip": "10115"}, "currency": "GBP"}, ground_truth)
+    assert result["correct"] == False
+    assert result["details"]["leaf_accuracy"] == pytest.approx(1 / 3)
+    assert [m["path"] for m in result["details"]["mismatches"]] == ["address.zip", "currency"]
+
+    result = evaluator.evaluate("Berlin", ground_truth)
+    assert result["details"]["correct_leaves"] == 0
+
+def test_array_field_evaluator_uses_item_schema():
+    evaluator = create_field_evaluator("line_items", INVOICE_PARAMETERS["properties"]["line_items"], root_schema=INVOICE_PARAMETERS)
+    ground_truth = [{"name": "Laptop", "price": 899.99, "currency": "USD"}, {"name": "Mouse", "price": 25, "currency": "USD"}]
+    predicted = [{"name": "Laptop", "price": 899.9900000001, "currency": "USD", "sku": "LP-1"}, {"name": "Mouse", "price": 25, "currency": "EUR"}]
+
+    result = evaluator.evaluate(predicted, ground_truth)
+
+    assert result["details"]["correct_items"] == 1
+    assert result["details"]["correct_leaves"] == 5 and result["details"]["total_leaves"] == 6
+    assert result["details"]["item_results"][1]["mismatches"][0]["path"] == "currency"
+
+    result = evaluator.evaluate(predicted[:1], ground_truth)
+    assert result["details"]["correct_leaves"] == 3 and result["details"]["total_leaves"] == 6
+
+def test_schema_field_evaluator_handles_deep_recursive_schemas():
+    parameters = {
+        "type": "object",
+        "properties": {"tree": {"$ref": "#/$defs/Node"}},
+        "$defs": {"Node": {"type": "object", "properties": {"value": {"type": "integer"}, "child": {"$ref": "#/$defs/Node"}}}}
+    }
+    evaluator = create_field_evaluator("tree", parameters["properties"]["tree"], root_schema=parameters)
+    tree = None
+    for depth in range(5000):
+        tree = {"value": depth, "child": tree}
+
+    result = evaluator.evaluate(tree, tree)
+
+    assert result["correct"] == True
+    # Each level has a value; the innermost child is absent on both sides
+    assert result["details"]["total_leaves"] == 5000 * 2 - 4999
+
+def test_schema_field_evaluator_compiles_pydantic_recursive_models():
+    from typing import List, Optional
+    from pydantic import BaseModel, Field
+    from llmdatalens.evaluators.schema_evaluator import ARRAY, OBJECT
+
+    class Tree(BaseModel):
+        value: int
+        children: List["Tree"] = []
+        left: "Tree" = Field(default=None, description="Left subtree")
+        right: Optional["Tree"] = None
+
+    schema = Tree.model_json_schema()
+    # pydantic puts annotations next to the recursive $ref and wraps Optional in anyOf
+    assert set(schema["$defs"]["Tree"]["properties"]["left"]) > {"$ref"}
+    evaluator = create_field_evaluator("tree", schema, root_schema=schema)
+    ground_truth = {"value": 1, "children": [{"value": 2}], "left": {"value": 3}, "right": {"value": 4, "left": {"value": 5}}}
+    predicted = {**ground_truth, "right": {"value": 4, "left": {"value": 6}}}
+
+    result = evaluator.evaluate(predicted, ground_truth)
+
+    assert isinstance(evaluator, SchemaFieldEvaluator)
+    assert result["correct"] == False
+    assert [m["path"] for m in result["details"]["mismatches"]] == ["right.left.value"]
+    # Annotated, nullable and item references all share the definition's node
+    nodes = evaluator._comparator.nodes
+    references = {index for kind, payload in nodes if kind == OBJECT for key, index in payload if key in ("left", "right")}
+    assert len(references) == 1
+    assert nodes[nodes[0][1][1][1]] == (ARRAY, references.pop())
@@ -0,0 +1,280 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from llmdatalens.evaluators import StructuredOutputEvaluator, JudgmentCache, LLMEvaluator, StringPrefilter, compile_evaluation_plan, evaluate_batch
+from llmdatalens.experiment import ExperimentManager
+from llmdatalens.experiment.models import LLMStructuredOutput, GroundTruth, Metadata, Prompt, FunctionSchema
+
+TICKET_SCHEMA = FunctionSchema(
+    name="Ticket",
+    parameters={
+        "type": "object",
+        "properties": {
+            "number": {"type": "string"},
+            "description": {"type": "string"},
+            "priority": {"type": "string", "enum": ["low", "high"]}
+        }
+    }
+)
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Answers chat completions like the judge would: outputs containing 'wrong' are irrelevant."""
+    daemon_threads = True
+
+    def __init__(self, delay=0.05):
+        super().__init__(("127.0.0.1", 0), MockOpenAIHandler)
+        self.delay = delay
+        # Added to item ids in batched answers, e.g. 1 for a judge that numbers items from 1
+        self.id_offset = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self.batch_sizes = []
+        self.counter_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+def judge(actual_output):
+    score = 0.0 if "wrong" in actual_output else 1.0
+    return {
+        "statements": [actual_output],
+        "relevant_statements": [] if score == 0.0 else [actual_output],
+        "relevancy_score": score,
+        "reason": "mock"
+    }
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        with server.counter_lock:
+            server.connections.add(self.client_address)
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = body["messages"][-1]["content"]
+            actual_outputs = [output.strip() for output in re.findall(r"Actual Output:(.*)", prompt)]
+            server.batch_sizes.append(len(actual_outputs))
+            time.sleep(server.delay)
+            if "Item 0:" in prompt:
+                # Batched request: answer with an array, without a score for items the judge "garbles"
+                # and leaving out the ones it "drops"
+                content = json.dumps([
+                    dict(judge(actual_output), id=index + server.id_offset,
+                         **({"relevancy_score": "n/a"} if "garble" in actual_output else {}))
+                    for index, actual_output in enumerate(actual_outputs) if "drop" not in actual_output
+                ])
+            else:
+                content = json.dumps(judge(actual_outputs[0]))
+            payload = json.dumps({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server.counter_lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def mock_server():
+    server = MockOpenAIServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_ticket(i):
+    data = {"number": f"T-{i}", "description": f"Printer on floor {i} is jammed", "priority": "high"}
+    # Paraphrased so that the local prefilter leaves every description to the judge
+    predicted = dict(data, description=f"wrong answer {i}" if i % 3 == 0 else f"The printer on floor {i} jammed")
+    return predicted, data
+
+def make_evaluator(tmp_path, mock_server, **kwargs):
+    evaluator = StructuredOutputEvaluator(
+        experiment_manager=ExperimentManager(storage_path=str(tmp_path)),
+        experiment_name="Ticket Experiment",
+        experiment_version="1.0",
+        openai_api_key="test-key",
+        openai_base_url=mock_server.base_url,
+        **kwargs
+    )
+    prompt = Prompt(system="Extract the ticket", function_call=TICKET_SCHEMA)
+    for i in range(12):
+        predicted, data = make_ticket(i)
+        evaluator.add_llm_output(LLMStructuredOutput(
+            structured_output=predicted,
+            metadata=Metadata(model_name="gpt-4o-mini", model_version="1.0", prompt=prompt)
+        ))
+        evaluator.add_ground_truth(GroundTruth(data=data))
+    return evaluator
+
+def test_evaluate_batch_merges_judgments_into_fields(mock_server):
+    plan = compile_evaluation_plan(TICKET_SCHEMA, LLMEvaluator(api_key="test-key", base_url=mock_server.base_url))
+    items = [(plan, *make_ticket(i)) for i in range(6)]
+
+    results = evaluate_batch(items, max_concurrency=4)
+
+    assert mock_server.requests == 6
+    for i, result in enumerate(results):
+        description = result.field_results["description"]
+        assert description.correct == (i % 3 != 0)
+        assert description.predicted == items[i][1]["description"]
+        assert description.details["details"]["relevancy_score"] == (0.0 if i % 3 == 0 else 1.0)
+        assert result.field_results["number"].correct
+
+def test_async_judge_matches_sync_and_bounds_concurrency(tmp_path, mock_server):
+    sync_result = make_evaluator(tmp_path / "sync", mock_server).evaluate()
+    assert mock_server.max_in_flight == 1
+
+    mock_server.max_in_flight = 0
+    async_result = make_evaluator(
+        tmp_path / "async", mock_server, async_judge=True, judge_concurrency=4, judge_batch_size=8
+    ).evaluate()
+
+    assert async_result == sync_result
+    assert async_result.overall_accuracy == pytest.approx((8 * 1.0 + 4 * 2 / 3) / 12)
+    assert 1 < mock_server.max_in_flight <= 4
+    assert mock_server.requests == 24
+
+def test_async_judge_in_thread_chunks(tmp_path, mock_server):
+    evaluator = make_evaluator(tmp_path, mock_server, async_judge=True, judge_concurrency=3)
+    result = evaluator.evaluate(workers=2, executor="thread", chunk_size=6)
+
+    assert result.overall_accuracy == pytest.approx((8 * 1.0 + 4 * 2 / 3) / 12)
+    assert mock_server.requests == 12
+    assert mock_server.max_in_flight <= 2 * 3
+    assert len(evaluator.experiment_manager.get_experiment(evaluator.experiment_id).runs) == 12
+
+def test_judgment_cache_bypasses_network(tmp_path, mock_server):
+    cache_path = str(tmp_path / "judgments.db")
+    first = make_evaluator(tmp_path / "first", mock_server, judgment_cache=JudgmentCache(cache_path)).evaluate()
+    assert mock_server.requests == 12
+
+    # A fresh cache object on the same file, as in a later session
+    cache = JudgmentCache(cache_path)
+    second = make_evaluator(tmp_path / "second", mock_server, async_judge=True, judgment_cache=cache).evaluate()
+
+    assert mock_server.requests == 12
+    assert (cache.hits, cache.misses) == (12, 0)
+    assert second == first
+
+def test_judgment_cache_evicts_least_recently_used(tmp_path):
+    cache = JudgmentCache(str(tmp_path / "judgments.db"), max_entries=3, evict_interval=1)
+    keys = [JudgmentCache.make_key("gpt-4o-mini", "v1", "input", f"output {i}") for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, {"relevancy_score": 1.0})
+    assert cache.get(keys[0]) == {"relevancy_score": 1.0}
+
+    cache.put(keys[3], {"relevancy_score": 0.5})
+
+    assert len(cache) == 3
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[3]) is not None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_judged_fields_share_one_pooled_client(tmp_path, mock_server):
+    evaluator = make_evaluator(tmp_path, mock_server)
+    evaluator.evaluate()
+
+    plan = evaluator._get_evaluation_plan(TICKET_SCHEMA)
+    judges = {id(field_evaluator.llm_evaluator) for field_evaluator in plan.field_evaluators[:2]}
+    assert judges == {id(evaluator._get_judge())}
+    assert evaluator._get_judge().get_client() is LLMEvaluator(
+        api_key="test-key", base_url=mock_server.base_url
+    ).get_client()
+    # Twelve sequential judge calls over a single keep-alive connection
+    assert mock_server.requests == 12
+    assert len(mock_server.connections) == 1
+
+def test_batched_judge_retries_only_unparsed_items(mock_server):
+    llm_evaluator = LLMEvaluator(api_key="test-key", base_url=mock_server.base_url, batch_size=4)
+    pairs = [("Printer is jammed", "Printer is jammed"), ("Printer is jammed", "wrong answer"),
+             ("Printer is jammed", "garble"), ("Printer is jammed", "Printer jammed"),
+             ("Printer is jammed", "wrong again"), ("Printer is jammed", "Paper stuck")]
+
+    results = llm_evaluator.evaluate_relevancy_batch(pairs)
+
+    assert [result["relevancy_score"] for result in results] == [1.0, 0.0, 1.0, 1.0, 0.0, 1.0]
+    assert all(set(result) == {"statements", "relevant_statements", "relevancy_score", "reason"} for result in results)
+    assert results[2]["statements"] == ["garble"]
+    # A batch of four, a retry for the garbled item in it, then the last two pairs
+    assert mock_server.batch_sizes == [4, 1, 2]
+
+@pytest.mark.parametrize("id_offset, dropped", [(1, False), (0, True)])
+def test_batched_judge_retries_whole_chunk_when_ids_do_not_match(mock_server, id_offset, dropped):
+    mock_server.id_offset = id_offset
+    llm_evaluator = LLMEvaluator(api_key="test-key", base_url=mock_server.base_url, batch_size=3)
+    pairs = [("Printer is jammed", "Printer is jammed"), ("Printer is jammed", "wrong answer"),
+             ("Printer is jammed", "drop me" if dropped else "Paper stuck")]
+
+    results = llm_evaluator.evaluate_relevancy_batch(pairs)
+
+    assert [result["relevancy_score"] for result in results] == [1.0, 0.0, 1.0]
+    assert [result["statements"] for result in results] == [[output] for _, output in pairs]
+    assert mock_server.batch_sizes == [3, 1, 1, 1]
+
+def test_batched_judge_matches_single_pair_judging(tmp_path, mock_server):
+    single_evaluator = make_evaluator(tmp_path / "single", mock_server)
+    single = single_evaluator.evaluate()
+    mock_server.batch_sizes.clear()
+
+    batched_evaluator = make_evaluator(tmp_path / "batched", mock_server, judge_pairs_per_request=5)
+    batched = batched_evaluator.evaluate()
+
+    assert batched == single
+    assert [r.to_result() for r in batched_evaluator.evaluation_results] == [r.to_result() for r in single_evaluator.evaluation_results]
+    # The three batched requests run concurrently, so they may arrive in any order
+    assert sorted(mock_server.batch_sizes) == [2, 5, 5]
+
+def test_prefilter_decides_clear_pairs_without_the_judge(tmp_path, mock_server):
+    evaluator = make_evaluator(
+        tmp_path, mock_server, string_prefilter=StringPrefilter(accept_threshold=0.8, reject_threshold=0.2),
+        keep_individual_results=True
+    )
+    ground_truth = {"number": "T-0", "description": "Printer on floor 0 is jammed", "priority": "high"}
+    descriptions = [
+        "Printer on floor 0 is jammed", "  PRINTER on floor 0 is jammed ", "The printer on floor 0 jammed",
+        "Coffee machine", "Printer broke"
+    ]
+    evaluator.ground_truths = [GroundTruth(data=ground_truth) for _ in descriptions]
+    evaluator.llm_outputs = [
+        LLMStructuredOutput(
+            structured_output=dict(ground_truth, description=description),
+            metadata=evaluator.llm_outputs[0].metadata
+        )
+        for description in descriptions
+    ]
+
+    result = evaluator.evaluate()
+
+    details = result.field_results["description"].details["individual_results"]
+    assert [d["tier"] for d in details] == ["exact", "normalized", "ngram", "ngram", "llm"]
+    assert [d["details"]["match_type"] for d in details[:4]] == ["exact", "normalized", "ngram", "ngram"]
+    assert details[2]["details"]["similarity"] >= 0.8 and details[3]["details"]["similarity"] <= 0.2
+    assert 0.2 < details[4]["similarity"] < 0.8
+    assert mock_server.requests == 1
@@ -0,0 +1,281 @@
+import pytest
+from unittest.mock import patch
+from llmdatalens.evaluators import StructuredOutputEvaluator, compile_evaluation_plan
+from llmdatalens.evaluators import evaluation_plan, field_evaluators
+from llmdatalens.experiment import ExperimentManager
+from llmdatalens.experiment.models import LLMStructuredOutput, GroundTruth, Metadata, Prompt, FunctionSchema
+
+INVOICE_SCHEMA = FunctionSchema(
+    name="Invoice",
+    parameters={
+        "type": "object",
+        "properties": {
+            "number": {"type": "string"},
+            "currency": {"type": "string", "enum": ["USD", "EUR", "GBP"]},
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}, "price": {"type": "number"}}
+                }
+            },
+            "total": {"type": "number"}
+        }
+    }
+)
+
+def make_pair(i, prompt, total_error=0.0):
+    data = {
+        "number": f"INV-{i}",
+        "currency": ["USD", "EUR", "GBP"][i % 3],
+        "items": [{"name": "Laptop", "price": 899.99}, {"name": "Mouse", "price": 24.95 + i}],
+        "total": 100.0 + i
+    }
+    predicted = dict(data, total=data["total"] + total_error)
+    llm_output = LLMStructuredOutput(
+        structured_output=predicted,
+        metadata=Metadata(model_name="gpt-4o-mini", model_version="1.0", prompt=prompt)
+    )
+    return llm_output, GroundTruth(data=data)
+
+@pytest.fixture
+def evaluator(tmp_path):
+    evaluator = StructuredOutputEvaluator(
+        experiment_manager=ExperimentManager(storage_path=str(tmp_path)),
+        experiment_name="Invoice Experiment",
+        experiment_version="1.0"
+    )
+    prompt = Prompt(system="Extract the invoice", function_call=INVOICE_SCHEMA)
+    for i in range(6):
+        llm_output, ground_truth = make_pair(i, prompt, total_error=5.0 if i % 2 else 0.0)
+        evaluator.add_llm_output(llm_output)
+        evaluator.add_ground_truth(ground_truth)
+    return evaluator
+
+def test_evaluate(evaluator):
+    result = evaluator.evaluate()
+
+    assert list(result.field_results) == ["number", "currency", "items", "total"]
+    assert result.overall_accuracy == pytest.approx((3 * 1.0 + 3 * 0.75) / 6)
+    assert result.field_results["number"].correct
+    assert not result.field_results["total"].correct
+    assert result.details["num_evaluations"] == 6
+    assert len(evaluator.experiment_manager.get_experiment(evaluator.experiment_id).runs) == 6
+
+def test_evaluation_plan_is_compiled_once_per_schema(evaluator):
+    evaluation_plan._plan_cache.clear()
+    create = patch(
+        "llmdatalens.evaluators.evaluation_plan.create_field_evaluator",
+        wraps=field_evaluators.create_field_evaluator
+    )
+    with create as create_field_evaluator:
+        schema = FunctionSchema(name="Copy", parameters=dict(INVOICE_SCHEMA.parameters, title="Copy"))
+        first = compile_evaluation_plan(schema)
+        second = compile_evaluation_plan(FunctionSchema(**schema.model_dump()))
+        evaluator.evaluate()
+        evaluator.evaluate()
+    assert first is second
+    assert create_field_evaluator.call_count == 4 + 4
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_evaluate_matches_serial(tmp_path, evaluator, executor):
+    serial_result = evaluator.evaluate()
+
+    parallel_evaluator = StructuredOutputEvaluator(
+        experiment_manager=ExperimentManager(storage_path=str(tmp_path / "parallel")),
+        experiment_name="Invoice Experiment",
+        experiment_version="1.0",
+        llm_outputs=evaluator.llm_outputs,
+        ground_truths=evaluator.ground_truths
+    )
+    parallel_result = parallel_evaluator.evaluate(workers=2, executor=executor, chunk_size=2)
+
+    assert parallel_result == serial_result
+    assert [r.to_result() for r in parallel_evaluator.evaluation_results] == [r.to_result() for r in evaluator.evaluation_results]
+    runs = parallel_evaluator.experiment_manager.get_experiment(parallel_evaluator.experiment_id).runs
+    assert [run.ground_truth.data["number"] for run in runs] == [f"INV-{i}" for i in range(6)]
+
+def test_parallel_evaluate_rejects_unknown_executor(evaluator):
+    with pytest.raises(ValueError):
+        evaluator.evaluate(workers=2, executor="cluster")
+
+def make_stream_evaluator(tmp_path):
+    return StructuredOutputEvaluator(
+        experiment_manager=ExperimentManager(storage_path=str(tmp_path)),
+        experiment_name="Invoice Stream",
+        experiment_version="1.0"
+    )
+
+def test_evaluate_stream_matches_evaluate(tmp_path, evaluator):
+    expected = evaluator.evaluate()
+    stream_evaluator = make_stream_evaluator(tmp_path / "stream")
+
+    result = stream_evaluator.evaluate_stream(
+        (pair for pair in zip(evaluator.llm_outputs, evaluator.ground_truths)), window=4
+    )
+
+    assert result.overall_accuracy == pytest.approx(expected.overall_accuracy)
+    assert result.details == {"num_evaluations": 6}
+    assert result.field_results["total"].details == {
+        "accuracy": 0.5, "correct_count": 3, "total_count": 6,
+        "mean_relative_error": pytest.approx(sum(5.0 / (100 + i) for i in (1, 3, 5)) / 6),
+        "mean_absolute_error": pytest.approx(2.5)
+    }
+    assert result.field_results["number"].correct and not result.field_results["total"].correct
+    assert stream_evaluator.llm_outputs == []
+    runs = stream_evaluator.experiment_manager.get_experiment(stream_evaluator.experiment_id).runs
+    assert [run.ground_truth.data["number"] for run in runs] == [f"INV-{i}" for i in range(6)]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_evaluate_stream_holds_at_most_a_window(tmp_path, workers):
+    stream_evaluator = make_stream_evaluator(tmp_path)
+    manager = stream_evaluator.experiment_manager
+    persisted = []
+    add_runs = manager.add_runs
+    manager.add_runs = lambda experiment_id, runs: persisted.extend(add_runs(experiment_id, runs)) or runs
+    prompt = Prompt(system="Extract the invoice", function_call=INVOICE_SCHEMA)
+    window = 20
+
+    def pairs():
+        for i in range(200):
+            assert i - len(persisted) <= window
+            yield make_pair(i, prompt)
+
+    result = stream_evaluator.evaluate_stream(pairs(), window=window, workers=workers, executor="thread")
+
+    assert result.details["num_evaluations"] == 200
+    assert result.overall_accuracy == 1.0
+    assert len(persisted) == 200
+
+def test_evaluate_stream_does_not_accumulate_runs_in_the_experiment_cache(tmp_path):
+    stream_evaluator = StructuredOutputEvaluator(
+        experiment_manager=ExperimentManager(storage_path=str(tmp_path), cache_max_runs=100),
+        experiment_name="Invoice Stream",
+        experiment_version="1.0"
+    )
+    manager = stream_evaluator.experiment_manager
+    manager.get_experiment(stream_evaluator.experiment_id)
+    prompt = Prompt(system="Extract the invoice", function_call=INVOICE_SCHEMA)
+
+    stream_evaluator.evaluate_stream((make_pair(i, prompt) for i in range(1000)), window=20)
+
+    cached_full = manager.cache.peek(("full", stream_evaluator.experiment_id))
+    assert cached_full is None or len(cached_full[1][1]) <= 100
+    assert len(manager.get_experiment(stream_evaluator.experiment_id).runs) == 1000
+
+def test_evaluate_only_processes_new_outputs(tmp_path, evaluator):
+    first = evaluator.evaluate()
+    prompt = evaluator.llm_outputs[0].metadata.prompt
+    for i in range(6, 8):
+        llm_output, ground_truth = make_pair(i, prompt, total_error=5.0)
+        evaluator.add_llm_output(llm_output)
+        evaluator.add_ground_truth(ground_truth)
+
+    with patch.object(evaluation_plan.EvaluationPlan, "evaluate", autospec=True,
+                      side_effect=evaluation_plan.EvaluationPlan.evaluate) as plan_evaluate:
+        second = evaluator.evaluate()
+        third = evaluator.evaluate()
+
+    assert plan_evaluate.call_count == 2
+    assert second is first and third is first
+    fresh = StructuredOutputEvaluator(
+        experiment_manager=ExperimentManager(storage_path=str(tmp_path / "fresh")),
+        experiment_name="Invoice Experiment",
+        experiment_version="1.0",
+        llm_outputs=evaluator.llm_outputs,
+        ground_truths=evaluator.ground_truths
+    ).evaluate()
+    assert second == fresh
+    assert second.details["num_evaluations"] == 8
+    assert len(evaluator.experiment_manager.get_experiment(evaluator.experiment_id).runs) == 8
+
+def test_reset_clears_outputs_and_cached_results(evaluator):
+    evaluator.evaluate()
+    evaluator.reset()
+
+    assert evaluator.llm_outputs == [] and evaluator.ground_truths == []
+    assert evaluator.evaluate().details["num_evaluations"] == 0
+    assert len(evaluator.experiment_manager.get_experiment(evaluator.experiment_id).runs) == 6
+
+def test_unordered_array_matching(tmp_path):
+    prompt = Prompt(system="Extract the invoice", function_call=INVOICE_SCHEMA)
+    results = {}
+    for array_matching in ["ordered", "unordered"]:
+        evaluator = StructuredOutputEvaluator(
+            experiment_manager=ExperimentManager(storage_path=str(tmp_path / array_matching)),
+            experiment_name="Invoice Experiment",
+            experiment_version="1.0",
+            array_matching=array_matching
+        )
+        llm_output, ground_truth = make_pair(0, prompt)
+        llm_output.structured_output["items"] = list(reversed(llm_output.structured_output["items"]))
+        evaluator.add_llm_output(llm_output)
+        evaluator.add_ground_truth(ground_truth)
+        results[array_matching] = evaluator.evaluate()
+
+    assert not results["ordered"].field_results["items"].correct
+    assert results["unordered"].field_results["items"].correct
+    assert results["unordered"].overall_accuracy == 1.0
+
+def test_evaluation_results_are_stored_compactly(evaluator):
+    evaluator.evaluate()
+    results = evaluator.evaluation_results
+
+    plan = compile_evaluation_plan(INVOICE_SCHEMA)
+    expected = [plan.evaluate(o.structured_output, g.data) for o, g in zip(evaluator.llm_outputs, evaluator.ground_truths)]
+    assert len(results) == 6
+    assert [result.to_result() for result in results] == expected
+    assert results[1].field_results["total"] == expected[1].field_results["total"]
+    assert list(results[-1].field_results) == ["number", "currency", "items", "total"]
+    assert results.correct("total").tolist() == [True, False] * 3
+    relative_error, absolute_error = results.errors("total")
+    assert absolute_error[1] == pytest.approx(5.0) and absolute_error[0] == 0.0
+    assert results.overall_accuracy().tolist() == [r.overall_accuracy for r in expected]
+
+def test_unique_details_are_not_interned():
+    import tracemalloc
+    from llmdatalens.evaluators.result_store import CompactResultStore
+    plan = compile_evaluation_plan(INVOICE_SCHEMA)
+    prompt = Prompt(system="Extract the invoice", function_call=INVOICE_SCHEMA)
+    # Item prices differ per row, so the array field's item results are unique to each row
+    pairs = [make_pair(i, prompt, total_error=5.0 if i % 2 else 0.0) for i in range(5000)]
+    outputs = [(llm_output.structured_output, ground_truth.data) for llm_output, ground_truth in pairs]
+    results = [plan.evaluate(predicted, gt) for predicted, gt in outputs]
+    store = CompactResultStore()
+
+    tracemalloc.start()
+    try:
+        for result, (predicted, gt) in zip(results, outputs):
+            store.append(result, predicted, gt)
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # Interning every row by repr kept about 3.5 MB of keys
+    assert retained < 1_500_000
+    assert store[4999].to_result() == results[4999]
+    assert store[4998].field_results["total"].details == results[4998].field_results["total"].details
+
+def test_aggregate_memory_does_not_grow_with_outputs(evaluator):
+    result = evaluator.evaluate()
+
+    assert result.field_results["total"].predicted is None
+    assert "individual_results" not in result.field_results["items"].details
+    assert result.field_results["total"].details["mean_absolute_error"] == pytest.approx(2.5)
+
+def test_changing_keep_individual_results_rebuilds_the_aggregate(evaluator):
+    aggregate = evaluator.evaluate()
+    view = evaluator.experiment_manager.open_experiment(evaluator.experiment_id)
+
+    evaluator.keep_individual_results = True
+    assert evaluator.evaluate() is aggregate
+    assert aggregate.field_results["total"].predicted == [o.structured_output["total"] for o in evaluator.llm_outputs]
+    assert len(aggregate.field_results["items"].details["individual_results"]) == 6
+    assert aggregate.field_results["total"].details["mean_absolute_error"] == pytest.approx(2.5)
+    # Rebuilt from the stored results: nothing was evaluated or recorded again
+    assert view.count_runs() == 6
+
+    evaluator.keep_individual_results = False
+    evaluator.evaluate()
+    assert aggregate.field_results["total"].predicted is None
+    assert aggregate.details == {"num_evaluations": 6}
@@ -1,7 +1,9 @@
+import multiprocessing
 import pytest
 from unittest.mock import Mock, patch
 from llmdatalens.experiment.experiment_manager import ExperimentManager
-from llmdatalens.experiment.models import Experiment, Run, Prompt, Model, LLMStructuredOutput, GroundTruth, Metadata
+from llmdatalens.experiment.storage import JSONFileBackend, SQLiteBackend
+from llmdatalens.experiment.models import Experiment, Run, Prompt, Model, LLMStructuredOutput, GroundTruth, Metadata, FunctionSchema
 from llmdatalens.core.metrics_registry import MetricNames
 
 @pytest.fixture
@@ -17,4 +19,380 @@ def test_create_experiment(experiment_manager):
     assert experiment.description == "A test description"
     assert experiment.version == "1.0"
 
-# Update other tests similarly, focusing on the actual methods and attributes of ExperimentManager
\ No newline at end of file
+# Update other tests similarly, focusing on the actual methods and attributes of ExperimentManager
+
+def _make_run(value="value"):
+    return Run(
+        llm_output=LLMStructuredOutput(
+            structured_output={"key": value},
+            metadata=Metadata(model_name="GPT-3", model_version="1.0", prompt=Prompt(user="Test prompt"))
+        ),
+        ground_truth=GroundTruth(data={"key": value})
+    )
+
+def test_add_run_appends_to_run_segment(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+
+    run_ids = [manager.add_run(experiment_id, _make_run(str(i))) for i in range(3)]
+
+    with open(tmp_path / f"{experiment_id}.runs.jsonl") as f:
+        assert len(f.readlines()) == 3
+    with open(tmp_path / f"{experiment_id}.json") as f:
+        assert "runs" not in f.read()
+
+    experiment = manager.get_experiment(experiment_id)
+    assert [run.id for run in experiment.runs] == run_ids
+    assert experiment.models["GPT-3"].versions["1.0"].run_count == 3
+    assert len(manager.get_prompt_history(experiment_id)) == 1
+    assert len(manager.get_all_experiments()[0].runs) == 3
+
+def test_legacy_embedded_runs_are_preserved(tmp_path):
+    legacy = Experiment(name="Legacy", version="1.0", runs=[_make_run("old")])
+    with open(tmp_path / f"{legacy.id}.json", "w") as f:
+        f.write(legacy.model_dump_json())
+    manager = ExperimentManager(storage_path=str(tmp_path))
+
+    manager.add_run(legacy.id, _make_run("new"))
+
+    runs = manager.get_experiment(legacy.id).runs
+    assert [run.ground_truth.data["key"] for run in runs] == ["old", "new"]
+
+def test_create_or_load_experiment_uses_catalog(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    other_id = manager.create_or_load_experiment("Test Experiment", "2.0")
+
+    assert other_id != experiment_id
+    assert (tmp_path / "catalog.idx").exists()
+
+    fresh_manager = ExperimentManager(storage_path=str(tmp_path))
+    with patch.object(fresh_manager, "_load_experiment") as load_experiment:
+        assert fresh_manager.create_or_load_experiment("Test Experiment", "1.0") == experiment_id
+        load_experiment.assert_not_called()
+    assert len(fresh_manager.get_all_experiments()) == 2
+
+def test_catalog_is_rebuilt_when_missing(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    (tmp_path / "catalog.idx").unlink()
+
+    fresh_manager = ExperimentManager(storage_path=str(tmp_path))
+    assert fresh_manager.create_or_load_experiment("Test Experiment", "1.0") == experiment_id
+    assert (tmp_path / "catalog.idx").exists()
+
+def test_copied_in_experiment_is_found_despite_existing_catalog(tmp_path):
+    import shutil
+    source, target = tmp_path / "source", tmp_path / "target"
+    source_manager = ExperimentManager(storage_path=str(source))
+    experiment_id = source_manager.create_or_load_experiment("Test Experiment", "1.0")
+    source_manager.add_run(experiment_id, _make_run("copied"))
+
+    target_manager = ExperimentManager(storage_path=str(target))
+    target_manager.create_or_load_experiment("Other Experiment", "1.0")
+    for suffix in (".json", ".runs.jsonl", ".blobs.jsonl"):
+        shutil.copy(source / f"{experiment_id}{suffix}", target / f"{experiment_id}{suffix}")
+
+    assert target_manager.create_or_load_experiment("Test Experiment", "1.0") == experiment_id
+    assert [run.ground_truth.data["key"] for run in target_manager.get_experiment(experiment_id).runs] == ["copied"]
+
+@pytest.mark.parametrize("make_backend", [
+    lambda path: JSONFileBackend(str(path)),
+    lambda path: SQLiteBackend(str(path / "experiments.db")),
+])
+def test_backends_raise_key_error_for_unknown_experiment(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    with pytest.raises(KeyError):
+        backend.load_header("missing")
+    with pytest.raises(KeyError):
+        backend.revision("missing")
+
+def test_sqlite_backend_round_trip(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "experiments.db"))
+    manager = ExperimentManager(backend=backend)
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    assert manager.create_or_load_experiment("Test Experiment", "1.0") == experiment_id
+
+    run_ids = [manager.add_run(experiment_id, _make_run(str(i))) for i in range(3)]
+
+    experiment = manager.get_experiment(experiment_id)
+    assert [run.id for run in experiment.runs] == run_ids
+    assert experiment.runs[0].ground_truth.data == {"key": "0"}
+    assert len(manager.get_prompt_history(experiment_id)) == 1
+    assert manager.get_model_history(experiment_id)["GPT-3"].versions["1.0"].run_count == 3
+    assert backend._query("PRAGMA journal_mode")[0][0] == "wal"
+
+    reopened = ExperimentManager(backend=SQLiteBackend(str(tmp_path / "experiments.db")))
+    assert len(reopened.get_all_experiments()[0].runs) == 3
+
+def test_sqlite_save_experiment_replaces_prompts_and_models(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "experiments.db"))
+    manager = ExperimentManager(backend=backend)
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_run(experiment_id, _make_run("0"))
+
+    experiment = manager.get_experiment(experiment_id)
+    experiment.prompts.clear()
+    experiment.models.clear()
+    experiment.runs.clear()
+    manager._save_experiment(experiment)
+
+    reloaded = ExperimentManager(backend=SQLiteBackend(str(tmp_path / "experiments.db"))).get_experiment(experiment_id)
+    assert reloaded.prompts == {} and reloaded.models == {} and reloaded.runs == []
+
+def test_add_runs_updates_header_once_per_batch(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    prompt = Prompt(user="Shared prompt")
+    runs = [_make_run(str(i)) for i in range(5)]
+    for run in runs:
+        run.llm_output.metadata.prompt = prompt
+
+    with patch.object(manager.backend, "save_header", wraps=manager.backend.save_header) as save_header, \
+            patch.object(manager, "_hash_prompt", wraps=manager._hash_prompt) as hash_prompt:
+        assert manager.add_runs(experiment_id, runs) == [run.id for run in runs]
+        assert save_header.call_count == 1
+        assert hash_prompt.call_count == 1
+
+    experiment = manager.get_experiment(experiment_id)
+    assert len(experiment.runs) == 5
+    assert experiment.models["GPT-3"].versions["1.0"].run_count == 5
+    assert {run.llm_output.metadata.additional_info["prompt_version"] for run in experiment.runs} == {"1.0.0"}
+
+def test_buffered_writer_flushes_by_count_and_on_exit(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+
+    with manager.buffered_writer(experiment_id, max_batch_size=2, flush_interval=3600) as writer:
+        for i in range(3):
+            writer.add(_make_run(str(i)))
+        assert len(manager.get_experiment(experiment_id).runs) == 2
+        assert writer.pending_count == 1
+
+    assert len(manager.get_experiment(experiment_id).runs) == 3
+
+def test_buffered_writer_flushes_by_time(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+
+    writer = manager.buffered_writer(experiment_id, max_batch_size=100, flush_interval=0)
+    writer.add(_make_run())
+    assert writer.pending_count == 0
+    assert len(manager.get_experiment(experiment_id).runs) == 1
+
+@pytest.mark.parametrize("use_sqlite", [False, True])
+def test_open_experiment_loads_runs_lazily(tmp_path, use_sqlite):
+    backend = SQLiteBackend(str(tmp_path / "experiments.db")) if use_sqlite else None
+    manager = ExperimentManager(storage_path=str(tmp_path), backend=backend)
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    run_ids = manager.add_runs(experiment_id, [_make_run(str(i)) for i in range(5)])
+
+    with patch.object(manager.backend, "load_runs") as load_runs:
+        view = manager.open_experiment(experiment_id)
+        assert view.name == "Test Experiment"
+        assert "GPT-3" in view.models
+        assert len(manager.get_prompt_history(experiment_id)) == 1
+        assert view.count_runs() == 5
+        assert [len(batch) for batch in view.iter_run_batches(batch_size=2)] == [2, 2, 1]
+        assert [run.id for run in view.iter_runs(batch_size=2)] == run_ids
+        load_runs.assert_not_called()
+
+    assert len(view.to_experiment().runs) == 5
+
+@pytest.mark.parametrize("use_sqlite", [False, True])
+def test_experiment_cache_skips_reload_and_detects_external_writes(tmp_path, use_sqlite):
+    def make_manager():
+        backend = SQLiteBackend(str(tmp_path / "experiments.db")) if use_sqlite else None
+        return ExperimentManager(storage_path=str(tmp_path), backend=backend)
+
+    manager = make_manager()
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_run(experiment_id, _make_run("0"))
+    assert len(manager.get_experiment(experiment_id).runs) == 1
+
+    with patch.object(manager.backend, "load_experiment") as load_experiment, \
+            patch.object(manager.backend, "load_header") as load_header:
+        manager.add_run(experiment_id, _make_run("1"))
+        assert len(manager.get_experiment(experiment_id).runs) == 2
+        load_experiment.assert_not_called()
+        load_header.assert_not_called()
+
+    make_manager().add_run(experiment_id, _make_run("2"))
+    experiment = manager.get_experiment(experiment_id)
+    assert [run.ground_truth.data["key"] for run in experiment.runs] == ["0", "1", "2"]
+    assert experiment.models["GPT-3"].versions["1.0"].run_count == 3
+
+def test_cached_experiments_are_returned_as_copies(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_run(experiment_id, _make_run("0"))
+
+    experiment = manager.get_experiment(experiment_id)
+    experiment.runs.clear()
+    experiment.models.clear()
+    manager.get_model_history(experiment_id).clear()
+    manager.open_experiment(experiment_id).prompts.clear()
+    manager.add_run(experiment_id, _make_run("1"))
+
+    with patch.object(manager.backend, "load_experiment") as load_experiment:
+        experiment = manager.get_experiment(experiment_id)
+        load_experiment.assert_not_called()
+    assert [run.ground_truth.data["key"] for run in experiment.runs] == ["0", "1"]
+    assert experiment.models["GPT-3"].versions["1.0"].run_count == 2
+    assert len(manager.get_prompt_history(experiment_id)) == 1
+
+def test_experiment_cache_is_bounded(tmp_path):
+    manager = ExperimentManager(storage_path=str(tmp_path), cache_size=2)
+    experiment_ids = [manager.create_or_load_experiment("Test Experiment", str(i)) for i in range(3)]
+    for experiment_id in experiment_ids:
+        manager.get_experiment(experiment_id)
+    assert len(manager.cache) == 2
+
+def _write_runs_from_worker(storage_path, use_sqlite, worker_index, num_runs):
+    backend = SQLiteBackend(f"{storage_path}/experiments.db") if use_sqlite else None
+    manager = ExperimentManager(storage_path=storage_path, backend=backend)
+    experiment_id = manager.create_or_load_experiment("Shared Experiment", "1.0")
+    for i in range(num_runs):
+        manager.add_run(experiment_id, _make_run(f"{worker_index}-{i}"))
+
+@pytest.mark.parametrize("use_sqlite", [False, True])
+def test_concurrent_writers_from_multiple_processes(tmp_path, use_sqlite):
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(start_method)
+    workers = [
+        context.Process(target=_write_runs_from_worker, args=(str(tmp_path), use_sqlite, worker_index, 20))
+        for worker_index in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    backend = SQLiteBackend(str(tmp_path / "experiments.db")) if use_sqlite else None
+    manager = ExperimentManager(storage_path=str(tmp_path), backend=backend)
+    experiments = manager.get_all_experiments()
+    assert len(experiments) == 1
+    assert len(experiments[0].runs) == 80
+    assert len({run.ground_truth.data["key"] for run in experiments[0].runs}) == 80
+    assert experiments[0].models["GPT-3"].versions["1.0"].run_count == 80
+
+@pytest.mark.parametrize("use_sqlite", [False, True])
+def test_shared_prompts_and_ground_truths_are_stored_once(tmp_path, use_sqlite):
+    if use_sqlite:
+        backend = SQLiteBackend(str(tmp_path / "experiments.db"), deduplicate_ground_truths=True)
+    else:
+        backend = JSONFileBackend(str(tmp_path), deduplicate_ground_truths=True)
+    manager = ExperimentManager(backend=backend)
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    schema = FunctionSchema(name="extract_marker", parameters={"type": "object", "properties": {"key": {"type": "string"}}})
+    prompt = Prompt(user="Shared prompt", function_call=schema)
+    runs = [_make_run("same") for _ in range(10)]
+    for run in runs:
+        run.llm_output.metadata.prompt = prompt
+    manager.add_runs(experiment_id, runs)
+
+    if use_sqlite:
+        stored_runs = "".join(data for (data,) in backend._query("SELECT data FROM runs"))
+        assert backend._query("SELECT COUNT(*) FROM blobs")[0][0] == 3
+    else:
+        stored_runs = (tmp_path / f"{experiment_id}.runs.jsonl").read_text()
+        assert (tmp_path / f"{experiment_id}.blobs.jsonl").read_text().count("extract_marker") == 1
+    assert "extract_marker" not in stored_runs
+
+    loaded = ExperimentManager(backend=backend, cache_size=0).get_experiment(experiment_id).runs
+    assert [run.model_dump() for run in loaded] == [run.model_dump() for run in runs]
+
+def test_ground_truths_are_kept_inline_by_default(tmp_path):
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path)))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_runs(experiment_id, [_make_run("first"), _make_run("second")])
+
+    assert (tmp_path / f"{experiment_id}.runs.jsonl").read_text().count('"key":"') == 4
+    runs = ExperimentManager(backend=JSONFileBackend(str(tmp_path))).get_experiment(experiment_id).runs
+    assert [run.ground_truth.data["key"] for run in runs] == ["first", "second"]
+
+def test_runs_written_without_deduplication_are_still_readable(tmp_path):
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path), deduplicate=False))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_run(experiment_id, _make_run("plain"))
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path)))
+    manager.add_run(experiment_id, _make_run("deduplicated"))
+
+    runs = manager.get_experiment(experiment_id).runs
+    assert [run.ground_truth.data["key"] for run in runs] == ["plain", "deduplicated"]
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma", "zlib"])
+def test_compressed_run_segments(tmp_path, compression):
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path), compression=compression))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    for i in range(3):
+        manager.add_runs(experiment_id, [_make_run(f"{i}-{j}") for j in range(4)])
+
+    with open(tmp_path / f"{experiment_id}.runs.jsonl", "rb") as f:
+        assert not f.read().startswith(b"{")
+    fresh_manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path)))
+    view = fresh_manager.open_experiment(experiment_id)
+    assert view.count_runs() == 12
+    assert [run.ground_truth.data["key"] for run in view.iter_runs(batch_size=5)] == [
+        f"{i}-{j}" for i in range(3) for j in range(4)
+    ]
+
+def test_uncompressed_segments_stay_readable_after_enabling_compression(tmp_path):
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path)))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_run(experiment_id, _make_run("plain"))
+
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path), compression="gzip"))
+    manager.add_run(experiment_id, _make_run("appended"))
+    experiment = manager.get_experiment(experiment_id)
+    assert [run.ground_truth.data["key"] for run in experiment.runs] == ["plain", "appended"]
+
+    manager._save_experiment(experiment)
+    with open(tmp_path / f"{experiment_id}.runs.jsonl", "rb") as f:
+        assert f.read(2) == b"\x1f\x8b"
+    assert len(ExperimentManager(backend=JSONFileBackend(str(tmp_path))).get_experiment(experiment_id).runs) == 2
+
+def test_segment_reader_ignores_incomplete_member(tmp_path):
+    from llmdatalens.experiment.storage.compression import SegmentReader, compress
+    path = tmp_path / "segment"
+    complete = compress(b'{"a": 1}\n{"a": 2}\n', "gzip") + compress(b'{"a": 3}\n', "gzip")
+    path.write_bytes(complete + compress(b'{"a": 4}\n', "gzip")[:-6])
+
+    reader = SegmentReader(str(path))
+    assert list(reader) == [b'{"a": 1}\n', b'{"a": 2}\n', b'{"a": 3}\n']
+    assert reader.offset == len(complete)
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma", "zlib"])
+def test_append_after_torn_compressed_member(tmp_path, compression):
+    from llmdatalens.experiment.storage.compression import compress
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path), compression=compression))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_run(experiment_id, _make_run("before"))
+    # A writer that crashed mid-append leaves the first bytes of a member in both segments
+    for suffix in (".blobs.jsonl", ".runs.jsonl"):
+        with open(tmp_path / f"{experiment_id}{suffix}", "ab") as f:
+            f.write(compress(b'{"torn": true}\n' * 50, compression)[:20])
+
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path), compression=compression))
+    manager.add_run(experiment_id, _make_run("after"))
+
+    fresh_manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path)))
+    runs = fresh_manager.get_experiment(experiment_id).runs
+    assert [run.ground_truth.data["key"] for run in runs] == ["before", "after"]
+
+def test_large_append_is_split_into_members(tmp_path):
+    import zlib
+    manager = ExperimentManager(backend=JSONFileBackend(str(tmp_path), compression="gzip", member_size=1000))
+    experiment_id = manager.create_or_load_experiment("Test Experiment", "1.0")
+    manager.add_runs(experiment_id, [_make_run(str(i)) for i in range(5000)])
+
+    data = (tmp_path / f"{experiment_id}.runs.jsonl").read_bytes()
+    members = 0
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        decompressor.decompress(data)
+        data = decompressor.unused_data
+        members += 1
+    assert members == 5
+    assert len(ExperimentManager(backend=JSONFileBackend(str(tmp_path))).get_experiment(experiment_id).runs) == 5000